@@ -1,122 +1,218 @@
+import base64
+import itertools
 import os
-import mysql.connector
-import sqlite3
+import threading
 import traceback
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
-import base64
-from flask import Flask, render_template, request, jsonify, url_for, session, flash, redirect
+import click
+from flask import Flask, render_template, request, jsonify, url_for, session, flash, redirect, send_file
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
+from chart_bundle import ChartBundle
+from chart_cache import ChartCache
+from db import Database, ensure_schema
+import feedback_store
+import http_cache
+import login_guard
+import metrics
+import report_jobs
+from metrics import span
+from render_pool import RenderUnavailable, pool_from_env
+
+# pandas/numpy (dataset_manager, chart_data) and matplotlib/seaborn (charts,
+# only ever imported by the render workers) are imported on first use, so
+# that importing this module stays cheap -- see STARTUP_MODE below and
+# `python startup_profile.py` for the measured breakdown.
 
 
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")  # Default "admin" agar nahi mile to
 
 load_dotenv()
 
+# eager: load the dataset and start render workers while importing (default)
+# lazy:  do both on the first request that needs them
+# warm:  like lazy, but start them in a background thread straight away
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager").lower()
+
 app = Flask(__name__)
 CORS(app)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev_secret")
 
+# Per-route latency + phase histograms at /metrics (see metrics.py)
+metrics.init_app(app)
+# ETag/Cache-Control for the GET analysis routes, gzip/br for JSON (see http_cache.py)
+http_cache.init_app(app)
+
 # -------------------------------
-# MySQL Database Configuration
+# Database (pooled, see db.py)
 # -------------------------------
-def get_db():
-    # Production (Render) mein SQLite use karein
-    if os.environ.get('RENDER'):
-        import sqlite3
-        # SQLite database create karein
-        conn = sqlite3.connect('/tmp/population_analysis.db')
-        return conn
-    else:
-        # Local development mein MySQL use karein
-        return mysql.connector.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", "population_analysis")
-        )
+# Production (Render) mein SQLite, local development mein MySQL
+db = Database.from_env()
 
 def init_db():
-    db = get_db()
-    cursor = db.cursor()
-    
-    # SQLite compatible table creation
-    if os.environ.get('RENDER'):
-        # Users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        # Feedback table - SQLite version
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                email TEXT,
-                message TEXT NOT NULL,
-                rating INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-    else:
-        # MySQL tables
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) NOT NULL,
-                email VARCHAR(100),
-                message TEXT NOT NULL,
-                rating INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-    
-    db.commit()
-    cursor.close()
-    db.close()
+    ensure_schema(db)
 
-init_db()
+# Schema creation is idempotent and runs once per deploy: gunicorn's master
+# does it before forking and sets INIT_DB=0 for the workers (gunicorn.conf.py).
+# `flask --app app init-db` runs it by hand.
+if os.getenv("INIT_DB", "1") == "1":
+    init_db()
 
 # -------------------------------
-# Load Dataset Once, Globally
+# Rendered Chart Cache
 # -------------------------------
-DATASET_PATH = "Dataset.csv"
-if not os.path.exists(DATASET_PATH):
-    raise FileNotFoundError("Dataset file not found: 'dataset.csv'")
-
-df = pd.read_csv(DATASET_PATH)
-df.columns = df.columns.str.strip()
-df["state_name"] = df["state_name"].str.strip().str.upper()
-
-# For literacy analysis (filter columns)
-literacy_columns = [
-    'name_of_city', 'state_name', 'population_total',
-    'effective_literacy_rate_total', 'effective_literacy_rate_male',
-    'effective_literacy_rate_female'
-]
-df_literacy = df[literacy_columns].dropna()
+# Charts only depend on the route, its parameters and the dataset, so they
+# are cached under a fingerprint of Dataset.csv (see chart_cache.py).
+# The fingerprint is filled in when the dataset is first loaded.
+chart_cache = ChartCache(
+    None,
+    max_entries=int(os.getenv("CHART_CACHE_SIZE", 256)),
+    max_bytes=int(os.getenv("CHART_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.getenv("CHART_CACHE_DIR") or None,
+)
+
+# Per-state charts pre-rendered by `flask --app app build-charts` into
+# static/charts/ are used before rendering anything (see chart_bundle.py).
+# With CHART_BUNDLE_ACCEL_PREFIX set (e.g. "/_charts"), ?format=png hands the
+# file to nginx with X-Accel-Redirect instead of sending it from Python.
+chart_bundle = ChartBundle()
+CHART_BUNDLE_ACCEL_PREFIX = os.getenv("CHART_BUNDLE_ACCEL_PREFIX", "").rstrip("/")
+
+# Charts are drawn in a bounded process pool off the request thread
+# (RENDER_POOL_WORKERS=0 renders inline, see render_pool.py)
+render_pool = pool_from_env()
+
+metrics.register_gauges("app_chart_cache", chart_cache.stats)
+metrics.register_gauges("app_render_pool", render_pool.stats)
+metrics.register_gauges("app_chart_bundle", chart_bundle.stats)
+metrics.register_gauges("app_db_pool", db.pool.stats)
+
+# Password hashing runs on a small bounded thread pool, behind per-IP and
+# per-username attempt throttling (see login_guard.py)
+auth = login_guard.LoginGuard.from_env()
+metrics.register_gauges("app_login_guard", auth.stats)
+
+# -------------------------------
+# Load Dataset (on first use)
+# -------------------------------
+# Reads the prebuilt columnar copy (python dataset.py build) when it is
+# up to date, otherwise parses and cleans Dataset.csv (see dataset.py).
+# Routes take `current_dataset()` once per request: the frame, literacy
+# subset, per-state aggregates and row indexes all come from that one
+# snapshot, which a reload replaces atomically (see dataset_manager.py).
+DATASET_WATCH_INTERVAL = float(os.getenv("DATASET_WATCH_INTERVAL", 0))
+
+_datasets = None
+_datasets_lock = threading.Lock()
+
+def get_datasets():
+    """The DatasetManager, created (and pandas imported) on first call."""
+    global _datasets
+    if _datasets is None:
+        with _datasets_lock:
+            if _datasets is None:
+                from dataset_manager import DatasetManager
+                manager = DatasetManager()
+                # Drop charts of the old dataset version whenever a reload swaps it in
+                manager.on_swap(lambda snapshot: chart_cache.set_fingerprint(snapshot.fingerprint))
+                manager.on_swap(lambda snapshot: chart_bundle.reload())
+                if DATASET_WATCH_INTERVAL > 0:
+                    manager.watch(DATASET_WATCH_INTERVAL)
+                _datasets = manager
+    return _datasets
+
+def current_dataset():
+    return get_datasets().current
+
+def warm_up():
+    """Load the dataset and start the render workers ahead of the first request."""
+    current_dataset()
+    render_pool.warm_up()
+
+def _warm_up_quietly():
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"[startup] warm-up failed: {e}")
+
+if STARTUP_MODE == "eager":
+    warm_up()
+elif STARTUP_MODE == "warm":
+    threading.Thread(target=_warm_up_quietly, name="warm-up", daemon=True).start()
+
+# -------------------------------
+# Report Jobs (on first use)
+# -------------------------------
+# Long multi-chart reports go through a SQLite job queue and are rendered
+# by worker processes on the same host, never inside a request: started by
+# gunicorn's master (REPORT_WORKERS=N, gunicorn.conf.py), from here under
+# `python app.py`, or by hand with `python report_jobs.py worker`.
+_reports = None
+_reports_lock = threading.Lock()
+report_workers = None
+
+def get_report_queue():
+    global _reports, report_workers
+    if _reports is None:
+        with _reports_lock:
+            if _reports is None:
+                queue = report_jobs.JobQueue()
+                report_workers = report_jobs.pool_from_env(queue)
+                _reports = queue
+    return _reports
+
+def report_job_counts():
+    """Job counts for /metrics, without creating the queue (or its workers) just to be scraped."""
+    return _reports.counts() if _reports is not None else {}
+
+metrics.register_gauges("app_report_jobs", report_job_counts)
+
+# -------------------------------
+# CLI: flask --app app init-db | importtime
+# -------------------------------
+@app.cli.command("init-db")
+def init_db_command():
+    """Create tables and indexes (safe to re-run)."""
+    init_db()
+    print(f"Schema ready ({db.backend})")
+
+@app.cli.command("build-charts")
+@click.option("--workers", type=int, default=None, help="render processes (default: one per core)")
+@click.option("--top-pairs", type=int, default=10, help="/compare_states for every pair of the N most populous states")
+@click.option("--force", is_flag=True, help="re-render charts that are already current")
+def build_charts_command(workers, top_pairs, force):
+    """Pre-render the per-state charts into static/charts/ (see chart_bundle.py)."""
+    from chart_bundle import build
+    dataset = current_dataset()
+    build(bundle_charts(dataset, top_pairs), dataset.fingerprint, workers=workers, force=force)
+    chart_bundle.reload()
+
+@app.cli.command("importtime")
+@click.option("--mode", "modes", multiple=True, type=click.Choice(["eager", "lazy", "warm"]),
+              help="STARTUP_MODE to time, repeatable (default: both)")
+@click.option("--top", type=int, default=15, help="slowest direct imports to list")
+def importtime_command(modes, top):
+    """Import-time breakdown of app.py in each startup mode."""
+    import startup_profile
+    startup_profile.summarize("app", modes=list(modes) or ["eager", "lazy"], top=top)
 
 # -------------------------------
 # Authentication Routes
 # -------------------------------
+def request_ip():
+    return login_guard.client_ip(request.remote_addr, request.headers.get("X-Forwarded-For"))
+
+def stored_password_hash(username):
+    user = db.fetchone("SELECT password_hash FROM users WHERE username=?", (username,))
+    return user["password_hash"] if user else None
+
+def auth_refused(template, message, retry_after, status=429):
+    """The form again with a flash, 429 (throttled) or 503 (hash pool full) and Retry-After."""
+    seconds = max(1, int(retry_after + 0.999))
+    flash(f"{message}. Please try again in {seconds} seconds.", "danger")
+    response = app.make_response((render_template(template), status))
+    response.headers["Retry-After"] = str(seconds)
+    return response
+
 @app.route("/", methods=["GET", "POST"])
 def login():
     if "user" in session:
@@ -126,30 +222,18 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
 
-        db = get_db()
-        
-        # SQLite compatible cursor
-        if os.environ.get('RENDER'):
-            cursor = db.cursor()
-            cursor.row_factory = sqlite3.Row
-        else:
-            cursor = db.cursor(dictionary=True)
-            
-        cursor.execute("SELECT * FROM users WHERE username=?", (username,))
-        user = cursor.fetchone()
-        cursor.close()
-        db.close()
-
-        # SQLite compatible data access
-        if user:
-            if os.environ.get('RENDER'):
-                # SQLite: user[0]=id, user[1]=username, user[2]=password_hash
-                password_hash = user[2]
-            else:
-                # MySQL: user["password_hash"]
-                password_hash = user["password_hash"]
-            
-            if check_password_hash(password_hash, password):
+        wait = auth.throttle(request_ip(), username)
+        if wait:
+            return auth_refused("login.html", "Too many login attempts", wait)
+
+        password_hash = auth.password_hash(username, stored_password_hash)
+        if password_hash:
+            try:
+                with span("hash"):
+                    valid = auth.verify(password_hash, password)
+            except login_guard.HashBusy as e:
+                return auth_refused("login.html", str(e), e.retry_after, e.status)
+            if valid:
                 session["user"] = username
                 flash("Login successful!", "success")
                 return redirect(url_for("dashboard"))
@@ -173,26 +257,22 @@ def register():
             flash("Passwords do not match", "danger")
             return redirect(url_for("register"))
 
-        password_hash = generate_password_hash(password)
+        wait = auth.throttle(request_ip())
+        if wait:
+            return auth_refused("register.html", "Too many attempts", wait)
+        try:
+            with span("hash"):
+                password_hash = auth.hash_password(password)
+        except login_guard.HashBusy as e:
+            return auth_refused("register.html", str(e), e.retry_after, e.status)
 
         try:
-            db = get_db()
-            cursor = db.cursor()
-            
-            # SQLite compatible query
-            if os.environ.get('RENDER'):
-                cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", 
-                              (username, password_hash))
-            else:
-                cursor.execute("INSERT INTO users (username, password_hash) VALUES (%s, %s)", 
-                              (username, password_hash))
-                              
-            db.commit()
-            cursor.close()
-            db.close()
+            db.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                       (username, password_hash))
         except Exception as e:
             flash(f"Registration error: {str(e)}", "danger")
             return redirect(url_for("register"))
+        auth.registered(username)
 
         flash("Registration successful. Please login.", "success")
         return redirect(url_for("login"))
@@ -242,47 +322,150 @@ def unemployment():
         return redirect(url_for("login"))
     return render_template('unployment.html')
 
+def request_data():
+    """
+    Parameters of an analysis request: the JSON body for POST, the query
+    string for the cacheable GET variants (?state_name=...).
+    """
+    if request.method == "GET":
+        return request.args
+    return request.json or {}
+
+def wants_chart_data():
+    """
+    True when the client asked for the chart's data (`?format=json`)
+    to draw it itself, instead of a server-rendered PNG.
+    """
+    return request.args.get("format", "").lower() == "json"
+
+def wants_png():
+    """True for `?format=png`: the chart itself as image/png rather than JSON."""
+    return request.args.get("format", "").lower() == "png"
+
+def chart(route, params, fingerprint, render):
+    """A chart's data URL: chart cache, then the prebuilt bundle, then `render()`."""
+    return chart_cache.get_or_render(
+        route, params,
+        lambda: chart_bundle.data_url(route, params, fingerprint) or render(),
+        fingerprint=fingerprint
+    )
+
+def chart_png(route, params, fingerprint, render):
+    """
+    ?format=png response: the bundled file if there is one (sent by nginx
+    when CHART_BUNDLE_ACCEL_PREFIX is set), else the live chart.  None if
+    `render()` has nothing to draw.
+    """
+    path = chart_bundle.path(route, params, fingerprint)
+    if path is not None:
+        if CHART_BUNDLE_ACCEL_PREFIX:
+            response = app.response_class(mimetype="image/png")
+            response.headers["X-Accel-Redirect"] = f"{CHART_BUNDLE_ACCEL_PREFIX}/{chart_bundle.relative_path(path)}"
+            return response
+        return send_file(path, mimetype="image/png", etag=False, conditional=False)
+    graph = chart(route, params, fingerprint, render)
+    if graph is None:
+        return None
+    return app.response_class(base64.b64decode(graph.split(",", 1)[1]), mimetype="image/png")
+
+def render_unavailable(e):
+    """503/504 response when the render pool is saturated or timed out."""
+    response = jsonify({"error": str(e)})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
 # ---- B) Analyze Literacy (Histogram)
-@app.route('/analyze', methods=['POST'])
+@app.route('/analyze', methods=['GET', 'POST'])
 def analyze():
     """
     Creates a histogram of the state's literacy rates 
-    and returns it as base64-encoded PNG.
+    and returns it as base64-encoded PNG (or its bins with ?format=json).
     """
     try:
-        data = request.json
+        data = request_data()
         state_name = data.get('state_name', '').strip().upper()
         if not state_name:
             return jsonify({'error': "State name is required"}), 400
 
+        dataset = current_dataset()
+        cached = http_cache.not_modified(
+            "analyze", {"state_name": state_name, "data": wants_chart_data(), "png": wants_png()}, dataset.fingerprint
+        )
+        if cached is not None:
+            return cached
+
         # Filter the dataset for the given state
-        df_state = df_literacy[df_literacy['state_name'].str.contains(state_name, case=False, na=False)]
+        # Partial, case-insensitive name match (e.g. "PRADESH")
+        with span("filter"):
+            df_state = dataset.df_literacy.iloc[dataset.literacy_index.contains(state_name)]
         if df_state.empty:
             return jsonify({'error': f"No data available for {state_name}"}), 404
 
+        if wants_chart_data():
+            import chart_data
+            with span("aggregate"):
+                histogram = chart_data.histogram_data(df_state['effective_literacy_rate_total'], bins=30)
+            return jsonify({
+                'state': state_name,
+                'title': f"Literacy Rate Distribution in {state_name}",
+                'xlabel': "Total Literacy Rate (%)",
+                'ylabel': "Frequency",
+                'histogram': histogram
+            })
+
         # Plot: Literacy Rate Distribution
-        plt.figure(figsize=(10, 5))
-        sns.histplot(df_state['effective_literacy_rate_total'], bins=30, kde=True)
-        plt.xlabel("Total Literacy Rate (%)")
-        plt.ylabel("Frequency")
-        plt.title(f"Literacy Rate Distribution in {state_name}")
-
-        # Convert the figure to base64
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        graph_url = base64.b64encode(img.getvalue()).decode()
-        plt.close()
+        values = df_state['effective_literacy_rate_total'].to_numpy()
+        render = lambda: render_pool.render("charts.literacy_histogram", values, state_name)
+        if wants_png():
+            return chart_png("analyze", {"state_name": state_name}, dataset.fingerprint, render)
+        graph = chart("analyze", {"state_name": state_name}, dataset.fingerprint, render)
 
         return jsonify({
-            'graph': f"data:image/png;base64,{graph_url}",
+            'graph': graph,
             'state': state_name
         })
+    except RenderUnavailable as e:
+        return render_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ---- C) Compare Two States (Population, Literacy, etc.)
-def generate_comparison_graph(state1, state2, df):
+COMPARISON_METRICS = [
+    ("Population", "population_total"),
+    ("Literacy Rate", "effective_literacy_rate_total"),
+    ("Sex Ratio", "sex_ratio"),
+    ("Total Graduates", "total_graduates"),
+]
+
+def generate_comparison_data(state1, state2, aggregates):
+    """Same numbers as generate_comparison_graph, as JSON-ready lists."""
+    import chart_data
+    with span("aggregate"):
+        selected_states = aggregates.select([state1, state2])
+        if len(selected_states) < 2:
+            return None
+
+        return {
+            "states": selected_states["state_name"].tolist(),
+            "metrics": [
+                dict(chart_data.bar_data(selected_states["state_name"], selected_states[column]), name=label)
+                for label, column in COMPARISON_METRICS
+            ]
+        }
+
+def comparison_chart_args(state1, state2, aggregates):
+    """Arguments of charts.comparison_chart for the two states, or None."""
+    with span("aggregate"):
+        selected_states = aggregates.select([state1, state2])
+        if selected_states.empty or len(selected_states) < 2:
+            return None
+
+        states = selected_states["state_name"].values
+        values = [(label, selected_states[column].values) for label, column in COMPARISON_METRICS]
+    return states, values
+
+def generate_comparison_graph(state1, state2, aggregates):
     """
     Compare two states on:
       - population_total
@@ -290,66 +473,101 @@ def generate_comparison_graph(state1, state2, df):
       - sex_ratio
       - total_graduates
     """
-    statewise_data = df.groupby("state_name").agg({
-        "population_total": "sum",
-        "effective_literacy_rate_total": "mean",
-        "sex_ratio": "mean",
-        "total_graduates": "sum"
-    }).reset_index()
-
-    selected_states = statewise_data[statewise_data["state_name"].isin([state1, state2])]
-    if selected_states.empty or len(selected_states) < 2:
+    args = comparison_chart_args(state1, state2, aggregates)
+    if args is None:
         return None
+    return render_pool.render("charts.comparison_chart", *args)
+
 
-    states = selected_states["state_name"].values
-    metrics = ["Population", "Literacy Rate", "Sex Ratio", "Total Graduates"]
-    values = [
-        selected_states["population_total"].values,
-        selected_states["effective_literacy_rate_total"].values,
-        selected_states["sex_ratio"].values,
-        selected_states["total_graduates"].values
-    ]
-
-    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
-    palettes = ["viridis", "coolwarm", "magma", "cubehelix"]
-
-    for i, ax in enumerate(axes.flat):
-        sns.barplot(x=states, y=values[i], ax=ax, palette=palettes[i])
-        ax.set_title(f"{metrics[i]} Comparison")
-        ax.set_ylabel(metrics[i])
-
-    plt.tight_layout()
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    graph_url = base64.b64encode(img.getvalue()).decode()
-    plt.close()
-    return f"data:image/png;base64,{graph_url}"
-
-
-@app.route('/compare_states', methods=['POST'])
+@app.route('/compare_states', methods=['GET', 'POST'])
 def compare_states():
     """
     Compare two states on various metrics 
     (population, literacy, etc.)
     """
     try:
-        data = request.json
+        data = request_data()
         state1 = data.get("state1", "").strip().upper()
         state2 = data.get("state2", "").strip().upper()
 
         if not state1 or not state2:
             return jsonify({"error": "Both states must be provided"}), 400
 
-        valid_states = set(df["state_name"].unique())
-        if state1 not in valid_states or state2 not in valid_states:
+        dataset = current_dataset()
+        with span("filter"):
+            valid = dataset.aggregates.is_valid(state1) and dataset.aggregates.is_valid(state2)
+        if not valid:
             return jsonify({"error": "Invalid state names"}), 400
 
-        graph_url = generate_comparison_graph(state1, state2, df)
+        # Both the chart and the JSON are symmetric in the two states
+        cached = http_cache.not_modified(
+            "compare_states", {"states": sorted([state1, state2]), "data": wants_chart_data(), "png": wants_png()},
+            dataset.fingerprint
+        )
+        if cached is not None:
+            return cached
+
+        if wants_chart_data():
+            comparison = generate_comparison_data(state1, state2, dataset.aggregates)
+            if comparison is None:
+                return jsonify({"error": "Insufficient data"}), 404
+            return jsonify(comparison)
+
+        # Chart is symmetric in the two states, so cache on the sorted pair
+        render = lambda: generate_comparison_graph(state1, state2, dataset.aggregates)
+        if wants_png():
+            graph_url = chart_png("compare_states", {"states": sorted([state1, state2])}, dataset.fingerprint, render)
+        else:
+            graph_url = chart("compare_states", {"states": sorted([state1, state2])}, dataset.fingerprint, render)
         if graph_url is None:
             return jsonify({"error": "Insufficient data"}), 404
+        if wants_png():
+            return graph_url
 
         return jsonify({"graph": graph_url})
+    except RenderUnavailable as e:
+        return render_unavailable(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/compare_states/batch', methods=['GET', 'POST'])
+def compare_states_batch():
+    """
+    Compare any number of states in one call: {"states": ["KERALA", ...]}
+    or {"states": "all"} (GET: ?states=KERALA,PUNJAB or ?states=all).  Returns the four comparison metrics for each
+    state plus its rank (1 = highest) and percentile among all states,
+    all read from the precomputed aggregates.
+    """
+    try:
+        data = request_data()
+        states = data.get("states")
+        if request.method == "GET" and states and states.strip().lower() != "all":
+            states = states.split(",")
+        if isinstance(states, str) and states.strip().lower() == "all":
+            names = None
+        elif isinstance(states, list) and states and all(isinstance(name, str) for name in states):
+            names = [name.strip().upper() for name in states if name.strip()]
+        else:
+            return jsonify({"error": 'Provide "states" as a list of state names or "all"'}), 400
+
+        dataset = current_dataset()
+        cached = http_cache.not_modified(
+            "compare_states_batch", {"states": sorted(set(names)) if names is not None else "all"},
+            dataset.fingerprint
+        )
+        if cached is not None:
+            return cached
+
+        with span("aggregate"):
+            comparison = dataset.aggregates.compare_many(names)
+        if not comparison["states"]:
+            return jsonify({"error": "Invalid state names", "unknown": comparison["unknown"]}), 400
+
+        comparison["metrics"] = [
+            dict(comparison["metrics"][column], name=label, column=column)
+            for label, column in COMPARISON_METRICS
+        ]
+        return jsonify(comparison)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -361,33 +579,53 @@ def top_states():
     'Estimated Unemployment Rate (%)'.
     """
     try:
-        if "Estimated Unemployment Rate (%)" not in df.columns:
-            return jsonify({"error": "Estimated Unemployment Rate (%) column not found"}), 400
+        from state_aggregates import UNEMPLOYMENT_COLUMN
+        dataset = current_dataset()
+        cached = http_cache.not_modified("top_states", {}, dataset.fingerprint)
+        if cached is not None:
+            return cached
 
-        top_states = (
-            df.groupby("state_name")["Estimated Unemployment Rate (%)"]
-            .mean().sort_values(ascending=False)
-            .head(10)
-        )
-        return jsonify(top_states.to_dict())
+        aggregates = dataset.aggregates
+        if not aggregates.has_unemployment:
+            return jsonify({"error": f"{UNEMPLOYMENT_COLUMN} column not found"}), 400
+
+        with span("aggregate"):
+            top = aggregates.top_unemployment
+        return jsonify(top)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # ---- E) Analyze a Single State's Unemployment
-@app.route('/analyze_state', methods=['POST'])
+def top_unemployment_rows(df_state):
+    """The state's 10 rows with the highest unemployment rate."""
+    return df_state.sort_values(by="Estimated Unemployment Rate (%)", ascending=False).head(10)
+
+def employment_plot_data(df_sorted):
+    # Plain strings so seaborn only draws the regions present (not every category)
+    return df_sorted[["Region", "Estimated Employed"]].astype({"Region": str})
+
+@app.route('/analyze_state', methods=['GET', 'POST'])
 def analyze_state():
     """
     Example route for analyzing unemployment data 
     (Estimated Employed, Region, etc.)
     """
     try:
-        data = request.json
+        data = request_data()
         state_name = data.get("state_name", "").strip().upper()
 
         if not state_name:
             return jsonify({"error": "State name is required"}), 400
 
-        df_state = df[df["state_name"] == state_name]
+        dataset = current_dataset()
+        cached = http_cache.not_modified(
+            "analyze_state", {"state_name": state_name, "data": wants_chart_data(), "png": wants_png()}, dataset.fingerprint
+        )
+        if cached is not None:
+            return cached
+        df = dataset.df
+        with span("filter"):
+            df_state = df.iloc[dataset.state_index.exact(state_name)]
         if df_state.empty:
             return jsonify({"error": "No data available for the entered state."}), 404
 
@@ -396,48 +634,86 @@ def analyze_state():
         if "Estimated Unemployment Rate (%)" not in df.columns or "Region" not in df.columns:
             return jsonify({"error": "Required columns not found"}), 400
 
-        df_sorted = df_state.sort_values(by="Estimated Unemployment Rate (%)", ascending=False).head(10)
+        with span("aggregate"):
+            df_sorted = top_unemployment_rows(df_state)
         if "Estimated Employed" not in df.columns:
             return jsonify({"error": "No 'Estimated Employed' column found"}), 400
 
-        img = io.BytesIO()
-        plt.figure(figsize=(10,5))
-        sns.barplot(x="Region", y="Estimated Employed", data=df_sorted, color="blue", alpha=0.7)
-        plt.xlabel("Region")
-        plt.ylabel("Estimated Employed")
-        plt.title(f"Employment in {state_name}")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        graph_url = base64.b64encode(img.getvalue()).decode()
-        plt.close()
-
-        return jsonify({"graph": f"data:image/png;base64,{graph_url}"})
+        if wants_chart_data():
+            import chart_data
+            with span("aggregate"):
+                bars = chart_data.grouped_bar_data(df_sorted, "Region", "Estimated Employed")
+            return jsonify({
+                "state": state_name,
+                "title": f"Employment in {state_name}",
+                "xlabel": "Region",
+                "ylabel": "Estimated Employed",
+                "bars": bars
+            })
+
+        plot_data = employment_plot_data(df_sorted)
+        render = lambda: render_pool.render("charts.employment_bar_chart", plot_data, state_name)
+        if wants_png():
+            return chart_png("analyze_state", {"state_name": state_name}, dataset.fingerprint, render)
+        graph = chart("analyze_state", {"state_name": state_name}, dataset.fingerprint, render)
+
+        return jsonify({"graph": graph})
+    except RenderUnavailable as e:
+        return render_unavailable(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ---- Pre-rendered charts (flask --app app build-charts)
+def bundle_charts(dataset, top_pairs=10):
+    """
+    (route, params, renderer, args) of every chart the bundle holds: each
+    state's /analyze and /analyze_state chart and /compare_states for every
+    pair of the `top_pairs` most populous states -- built from the same
+    inputs, and under the same params, as the routes above.
+    """
+    literacy = dataset.df_literacy['effective_literacy_rate_total'].to_numpy()
+    for state in dataset.literacy_index.names:
+        values = literacy[dataset.literacy_index.contains(state)]
+        yield "analyze", {"state_name": state}, "charts.literacy_histogram", (values, state)
+
+    df = dataset.df
+    if {"Estimated Unemployment Rate (%)", "Region", "Estimated Employed"} <= set(df.columns):
+        for state in dataset.state_index.names:
+            plot_data = employment_plot_data(top_unemployment_rows(df.iloc[dataset.state_index.exact(state)]))
+            yield "analyze_state", {"state_name": state}, "charts.employment_bar_chart", (plot_data, state)
+
+    populous = dataset.aggregates.table["population_total"].nlargest(top_pairs).index
+    for pair in itertools.combinations(sorted(populous), 2):
+        args = comparison_chart_args(*pair, dataset.aggregates)
+        if args is not None:
+            yield "compare_states", {"states": list(pair)}, "charts.comparison_chart", args
+
 # ---- F) Another Example Route for 4-plot Employment Analysis
-@app.route('/analyze_employment', methods=['POST'])
+@app.route('/analyze_employment', methods=['GET', 'POST'])
 def analyze_employment():
     try:
-        data = request.json
+        data = request_data()
         region_name = data.get("region_name", "").strip()
         if not region_name:
             return jsonify({"error": "Please provide a region name"}), 400
 
-        # Debug: Check available columns
-        print("Available columns:", df.columns.tolist())
-        
-        # Find region-like columns
-        region_columns = [col for col in df.columns if 'region' in col.lower() or 'state' in col.lower() or 'area' in col.lower()]
-        
+        dataset = current_dataset()
+        cached = http_cache.not_modified(
+            "analyze_employment", {"region_name": region_name, "data": wants_chart_data()}, dataset.fingerprint
+        )
+        if cached is not None:
+            return cached
+        df = dataset.df
+        region_columns, employed_cols = dataset.region_columns, dataset.employed_cols
+
+        # Region-like columns are resolved at load time
         if not region_columns:
             return jsonify({"error": "No region/state columns found in dataset. Available columns: " + str(df.columns.tolist())}), 400
 
         # Use first available region column
         region_col = region_columns[0]
-        state_data = df[df[region_col].astype(str).str.lower() == region_name.lower()]
+        with span("filter"):
+            state_data = df.iloc[dataset.region_index.exact(region_name.lower())]
         
         if state_data.empty:
             available_regions = df[region_col].astype(str).unique().tolist()
@@ -445,37 +721,145 @@ def analyze_employment():
                 "error": f"No data found for: {region_name}. Available {region_col}s: {available_regions}"
             }), 404
 
-        # Find employment-related column
-        employed_cols = [col for col in df.columns if 'employed' in col.lower() or 'employment' in col.lower()]
+        # Employment-related column (also resolved at load time)
         if not employed_cols:
             return jsonify({"error": "No employment-related columns found. Available columns: " + str(df.columns.tolist())}), 400
         
         employed_col = employed_cols[0]
 
-        # Create simple plot instead of 4-subplot
-        plt.figure(figsize=(10, 6))
-        sns.histplot(state_data[employed_col], bins=10, kde=True)
-        plt.title(f"Employment Distribution in {region_name}")
-        plt.xlabel(employed_col)
-        plt.ylabel("Frequency")
+        if wants_chart_data():
+            import chart_data
+            with span("aggregate"):
+                histogram = chart_data.histogram_data(state_data[employed_col], bins=10)
+            return jsonify({
+                "message": "Success",
+                "region": region_name,
+                "used_column": employed_col,
+                "title": f"Employment Distribution in {region_name}",
+                "xlabel": employed_col,
+                "ylabel": "Frequency",
+                "histogram": histogram
+            })
 
-        # Convert the figure to base64
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        graph_b64 = base64.b64encode(img.getvalue()).decode()
-        plt.close()
+        # Create simple plot instead of 4-subplot.
+        # Region name stays case-sensitive in the key because it is used in the title
+        values = state_data[employed_col].to_numpy()
+        graph = chart_cache.get_or_render(
+            "analyze_employment", {"region_name": region_name, "column": employed_col},
+            lambda: render_pool.render("charts.employment_histogram", values, region_name, employed_col),
+            fingerprint=dataset.fingerprint
+        )
 
         return jsonify({
             "message": "Success",
             "region": region_name,
-            "graph": f"data:image/png;base64,{graph_b64}",
+            "graph": graph,
             "used_column": employed_col
         })
-        
+
+    except RenderUnavailable as e:
+        return render_unavailable(e)
     except Exception as e:
         return jsonify({"error": str(e), "traceback": str(traceback.format_exc())}), 500
     
+# ---- G) Cities near a point / in a box (location column, see geo_index.py)
+GEO_DEFAULT_LIMIT = 50
+GEO_MAX_LIMIT = 500
+
+def geo_args(*names):
+    """Float query parameters, or raise ValueError naming the bad one."""
+    values = []
+    for name in names:
+        try:
+            value = float(request.args[name])
+        except (KeyError, ValueError):
+            raise ValueError(f"'{name}' must be a number")
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError(f"'{name}' must be a number")
+        values.append(value)
+    return values
+
+def geo_limit():
+    return max(1, min(request.args.get("limit", GEO_DEFAULT_LIMIT, type=int), GEO_MAX_LIMIT))
+
+def check_point(lat, lon):
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("lat must be within [-90, 90] and lon within [-180, 180]")
+
+@app.route('/cities/within')
+def cities_within():
+    """Cities within ?radius_km= of ?lat=&lon=, nearest first, with population/literacy stats."""
+    try:
+        lat, lon, radius = geo_args("lat", "lon", "radius_km")
+        check_point(lat, lon)
+        if radius <= 0:
+            raise ValueError("'radius_km' must be positive")
+        limit = geo_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        dataset = current_dataset()
+        cached = http_cache.not_modified(
+            "cities_within", {"lat": lat, "lon": lon, "radius_km": radius, "limit": limit}, dataset.fingerprint
+        )
+        if cached is not None:
+            return cached
+        with span("filter"):
+            positions, distances = dataset.geo_index.within(lat, lon, radius)
+        with span("aggregate"):
+            result = dataset.geo_index.summary(positions, distances, limit)
+        return jsonify(dict(result, lat=lat, lon=lon, radius_km=radius))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cities/nearest')
+def cities_nearest():
+    """The ?k= cities nearest to ?lat=&lon=, with population/literacy stats."""
+    try:
+        lat, lon = geo_args("lat", "lon")
+        check_point(lat, lon)
+        k = max(1, min(request.args.get("k", 10, type=int), GEO_MAX_LIMIT))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        dataset = current_dataset()
+        cached = http_cache.not_modified("cities_nearest", {"lat": lat, "lon": lon, "k": k}, dataset.fingerprint)
+        if cached is not None:
+            return cached
+        with span("filter"):
+            positions, distances = dataset.geo_index.nearest(lat, lon, k)
+        with span("aggregate"):
+            result = dataset.geo_index.summary(positions, distances, k)
+        return jsonify(dict(result, lat=lat, lon=lon, k=k))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cities/bbox')
+def cities_bbox():
+    """Cities inside ?min_lat=&min_lon=&max_lat=&max_lon=, most populous first."""
+    try:
+        min_lat, min_lon, max_lat, max_lon = geo_args("min_lat", "min_lon", "max_lat", "max_lon")
+        check_point(min_lat, min_lon)
+        check_point(max_lat, max_lon)
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("min_lat/min_lon must not exceed max_lat/max_lon")
+        limit = geo_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        dataset = current_dataset()
+        box = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon}
+        cached = http_cache.not_modified("cities_bbox", dict(box, limit=limit), dataset.fingerprint)
+        if cached is not None:
+            return cached
+        with span("filter"):
+            positions = dataset.geo_index.bbox(min_lat, min_lon, max_lat, max_lon)
+        with span("aggregate"):
+            result = dataset.geo_index.summary(positions, limit=limit)
+        return jsonify(dict(result, **box))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # -------------------------------
 # Feedback Routes
 # -------------------------------
@@ -492,32 +876,19 @@ def feedback():
     if request.method == "POST":
         email = request.form.get("email", "")
         message = request.form.get("message", "")
-        rating = request.form.get("rating", 5)
+        rating = request.form.get("rating", type=int) if "rating" in request.form else 5
         
         if not message:
             flash("Please enter your feedback message", "danger")
             return redirect(url_for("feedback"))
         
+        if rating is None or not 1 <= rating <= 5:
+            flash("Rating must be a whole number from 1 to 5", "danger")
+            return render_template("feedback.html", user=session["user"]), 400
+        
         try:
-            db = get_db()
-            cursor = db.cursor()
-            
-            # SQLite compatible query
-            if os.environ.get('RENDER'):
-                cursor.execute(
-                    "INSERT INTO feedback (username, email, message, rating) VALUES (?, ?, ?, ?)",
-                    (session["user"], email, message, rating)
-                )
-            else:
-                cursor.execute(
-                    "INSERT INTO feedback (username, email, message, rating) VALUES (%s, %s, %s, %s)",
-                    (session["user"], email, message, rating)
-                )
-                
-            db.commit()
-            cursor.close()
-            db.close()
-            
+            feedback_store.add_feedback(db, session["user"], email, message, rating)
+
             flash("Thank you for your feedback! 💖", "success")
             return redirect(url_for("dashboard"))
             
@@ -541,31 +912,251 @@ def view_feedback():
         return redirect(url_for("dashboard"))
     
     try:
-        db = get_db()
-        
-        # SQLite compatible cursor
-        if os.environ.get('RENDER'):
-            cursor = db.cursor()
-            cursor.row_factory = sqlite3.Row  # ← Yahaan fix karein
-        else:
-            cursor = db.cursor(dictionary=True)
-            
-        cursor.execute("SELECT * FROM feedback ORDER BY created_at DESC")
-        feedback_list = cursor.fetchall()
-        cursor.close()
-        db.close()
-        
-        # SQLite Row objects to dictionaries convert karein
-        if os.environ.get('RENDER'):
-            feedback_list = [dict(row) for row in feedback_list]
-        
+        # Keyset pagination + optional filters (?rating=5&username=x&after=<token>)
+        rating = request.args.get("rating", type=int)
+        username = request.args.get("username", "").strip() or None
+        feedback_list, next_token = feedback_store.list_feedback(
+            db,
+            limit=request.args.get("limit", feedback_store.DEFAULT_PAGE_SIZE, type=int),
+            after=request.args.get("after"),
+            rating=rating,
+            username=username
+        )
+
         return render_template("view_feedback.html", 
                              feedback=feedback_list, 
+                             summary=feedback_store.rating_summary(db),
+                             next_token=next_token,
+                             filters={"rating": rating, "username": username or ""},
                              user=session["user"])
     except Exception as e:
         flash(f"Error loading feedback: {str(e)}", "danger")
         return redirect(url_for("dashboard"))
 
+# ---- H) Unemployment over time (Date column, see unemployment_series.py)
+def unemployment_query(dataset):
+    """
+    (series, metric position, echo of the query) for ?region=&area=&metric=
+    (region/area default to "All").  ValueError for a bad metric, LookupError
+    for an unknown region/area.
+    """
+    from unemployment_series import ALL
+    region = request.args.get("region", ALL).strip() or ALL
+    area = request.args.get("area", ALL).strip() or ALL
+    metric = request.args.get("metric", "unemployment_rate").strip()
+    store = dataset.unemployment
+    position = store.metric_index(metric)
+    series = store.series(region, area)
+    if series is None:
+        raise LookupError(
+            f"No monthly data for region '{region}', area '{area}'. "
+            f"Regions: {', '.join(store.regions)}; areas: {', '.join(store.areas)}"
+        )
+    return series, position, {"region": region, "area": area, "metric": metric}
+
+@app.route('/unemployment/range')
+def unemployment_range():
+    """
+    Mean/total/min/max of a metric over ?start=YYYY-MM&end=YYYY-MM (both
+    optional), e.g. ?area=Rural&start=2019-05&end=2020-06.
+    """
+    from unemployment_series import parse_month
+    try:
+        dataset = current_dataset()
+        series, metric, query = unemployment_query(dataset)
+        start, end = request.args.get("start"), request.args.get("end")
+        start = parse_month(start) if start else None
+        end = parse_month(end) if end else None
+        if start is not None and end is not None and start > end:
+            raise ValueError("'start' must not be after 'end'")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    try:
+        query.update(start=request.args.get("start"), end=request.args.get("end"))
+        cached = http_cache.not_modified("unemployment_range", query, dataset.fingerprint)
+        if cached is not None:
+            return cached
+        with span("aggregate"):
+            summary = series.range_summary(metric, start, end)
+        return jsonify(dict(query, **summary))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/unemployment/rolling')
+def unemployment_rolling():
+    """Monthly values and their trailing ?window= month mean (default 3)."""
+    from unemployment_series import format_month
+    try:
+        dataset = current_dataset()
+        series, metric, query = unemployment_query(dataset)
+        window = request.args.get("window", 3, type=int)
+        if not 1 <= window <= 24:
+            raise ValueError("'window' must be between 1 and 24 months")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    try:
+        query["window"] = window
+        cached = http_cache.not_modified("unemployment_rolling", query, dataset.fingerprint)
+        if cached is not None:
+            return cached
+        with span("aggregate"):
+            values = series.values(metric)
+            result = {
+                "months": [format_month(m) for m in series.months.tolist()],
+                "values": [None if v != v else round(float(v), 4) for v in values.tolist()],
+                "rolling_mean": series.rolling_mean(metric, window),
+            }
+        return jsonify(dict(query, **result))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/unemployment/changes')
+def unemployment_changes():
+    """Month-over-month change of a metric (absolute and percent)."""
+    from unemployment_series import format_month
+    try:
+        dataset = current_dataset()
+        series, metric, query = unemployment_query(dataset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    try:
+        cached = http_cache.not_modified("unemployment_changes", query, dataset.fingerprint)
+        if cached is not None:
+            return cached
+        with span("aggregate"):
+            values = series.values(metric)
+            deltas, percents = series.changes(metric)
+            result = {
+                "months": [format_month(m) for m in series.months.tolist()],
+                "values": [None if v != v else round(float(v), 4) for v in values.tolist()],
+                "delta": deltas,
+                "percent_change": percents,
+            }
+        return jsonify(dict(query, **result))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# -------------------------------
+# Report Routes
+# -------------------------------
+def report_status(job):
+    status = dict(job, status_url=url_for("report_status_view", job_id=job["id"]))
+    if job["status"] == "done":
+        status["download_url"] = url_for("download_report", job_id=job["id"])
+    return status
+
+def own_report(job_id):
+    """The job if the logged-in user submitted it (admin sees all), else None."""
+    job = get_report_queue().get(job_id)
+    if job is None or session.get("user") not in (job["username"], ADMIN_USERNAME):
+        return None
+    return job
+
+@app.route("/reports", methods=["POST"])
+def submit_report():
+    """
+    Queue a report, e.g. {"kind": "employment_analysis", "regions": ["Kerala"]}
+    (see reports.py).  Answers 202 with the job to poll, or 200 with an
+    existing job for the same report and dataset version.
+    """
+    if "user" not in session:
+        return jsonify({"error": "Please login first"}), 401
+    data = request.json or {}
+    kind = data.get("kind", "")
+    try:
+        import reports
+        dataset = current_dataset()
+        params = reports.validate(kind, {k: v for k, v in data.items() if k != "kind"}, dataset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        job, created = get_report_queue().submit(kind, params, dataset.fingerprint, session["user"])
+    except (report_jobs.QueueFull, report_jobs.NoWorkers) as e:
+        return render_unavailable(e)
+    return jsonify(report_status(job)), 202 if created else 200
+
+@app.route("/reports/<job_id>")
+def report_status_view(job_id):
+    if "user" not in session:
+        return jsonify({"error": "Please login first"}), 401
+    job = own_report(job_id)
+    if job is None:
+        return jsonify({"error": "No such report"}), 404
+    return jsonify(report_status(job))
+
+@app.route("/reports/<job_id>/download")
+def download_report(job_id):
+    if "user" not in session:
+        return jsonify({"error": "Please login first"}), 401
+    job = own_report(job_id)
+    if job is None:
+        return jsonify({"error": "No such report"}), 404
+    if job["status"] != "done":
+        return jsonify(dict(report_status(job), error=f"Report is {job['status']}")), 409
+    path = get_report_queue().artifact_path(job)
+    if not os.path.exists(path):
+        return jsonify({"error": "Report file has expired"}), 410
+    return send_file(os.path.abspath(path), mimetype="application/pdf", as_attachment=True,
+                     download_name=f"{job['kind']}-{job['id'][:8]}.pdf")
+
+# -------------------------------
+# Dataset Admin Routes
+# -------------------------------
+@app.route("/admin/reload_dataset", methods=["GET", "POST"])
+def reload_dataset():
+    """
+    GET: current dataset version and reload status.
+    POST: re-read Dataset.csv in the background and swap it in; requests
+    keep being served from the old snapshot until the new one is ready.
+    """
+    if session.get("user") != ADMIN_USERNAME:
+        return jsonify({"error": "Admin only"}), 403
+
+    datasets = get_datasets()
+    if request.method == "POST":
+        started = datasets.reload()
+        return jsonify(dict(datasets.status(), started=started)), 202
+
+    return jsonify(datasets.status())
+
+@app.route("/admin/upload_dataset", methods=["POST"])
+def upload_dataset():
+    """
+    Merge a CSV with Dataset.csv's columns into the dataset: rows with a
+    new key are added, rows whose values changed replace the old ones and
+    the rest are skipped.  Send it as the multipart field `file` or as the
+    raw request body.  Other workers pick the change up through the
+    watcher, as with any edit to Dataset.csv.
+    """
+    if session.get("user") != ADMIN_USERNAME:
+        return jsonify({"error": "Admin only"}), 403
+
+    import dataset_upload
+    upload = request.files.get("file")
+    path = None
+    try:
+        path = dataset_upload.save_upload(upload.stream if upload is not None else request.stream)
+        return jsonify(get_datasets().apply_upload(path))
+    except dataset_upload.UploadError as e:
+        return jsonify({"error": str(e), "problems": e.problems}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        dataset_upload.discard_upload(path)
+
+@app.route("/admin/db_stats")
+def db_stats():
+    """Connection pool metrics for this worker."""
+    if session.get("user") != ADMIN_USERNAME:
+        return jsonify({"error": "Admin only"}), 403
+    return jsonify(db.stats())
+
 # -------------------------------
 # Finally, run the app
 # -------------------------------
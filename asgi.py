@@ -0,0 +1,201 @@
+"""
+ASGI entry point: the same Flask app and routes, served by an async server.
+
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker      (gunicorn.conf.py still applies)
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Under `gunicorn app:app` (sync workers) a request holds its worker process
+for as long as it takes, so a slow MySQL query or chart render blocks
+everything queued behind it.  Here the event loop only holds the
+connections: every request runs the WSGI app on a thread of a bounded
+executor (ASGI_THREADS), where the DB calls and the wait on the render
+pool (render_pool.py) block that thread and nothing else.  Both release
+the GIL, so one process can keep ASGI_THREADS slow requests in flight.
+Give the DB pool (DB_POOL_SIZE) room for that many, or they queue there.
+
+Request bodies are streamed from the server into `wsgi.input` and
+response bodies back out chunk by chunk, so uploads and downloads are not
+buffered whole.  `python bench.py asgi` compares this with the sync
+workers under concurrent slow requests.
+"""
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from app import app as flask_app
+
+
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 64))
+
+
+class _RequestBody:
+    """`wsgi.input` that pulls http.request messages from the event loop as the app reads."""
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._more = True
+
+    def _fill(self, size):
+        while self._more and (size < 0 or len(self._buffer) < size):
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                self._more = False
+                break
+            self._buffer += message.get("body", b"")
+            self._more = message.get("more_body", False)
+
+    def _take(self, size):
+        size = len(self._buffer) if size < 0 else min(size, len(self._buffer))
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        size = -1 if size is None else size
+        self._fill(size)
+        return self._take(size)
+
+    def readline(self, size=-1):
+        while self._more and b"\n" not in self._buffer and (size < 0 or len(self._buffer) < size):
+            self._fill(len(self._buffer) + 1)
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        return self._take(end if size < 0 else min(end, size))
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b""))
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+def wsgi_environ(scope, body):
+    """The WSGI environ for an ASGI http `scope` (PEP 3333 strings: latin-1 over raw bytes)."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    path = scope.get("raw_path") or scope["path"].encode("utf-8")
+    root = scope.get("root_path", "").encode("utf-8")
+    if root and path.startswith(root):
+        path = path[len(root):]
+    path = path.split(b"?", 1)[0]
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root.decode("latin-1"),
+        "PATH_INFO": path.decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] if server[1] is not None else 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # The body ends where the server's messages end, so a chunked request
+        # (no Content-Length) is read through rather than taken as empty
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class AsgiAdapter:
+    """ASGI application that runs a WSGI app on a thread pool, one thread per in-flight request."""
+
+    def __init__(self, wsgi_app, threads=ASGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.served = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            await loop.run_in_executor(self.executor, self._run, scope, receive, send, loop)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.served += 1
+
+    def _run(self, scope, receive, send, loop):
+        """Call the WSGI app on this executor thread, relaying the response to the loop."""
+        def relay(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                   for name, value in headers]
+            return lambda data: send_body(data, True)
+
+        def send_body(data, more):
+            if not response.get("sent"):
+                relay({"type": "http.response.start", "status": response["status"],
+                       "headers": response["headers"]})
+                response["sent"] = True
+            if data or not more:
+                relay({"type": "http.response.body", "body": bytes(data), "more_body": more})
+
+        result = self.wsgi_app(wsgi_environ(scope, _RequestBody(receive, loop)), start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    send_body(chunk, True)
+            send_body(b"", False)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    def stats(self):
+        with self._lock:
+            return {"threads": self.threads, "in_flight": self.in_flight, "served": self.served}
+
+
+app = AsgiAdapter(flask_app)
+metrics.register_gauges("app_asgi", app.stats)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,674 @@
+"""
+Benchmark / load test for the routes, in-process through Flask's test client.
+
+    python bench.py run [--requests 200] [--threads 1] [--routes analyze,login]
+                        [--cold] [--render-workers 0] [--json out.json]
+    python bench.py scale [--factors 10 100 1000] [--requests 100]
+    python bench.py charts [--repeat 20] [--save-dir bench_data/charts]
+    python bench.py asgi [--clients 32] [--wsgi-workers 4] [--asgi-threads 64] [--db-latency-ms 50]
+
+`run` points the app at a throwaway SQLite database (RENDER=1), seeds a
+user and some feedback, stubs an admin session and then fires a seeded,
+realistic request mix at every route: state names are drawn in proportion
+to how many cities each state has, in mixed case, with some partial
+("PRADESH") and unknown names mixed in.  Per route it reports requests,
+5xx errors, throughput, p50/p95/p99 latency, mean response bytes and the
+process's peak RSS once the route has run.
+
+Charts render inline (--render-workers 0) so their cost and memory show up
+in this process.  The chart cache stays on, as in production; --cold turns
+it off so every chart is rendered.
+
+`scale` synthesizes 10x/100x/1000x copies of Dataset.csv (same state mix,
+suffixed city names, jittered numbers) under bench_data/, builds their
+columnar copies and runs `run` against each in a fresh interpreter, then
+prints one table per metric so the growth per route is easy to read.
+
+`charts` times the histogram renderer (charts.histogram_chart: NumPy bins +
+binned KDE + reused Figure) against the `sns.histplot(kde=True)` code it
+replaced, on real state/region slices and on synthetic 1k-1M value inputs,
+and reports how far apart the KDE curves and the PNGs' pixels are.
+
+`asgi` serves the same request mix to --clients concurrent clients twice:
+through --wsgi-workers sync workers (one request each at a time, like
+`gunicorn app:app`) and through the ASGI adapter (asgi.py) in one event
+loop.  --db-latency-ms adds that much to every database call, standing
+in for a remote MySQL, which is where holding a worker per request hurts.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+ROUTES = ["analyze", "analyze_json", "compare_states", "compare_states_json", "compare_states_batch",
+          "top_states", "analyze_state", "analyze_employment", "login", "view_feedback"]
+BENCH_USER = "bench_user"
+BENCH_PASSWORD = "bench-password"
+WORK_DIR = "bench_data"
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def log(message):
+    print(f"[bench] {message}", file=sys.stderr)
+
+
+# -------------------------------
+# Request mix
+# -------------------------------
+class Workload:
+    """Seeded generator of (method, url, kwargs, needs_session) per route."""
+
+    def __init__(self, snapshot, feedback_users, seed=0):
+        self.rng = random.Random(seed)
+        counts = snapshot.df["state_name"].astype(str).value_counts()
+        self.states = counts.index.tolist()
+        self.state_weights = counts.tolist()
+        self.words = sorted({word for name in self.states for word in name.split() if len(word) > 3})
+
+        if snapshot.region_columns:
+            regions = snapshot.df[snapshot.region_columns[0]].astype(str).value_counts()
+            self.regions, self.region_weights = regions.index.tolist(), regions.tolist()
+        else:
+            self.regions, self.region_weights = ["nowhere"], [1]
+        self.feedback_users = feedback_users
+
+    def state(self):
+        """A state as a user would type it: mostly valid, mixed case, some junk."""
+        roll = self.rng.random()
+        if roll < 0.05:
+            return self.rng.choice(["ATLANTIS", "GONDOR", "XYZ"])
+        name = self.rng.choices(self.states, self.state_weights)[0]
+        return self.rng.choice([name, name.lower(), name.title()])
+
+    def fragment(self):
+        """State name, or a partial one such as "pradesh" (literacy search)."""
+        if self.rng.random() < 0.15 and self.words:
+            return self.rng.choice(self.words).lower()
+        return self.state()
+
+    def region(self):
+        if self.rng.random() < 0.05:
+            return "Atlantis"
+        return self.rng.choices(self.regions, self.region_weights)[0]
+
+    def request(self, route):
+        if route == "analyze":
+            return "POST", "/analyze", {"json": {"state_name": self.fragment()}}, True
+        if route == "analyze_json":
+            return "POST", "/analyze?format=json", {"json": {"state_name": self.fragment()}}, True
+        if route in ("compare_states", "compare_states_json"):
+            body = {"state1": self.state(), "state2": self.state()}
+            url = "/compare_states" + ("?format=json" if route.endswith("_json") else "")
+            return "POST", url, {"json": body}, True
+        if route == "compare_states_batch":
+            if self.rng.random() < 0.2:
+                states = "all"
+            else:
+                states = [self.state() for _ in range(self.rng.randint(2, 10))]
+            return "POST", "/compare_states/batch", {"json": {"states": states}}, True
+        if route == "top_states":
+            return "GET", "/top_states", {}, True
+        if route == "analyze_state":
+            return "POST", "/analyze_state", {"json": {"state_name": self.state()}}, True
+        if route == "analyze_employment":
+            return "POST", "/analyze_employment", {"json": {"region_name": self.region()}}, True
+        if route == "login":
+            roll = self.rng.random()
+            if roll < 0.7:
+                form = {"username": BENCH_USER, "password": BENCH_PASSWORD}
+            elif roll < 0.9:
+                form = {"username": BENCH_USER, "password": "wrong"}
+            else:
+                form = {"username": f"nobody{self.rng.randint(0, 999)}", "password": "x"}
+            return "POST", "/", {"data": form}, False
+        if route == "view_feedback":
+            roll = self.rng.random()
+            if roll < 0.6:
+                query = ""
+            elif roll < 0.8:
+                query = f"?rating={self.rng.randint(1, 5)}"
+            else:
+                query = f"?username={self.rng.choice(self.feedback_users)}"
+            return "GET", "/view_feedback" + query, {}, True
+        raise ValueError(f"Unknown route: {route}")
+
+
+# -------------------------------
+# run: one dataset, every route
+# -------------------------------
+def _configure_env(args, db_path):
+    os.environ["RENDER"] = "1"
+    os.environ["SQLITE_PATH"] = db_path
+    os.environ["INIT_DB"] = "1"
+    os.environ["STARTUP_MODE"] = "eager"
+    os.environ["RENDER_POOL_WORKERS"] = str(args.render_workers)
+    # Every request comes from one address; don't let login throttling skew the numbers
+    os.environ.setdefault("LOGIN_IP_BURST", "1000000")
+    os.environ.setdefault("LOGIN_USER_BURST", "1000000")
+    os.environ.pop("CHART_CACHE_DIR", None)
+    if args.cold:
+        os.environ["CHART_CACHE_SIZE"] = "0"
+    if args.dataset:
+        os.environ["DATASET_PATH"] = args.dataset
+    if args.columns:
+        os.environ["DATASET_COLUMNS_DIR"] = args.columns
+
+
+def _seed_database(app_module, feedback_rows, rng):
+    from werkzeug.security import generate_password_hash
+    import feedback_store
+
+    db = app_module.db
+    if db.fetchone("SELECT id FROM users WHERE username=?", (BENCH_USER,)) is None:
+        db.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                   (BENCH_USER, generate_password_hash(BENCH_PASSWORD)))
+    users = [f"user{i}" for i in range(20)]
+    for i in range(feedback_rows):
+        feedback_store.add_feedback(db, rng.choice(users), f"u{i}@example.com",
+                                    f"Feedback message {i}", rng.randint(1, 5))
+    return users
+
+
+def _admin_client(app_module):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = app_module.ADMIN_USERNAME
+    return client
+
+
+def _bench_route(app_module, workload, route, requests, threads, warmup):
+    plans = [workload.request(route) for _ in range(warmup + requests)]
+    local = threading.local()
+
+    def fire(plan):
+        method, url, kwargs, needs_session = plan
+        if needs_session:
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = _admin_client(app_module)
+        else:
+            client = app_module.app.test_client()  # fresh cookie jar per login
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        body = response.get_data()
+        return time.perf_counter() - start, len(body), response.status_code
+
+    for plan in plans[:warmup]:
+        fire(plan)
+
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(fire, plans[warmup:]))
+    else:
+        results = [fire(plan) for plan in plans[warmup:]]
+    wall = time.perf_counter() - start
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    statuses = {}
+    for _, _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "route": route,
+        "requests": len(results),
+        "errors": sum(n for status, n in statuses.items() if status >= 500),
+        "statuses": statuses,
+        "throughput": len(results) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_bytes": sum(r[1] for r in results) / len(results) if results else 0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run(args):
+    routes = args.routes.split(",") if args.routes else ROUTES
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        _configure_env(args, os.path.join(tmp, "bench.db"))
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        import app as app_module
+        snapshot = app_module.current_dataset()
+        startup = {"load_s": time.perf_counter() - start, "rows": len(snapshot.df),
+                   "rss_before_mb": rss_before, "rss_loaded_mb": peak_rss_mb()}
+        log(f"app loaded in {startup['load_s']:.2f}s ({startup['rows']:,} rows)")
+
+        rng = random.Random(args.seed)
+        users = _seed_database(app_module, args.feedback_rows, rng)
+        workload = Workload(snapshot, users, seed=args.seed)
+        results = []
+        for route in routes:
+            result = _bench_route(app_module, workload, route, args.requests, args.threads, args.warmup)
+            results.append(result)
+            log(f"{route}: {result['throughput']:.1f} req/s, p95 {result['p95_ms']:.1f} ms")
+        app_module.render_pool.shutdown()
+
+    report = {"startup": startup, "routes": results, "threads": args.threads, "cold": args.cold}
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if not args.quiet:
+        print_report(report)
+    return report
+
+
+def print_report(report):
+    startup = report["startup"]
+    print(f"\n{startup['rows']:,} rows, loaded in {startup['load_s']:.2f}s, "
+          f"peak RSS {startup['rss_loaded_mb']:.0f} MB after load "
+          f"({report['threads']} thread(s), chart cache {'off' if report['cold'] else 'on'})")
+    header = f"{'route':<22}{'n':>6}{'5xx':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'bytes':>10}{'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in report["routes"]:
+        print(f"{r['route']:<22}{r['requests']:>6}{r['errors']:>5}{r['throughput']:>9.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['mean_bytes']:>10.0f}{r['peak_rss_mb']:>8.0f}")
+
+
+# -------------------------------
+# scale: synthesized NxDataset.csv
+# -------------------------------
+def synthesize(source, factor, out_path, seed=0):
+    """
+    Write `factor` copies of `source`: same states and columns, city names
+    suffixed with the copy number and float columns jittered by up to 1%,
+    so histograms are not just the original scaled up.
+    """
+    import numpy as np
+    import pandas as pd
+
+    base = pd.read_csv(source)
+    float_cols = [col for col in base.columns if base[col].dtype.kind == "f"]
+    rng = np.random.default_rng(seed)
+    for k in range(factor):
+        copy = base.copy()
+        if k:
+            copy["name_of_city"] = copy["name_of_city"].astype(str) + f" {k}"
+            for col in float_cols:
+                copy[col] = copy[col] * rng.uniform(0.99, 1.01, len(copy))
+        copy.to_csv(out_path, mode="w" if k == 0 else "a", header=k == 0, index=False)
+
+
+def scale(args):
+    import dataset
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    reports = {}
+    for factor in [1] + args.factors:
+        if factor == 1:
+            csv_path = dataset.DATASET_PATH
+        else:
+            csv_path = os.path.join(args.work_dir, f"Dataset_x{factor}.csv")
+            if not os.path.exists(csv_path):
+                log(f"synthesizing {factor}x -> {csv_path}")
+                synthesize(dataset.DATASET_PATH, factor, csv_path, args.seed)
+        columns_dir = os.path.join(args.work_dir, f"columns_x{factor}")
+        dataset.ensure_built(csv_path, columns_dir)
+
+        out_json = os.path.join(args.work_dir, f"report_x{factor}.json")
+        command = [sys.executable, os.path.abspath(__file__), "run", "--quiet",
+                   "--dataset", csv_path, "--columns", columns_dir, "--json", out_json,
+                   "--requests", str(args.requests), "--warmup", str(args.warmup),
+                   "--threads", str(args.threads), "--seed", str(args.seed)]
+        if args.routes:
+            command += ["--routes", args.routes]
+        if args.cold:
+            command.append("--cold")
+        log(f"running {factor}x")
+        subprocess.run(command, check=True)
+        with open(out_json) as fh:
+            reports[factor] = json.load(fh)
+
+    print_scale_report(reports)
+    return reports
+
+
+def print_scale_report(reports):
+    factors = sorted(reports)
+    columns = "".join(f"{f'{f}x':>11}" for f in factors)
+    print(f"\n{'rows':<22}" + "".join(f"{reports[f]['startup']['rows']:>11,}" for f in factors))
+    print(f"{'load s':<22}" + "".join(f"{reports[f]['startup']['load_s']:>11.2f}" for f in factors))
+    print(f"{'RSS after load MB':<22}" + "".join(f"{reports[f]['startup']['rss_loaded_mb']:>11.0f}" for f in factors))
+
+    routes = [r["route"] for r in reports[factors[0]]["routes"]]
+    for metric, label, fmt in [("p50_ms", "p50 ms", ".2f"), ("p95_ms", "p95 ms", ".2f"),
+                               ("p99_ms", "p99 ms", ".2f"), ("throughput", "req/s", ".1f"),
+                               ("mean_bytes", "bytes", ".0f"), ("peak_rss_mb", "peak RSS MB", ".0f")]:
+        print(f"\n{label:<22}{columns}")
+        for i, route in enumerate(routes):
+            print(f"{route:<22}" + "".join(f"{reports[f]['routes'][i][metric]:>11{fmt}}" for f in factors))
+
+
+# -------------------------------
+# charts: seaborn histplot vs the NumPy histogram engine
+# -------------------------------
+def seaborn_histogram(values, bins, title, xlabel, ylabel, figsize):
+    """The pre-engine renderer: a new Figure and sns.histplot(kde=True) per chart."""
+    import seaborn as sns
+    import charts
+
+    fig, ax = charts.new_figure(figsize)
+    sns.histplot(values, bins=bins, kde=True, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    curve = ax.lines[0].get_ydata() if ax.lines else None
+    return charts.figure_to_data_url(fig), curve
+
+
+def _png_pixels(data_url):
+    import base64
+    import io
+    from matplotlib.image import imread
+
+    return imread(io.BytesIO(base64.b64decode(data_url.split(",", 1)[1])), format="png")
+
+
+def _median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def chart_cases():
+    import numpy as np
+    import dataset
+    from dataset_manager import LITERACY_COLUMNS
+
+    df = dataset.load_dataset()[0]
+    literacy = df[LITERACY_COLUMNS].dropna()
+    cases = []
+    for state in literacy["state_name"].astype(str).value_counts().index[:3]:
+        values = literacy.loc[literacy["state_name"].astype(str) == state, "effective_literacy_rate_total"].to_numpy()
+        cases.append((f"literacy {state}", values, 30))
+    cases.append(("literacy all", literacy["effective_literacy_rate_total"].to_numpy(), 30))
+    employment = df["Estimated Unemployment Rate (%)"].dropna().to_numpy()
+    cases.append(("employment all", employment, 10))
+
+    rng = np.random.default_rng(0)
+    for n in (1_000, 10_000, 100_000, 1_000_000):
+        values = np.concatenate([rng.normal(70, 8, n // 2), 40 + rng.gamma(2.0, 6.0, n - n // 2)])
+        cases.append((f"synthetic n={n:,}", values, 30))
+    return cases
+
+
+def charts_bench(args):
+    import numpy as np
+    import charts
+    from chart_data import histogram
+
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+    header = (f"{'case':<28}{'n':>10}{'seaborn ms':>12}{'engine ms':>11}{'speedup':>9}"
+              f"{'kde max rel':>13}{'px differ':>11}")
+    print(header)
+    print("-" * len(header))
+    for label, values, bins in chart_cases():
+        labels = (label, "Value", "Frequency", (10, 5))
+        repeat = max(1, args.repeat if len(values) <= 100_000 else args.repeat // 5)
+
+        old_url, old_curve = seaborn_histogram(values, bins, *labels)
+        new_url = charts.histogram_chart(values, bins, *labels)
+        curve = histogram(values, bins)[2]
+        kde_diff = (float(np.max(np.abs(curve[1] - old_curve)) / np.max(old_curve))
+                    if curve is not None and old_curve is not None else 0.0)
+        old_px, new_px = _png_pixels(old_url), _png_pixels(new_url)
+        differ = (float(np.mean(np.abs(old_px - new_px).max(axis=-1) > 0.1))
+                  if old_px.shape == new_px.shape else 1.0)
+        if args.save_dir:
+            slug = "".join(c if c.isalnum() else "_" for c in label)
+            for name, url in (("seaborn", old_url), ("engine", new_url)):
+                with open(os.path.join(args.save_dir, f"{slug}.{name}.png"), "wb") as fh:
+                    import base64
+                    fh.write(base64.b64decode(url.split(",", 1)[1]))
+
+        old_ms = _median_ms(lambda: seaborn_histogram(values, bins, *labels), repeat)
+        new_ms = _median_ms(lambda: charts.histogram_chart(values, bins, *labels), repeat)
+        print(f"{label:<28}{len(values):>10,}{old_ms:>12.1f}{new_ms:>11.1f}{old_ms / new_ms:>8.1f}x"
+              f"{kde_diff:>13.1e}{differ:>10.2%}")
+
+
+# -------------------------------
+# asgi: sync WSGI workers vs the ASGI adapter
+# -------------------------------
+def _add_db_latency(db, seconds):
+    """Delay every query on `db` by `seconds` (a network round trip to a remote database)."""
+    def delayed(fn):
+        def call(*args, **kwargs):
+            time.sleep(seconds)
+            return fn(*args, **kwargs)
+        return call
+    db.fetchall = delayed(db.fetchall)
+    db.execute = delayed(db.execute)
+
+
+def _asgi_request(plan, cookie):
+    """(scope, body) for a Workload plan, built the way the test client would send it."""
+    from werkzeug.test import EnvironBuilder
+
+    method, url, kwargs, needs_session = plan
+    headers = {"Cookie": f"session={cookie}"} if needs_session else {}
+    environ = EnvironBuilder(path=url, method=method, headers=headers, **kwargs).get_environ()
+    body = environ["wsgi.input"].read()
+    header_list = [(key[5:].replace("_", "-").lower().encode(), value.encode())
+                   for key, value in environ.items() if key.startswith("HTTP_")]
+    for key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+        if environ.get(key):
+            header_list.append((key.replace("_", "-").lower().encode(), environ[key].encode()))
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method, "scheme": "http",
+        "path": environ["PATH_INFO"], "raw_path": environ["PATH_INFO"].encode("latin-1"),
+        "query_string": environ["QUERY_STRING"].encode("latin-1"), "root_path": "",
+        "headers": header_list, "server": ("localhost", 80), "client": ("127.0.0.1", 40000),
+    }
+    return scope, body
+
+
+async def _call_asgi(application, scope, body):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    response = {"status": None, "bytes": 0}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["bytes"] += len(message.get("body", b""))
+
+    await application(scope, receive, send)
+    return response["status"], response["bytes"]
+
+
+def _summary(mode, route, results, wall):
+    latencies = sorted(r[0] * 1000 for r in results)
+    return {
+        "mode": mode,
+        "route": route,
+        "requests": len(results),
+        "errors": sum(1 for r in results if r[2] is None or r[2] >= 500),
+        "throughput": len(results) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def _bench_wsgi(app_module, plans, clients, workers):
+    """`clients` closed-loop clients against `workers` sync workers (a semaphore around the app)."""
+    slots = threading.Semaphore(workers)
+    local = threading.local()
+
+    def client(share):
+        results = []
+        for method, url, kwargs, needs_session in share:
+            if needs_session:
+                test_client = getattr(local, "client", None)
+                if test_client is None:
+                    test_client = local.client = _admin_client(app_module)
+            else:
+                test_client = app_module.app.test_client()
+            start = time.perf_counter()
+            with slots:
+                response = test_client.open(url, method=method, **kwargs)
+                body = response.get_data()
+            results.append((time.perf_counter() - start, len(body), response.status_code))
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        shares = list(pool.map(client, [plans[i::clients] for i in range(clients)]))
+    return [r for share in shares for r in share], time.perf_counter() - start
+
+
+def _bench_asgi(application, requests, clients):
+    import asyncio
+
+    async def client(share):
+        results = []
+        for scope, body in share:
+            start = time.perf_counter()
+            status, size = await _call_asgi(application, scope, body)
+            results.append((time.perf_counter() - start, size, status))
+        return results
+
+    async def main():
+        return await asyncio.gather(*(client(requests[i::clients]) for i in range(clients)))
+
+    start = time.perf_counter()
+    shares = asyncio.run(main())
+    return [r for share in shares for r in share], time.perf_counter() - start
+
+
+def asgi_bench(args):
+    routes = args.routes.split(",") if args.routes else ["view_feedback", "top_states", "analyze_json", "login"]
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        _configure_env(args, os.path.join(tmp, "bench.db"))
+        os.environ["DB_POOL_SIZE"] = str(max(args.asgi_threads, args.wsgi_workers))
+        import app as app_module
+        import asgi
+        application = asgi.AsgiAdapter(app_module.app, threads=args.asgi_threads)
+        snapshot = app_module.current_dataset()
+        rng = random.Random(args.seed)
+        users = _seed_database(app_module, args.feedback_rows, rng)
+        if args.db_latency_ms > 0:
+            _add_db_latency(app_module.db, args.db_latency_ms / 1000)
+        cookie = app_module.app.session_interface.get_signing_serializer(app_module.app).dumps(
+            {"user": app_module.ADMIN_USERNAME})
+
+        workload = Workload(snapshot, users, seed=args.seed)
+        results = []
+        for route in routes:
+            plans = [workload.request(route) for _ in range(args.warmup + args.requests)]
+            _bench_wsgi(app_module, plans[:args.warmup], 1, 1)
+            wsgi = _summary(f"wsgi x{args.wsgi_workers}", route,
+                            *_bench_wsgi(app_module, plans[args.warmup:], args.clients, args.wsgi_workers))
+            requests = [_asgi_request(plan, cookie) for plan in plans[args.warmup:]]
+            asgi_result = _summary(f"asgi x{args.asgi_threads}", route,
+                                   *_bench_asgi(application, requests, args.clients))
+            results.extend([wsgi, asgi_result])
+            log(f"{route}: wsgi {wsgi['throughput']:.1f} req/s, asgi {asgi_result['throughput']:.1f} req/s")
+        application.executor.shutdown()
+        app_module.render_pool.shutdown()
+
+    report = {"clients": args.clients, "db_latency_ms": args.db_latency_ms, "routes": results}
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+    print(f"\n{args.clients} concurrent clients, +{args.db_latency_ms:g} ms per database call")
+    header = f"{'route':<18}{'server':<12}{'n':>6}{'5xx':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['route']:<18}{r['mode']:<12}{r['requests']:>6}{r['errors']:>5}{r['throughput']:>9.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's routes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--requests", type=int, default=200, help="timed requests per route")
+        p.add_argument("--warmup", type=int, default=10, help="untimed requests per route first")
+        p.add_argument("--threads", type=int, default=1, help="concurrent clients")
+        p.add_argument("--routes", help=f"comma-separated subset of: {','.join(ROUTES)}")
+        p.add_argument("--cold", action="store_true", help="disable the chart cache")
+        p.add_argument("--seed", type=int, default=0)
+
+    run_cmd = sub.add_parser("run", help="benchmark every route against one dataset")
+    common(run_cmd)
+    run_cmd.add_argument("--dataset", help="CSV to load (default: DATASET_PATH)")
+    run_cmd.add_argument("--columns", help="columnar directory for --dataset")
+    run_cmd.add_argument("--render-workers", type=int, default=0)
+    run_cmd.add_argument("--feedback-rows", type=int, default=500)
+    run_cmd.add_argument("--json", help="also write the results here")
+    run_cmd.add_argument("--quiet", action="store_true", help="no table (with --json)")
+
+    scale_cmd = sub.add_parser("scale", help="run against synthesized Nx copies of the dataset")
+    common(scale_cmd)
+    scale_cmd.add_argument("--factors", type=int, nargs="+", default=[10, 100, 1000])
+    scale_cmd.add_argument("--work-dir", default=WORK_DIR)
+
+    charts_cmd = sub.add_parser("charts", help="seaborn histplot vs the NumPy histogram engine")
+    charts_cmd.add_argument("--repeat", type=int, default=20, help="timed renders per case (median)")
+    charts_cmd.add_argument("--save-dir", help="write both PNGs of every case here")
+
+    asgi_cmd = sub.add_parser("asgi", help="sync WSGI workers vs the ASGI adapter, concurrent clients")
+    common(asgi_cmd)
+    asgi_cmd.add_argument("--clients", type=int, default=32, help="concurrent clients")
+    asgi_cmd.add_argument("--wsgi-workers", type=int, default=4, help="sync workers to compare against")
+    asgi_cmd.add_argument("--asgi-threads", type=int, default=64)
+    asgi_cmd.add_argument("--db-latency-ms", type=float, default=50.0, help="added to every database call")
+    asgi_cmd.add_argument("--render-workers", type=int, default=2)
+    asgi_cmd.add_argument("--feedback-rows", type=int, default=500)
+    asgi_cmd.add_argument("--dataset", help="CSV to load (default: DATASET_PATH)")
+    asgi_cmd.add_argument("--columns", help="columnar directory for --dataset")
+    asgi_cmd.add_argument("--json", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args)
+    elif args.command == "scale":
+        scale(args)
+    elif args.command == "asgi":
+        asgi_bench(args)
+    else:
+        charts_bench(args)
+
+
+if __name__ == "__main__":
+    main()
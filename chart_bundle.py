@@ -0,0 +1,217 @@
+"""
+Pre-rendered chart bundle: the per-state charts drawn ahead of time into
+static/charts/, so peak traffic is answered from files instead of
+matplotlib.
+
+    flask --app app build-charts [--workers 4] [--top-pairs 10]
+
+renders every /analyze and /analyze_state chart plus /compare_states for
+every pair of the most populous states, in parallel across processes, and
+writes them as
+
+    static/charts/
+        manifest.json            dataset fingerprint, code version, key -> file
+        <route>/<key>.png
+
+A chart is keyed on (route, params) exactly like the chart cache, so the
+routes look it up with the parameters they already have.  The bundle is
+only used while the manifest's dataset fingerprint and code version match
+the running app; after a dataset reload or deploy the routes fall back to
+rendering until the bundle is rebuilt.  Rebuilding skips charts that are
+already current and swaps the new directory in with a rename.  Running
+workers stat the manifest at most every CHART_BUNDLE_CHECK_INTERVAL seconds
+and pick up a bundle built by another process without a restart.
+"""
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from http_cache import CODE_VERSION
+from render_pool import resolve
+
+
+BUNDLE_DIR = os.getenv("CHART_BUNDLE_DIR", os.path.join("static", "charts"))
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+DATA_URL_PREFIX = "data:image/png;base64,"
+CHECK_INTERVAL = float(os.getenv("CHART_BUNDLE_CHECK_INTERVAL", 5))
+
+
+def bundle_key(route, params):
+    raw = json.dumps([route, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class ChartBundle:
+    """
+    Read side: finds a prebuilt chart for (route, params) of the current
+    dataset.  The manifest is re-read when its file changes, checked at
+    most every `check_interval` seconds.
+    """
+
+    def __init__(self, directory=BUNDLE_DIR, check_interval=CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _manifest_stat(self):
+        try:
+            st = os.stat(os.path.join(self.directory, MANIFEST_NAME))
+            return st.st_ino, st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def reload(self):
+        """Re-read the manifest (after a rebuild); a missing one means an empty bundle."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._stat = self._manifest_stat()
+            try:
+                with open(os.path.join(self.directory, MANIFEST_NAME), "r", encoding="utf-8") as fh:
+                    manifest = json.load(fh)
+            except (OSError, ValueError):
+                manifest = {}
+            if manifest.get("format") != FORMAT_VERSION or manifest.get("code_version") != CODE_VERSION:
+                manifest = {}
+            self.fingerprint = manifest.get("fingerprint")
+            self.charts = manifest.get("charts", {})
+            self.reloads += 1
+
+    def _check(self):
+        """Reload if the manifest file changed since it was read (one stat per check_interval)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._manifest_stat() != self._stat:
+            self.reload()
+
+    def path(self, route, params, fingerprint):
+        """Absolute path of the bundled PNG, or None when it is not in the bundle."""
+        self._check()
+        entry = self.charts.get(bundle_key(route, params)) if fingerprint == self.fingerprint else None
+        path = os.path.abspath(os.path.join(self.directory, entry["file"])) if entry else None
+        if path is None or not os.path.isfile(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def relative_path(self, path):
+        """`path` (from path()) relative to the bundle directory, as a URL path."""
+        return os.path.relpath(path, os.path.abspath(self.directory)).replace(os.sep, "/")
+
+    def data_url(self, route, params, fingerprint):
+        """The bundled chart as the data URL the routes return, or None."""
+        path = self.path(route, params, fingerprint)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as fh:
+                return DATA_URL_PREFIX + base64.b64encode(fh.read()).decode()
+        except OSError:
+            return None
+
+    def stats(self):
+        return {"charts": len(self.charts), "hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+
+# -------------------------------
+# Build
+# -------------------------------
+def _render_png(fn, args):
+    """Run a chart renderer (in a build worker) and return the PNG bytes."""
+    data_url = resolve(fn)(*args)
+    if data_url is None:
+        return None
+    return base64.b64decode(data_url[len(DATA_URL_PREFIX):])
+
+
+def _preload():
+    import charts  # noqa: F401
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def build(charts, fingerprint, out_dir=BUNDLE_DIR, workers=None, force=False, log=print):
+    """
+    Render `charts` -- an iterable of (route, params, renderer, args) -- into
+    `out_dir` using `workers` processes (default: one per core).  Charts
+    already in a current bundle are copied over instead of re-rendered
+    unless `force`.  Returns the manifest.
+    """
+    started = time.perf_counter()
+    old = read_manifest(out_dir)
+    reusable = {}
+    if (not force and old and old.get("format") == FORMAT_VERSION and old.get("fingerprint") == fingerprint
+            and old.get("code_version") == CODE_VERSION):
+        reusable = old.get("charts", {})
+
+    staging = f"{out_dir.rstrip(os.sep)}.building-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    entries, pending = {}, []
+    for route, params, renderer, args in charts:
+        key = bundle_key(route, params)
+        entry = {"route": route, "params": params, "file": f"{route}/{key}.png"}
+        previous = reusable.get(key)
+        if previous is not None and os.path.isfile(os.path.join(out_dir, previous["file"])):
+            os.makedirs(os.path.join(staging, route), exist_ok=True)
+            shutil.copy2(os.path.join(out_dir, previous["file"]), os.path.join(staging, entry["file"]))
+            entries[key] = dict(entry, bytes=previous.get("bytes"))
+        else:
+            pending.append((key, entry, renderer, args))
+
+    workers = workers or os.cpu_count() or 1
+    log(f"[charts] rendering {len(pending)} charts ({len(entries)} reused) with {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_preload) as executor:
+        futures = [(key, entry, executor.submit(_render_png, renderer, args))
+                   for key, entry, renderer, args in pending]
+        for key, entry, future in futures:
+            png = future.result()
+            if png is None:
+                continue
+            os.makedirs(os.path.join(staging, entry["route"]), exist_ok=True)
+            with open(os.path.join(staging, entry["file"]), "wb") as fh:
+                fh.write(png)
+            entries[key] = dict(entry, bytes=len(png))
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "code_version": CODE_VERSION,
+        "built_at": time.time(),
+        "charts": entries,
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1)
+
+    # Swap the finished bundle in; readers notice on their next manifest check
+    retired = f"{out_dir.rstrip(os.sep)}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, retired)
+    os.replace(staging, out_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+
+    size = sum(entry["bytes"] or 0 for entry in entries.values())
+    log(f"[charts] {len(entries)} charts, {size / 1e6:.1f} MB in {out_dir}/ "
+        f"({time.perf_counter() - started:.1f}s)")
+    return manifest
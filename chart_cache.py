@@ -0,0 +1,171 @@
+"""
+Rendered-chart cache for the analysis routes.
+
+Charts are a pure function of (route, request parameters, dataset), so a
+rendered PNG can be reused until Dataset.csv changes.  Entries are keyed on
+a hash of all three and kept in a size-bounded LRU in memory, with an
+optional on-disk copy so a restarted worker does not start cold.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+
+def dataset_fingerprint(path, chunk_size=1 << 20):
+    """Return a sha256 hex digest of the file contents at `path`."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """
+    Thread-safe LRU of rendered charts (base64 data URLs).
+
+    Eviction is bounded both by entry count and by total payload bytes.
+    When `disk_dir` is set, entries are also written to
+    `<disk_dir>/<fingerprint>/<key>.txt` and read back on a memory miss.
+    The fingerprint may start as None (dataset not loaded yet); nothing is
+    cached until `set_fingerprint` is called.
+    """
+
+    def __init__(self, fingerprint, max_entries=256, max_bytes=64 * 1024 * 1024, disk_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.fingerprint = fingerprint
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._drop_stale_disk()
+
+    # -------------------------------
+    # Keys
+    # -------------------------------
+    def make_key(self, route, params):
+        raw = json.dumps([route, params, self.fingerprint], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # -------------------------------
+    # Lookup / store
+    # -------------------------------
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._store(key, value)
+        return value
+
+    def put(self, key, value):
+        self._store(key, value)
+        self._write_disk(key, value)
+
+    def get_or_render(self, route, params, render, fingerprint=None):
+        """
+        Return the cached chart for (route, params), calling `render()` on a
+        miss.  A `None` result from `render` is passed through uncached, as
+        is anything rendered from a dataset version (`fingerprint`) other
+        than the one the cache currently holds -- e.g. a request that
+        started just before a reload.
+        """
+        if self.fingerprint is None or (fingerprint is not None and fingerprint != self.fingerprint):
+            return render()
+        key = self.make_key(route, params)
+        value = self.get(key)
+        if value is None:
+            value = render()
+            if value is not None and key == self.make_key(route, params):
+                self.put(key, value)
+        return value
+
+    def set_fingerprint(self, fingerprint):
+        """Switch to a new dataset version, dropping every cached chart."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            self._bytes = 0
+        self._drop_stale_disk()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "fingerprint": self.fingerprint,
+            }
+
+    def _store(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    # -------------------------------
+    # Disk persistence (best effort, failures are ignored)
+    # -------------------------------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, self.fingerprint, key + ".txt")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="ascii") as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="ascii") as fh:
+                fh.write(value)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _drop_stale_disk(self):
+        """Remove on-disk entries written for other dataset versions."""
+        if not self.disk_dir or self.fingerprint is None or not os.path.isdir(self.disk_dir):
+            return
+        for name in os.listdir(self.disk_dir):
+            if name != self.fingerprint:
+                shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
@@ -0,0 +1,138 @@
+"""
+Chart data for client-side drawing (the `?format=json` mode of the
+analysis routes).
+
+Instead of rasterizing a PNG, these helpers return the numbers a chart is
+made of -- histogram edges/counts, a KDE curve, bar labels/values -- as
+plain lists that `jsonify` can serialize.  The KDE matches what
+`sns.histplot(kde=True)` draws: Gaussian kernel, Scott's bandwidth,
+evaluated over the data range and scaled to the count axis.
+
+`histogram()` is the same computation as arrays; charts.py draws the PNG
+histograms from it instead of going through seaborn.  Small inputs sum the
+kernels directly; large ones use a binned KDE (linear binning onto a fine
+grid + one FFT convolution), which is O(n + G log G) instead of O(n * G).
+"""
+import math
+
+import numpy as np
+
+
+KDE_GRID_SIZE = 200
+# Above this many (value, grid point) pairs, switch to the binned FFT KDE
+KDE_DIRECT_LIMIT = 200_000
+# Kernel truncated at this many bandwidths (Gaussian tail < 1e-6 beyond)
+KDE_TRUNCATE = 5.0
+
+
+def _clean(values):
+    """Float array with NaN/inf dropped."""
+    arr = np.asarray(values, dtype=float)
+    return arr[np.isfinite(arr)]
+
+
+def _to_list(arr):
+    """List of floats with NaN mapped to None (valid JSON)."""
+    return [None if isinstance(v, float) and math.isnan(v) else v for v in np.asarray(arr, dtype=float).tolist()]
+
+
+def scott_bandwidth(values):
+    """Kernel standard deviation used by scipy's gaussian_kde (Scott's rule)."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    return float(np.std(values, ddof=1)) * n ** (-1.0 / 5)
+
+
+def kde_direct(values, bandwidth, grid):
+    """Gaussian KDE density at `grid`, summing every kernel (exact)."""
+    z = (grid[:, None] - values[None, :]) / bandwidth
+    return np.exp(-0.5 * z * z).sum(axis=1) / (len(values) * bandwidth * math.sqrt(2 * math.pi))
+
+
+def kde_binned(values, bandwidth, grid):
+    """
+    Gaussian KDE density at `grid` via linear binning + FFT convolution.
+    The fine grid is spaced at most bandwidth/8 apart (min 1024 points), so
+    binning error stays well below what a 10-30 bin chart can show.
+    """
+    lo = min(grid[0], values.min()) - KDE_TRUNCATE * bandwidth
+    hi = max(grid[-1], values.max()) + KDE_TRUNCATE * bandwidth
+    m = max(1024, min(1 << 16, 1 << math.ceil(math.log2((hi - lo) / (bandwidth / 8)))))
+    delta = (hi - lo) / (m - 1)
+
+    # Linear binning: each value splits its weight between its two grid neighbours
+    pos = (values - lo) / delta
+    left = np.minimum(np.floor(pos).astype(np.intp), m - 2)
+    frac = pos - left
+    weights = np.bincount(left, 1.0 - frac, minlength=m) + np.bincount(left + 1, frac, minlength=m)
+
+    half = min(m - 1, int(math.ceil(KDE_TRUNCATE * bandwidth / delta)))
+    offsets = np.arange(-half, half + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (len(values) * bandwidth * math.sqrt(2 * math.pi))
+
+    size = 1 << math.ceil(math.log2(m + 2 * half))
+    smoothed = np.fft.irfft(np.fft.rfft(weights, size) * np.fft.rfft(kernel, size), size)[half:half + m]
+    return np.interp(grid, lo + delta * np.arange(m), np.maximum(smoothed, 0.0))
+
+
+def kde_arrays(values, bin_width, grid_size=KDE_GRID_SIZE):
+    """
+    (grid, curve): Gaussian KDE sampled on `grid_size` points between min
+    and max, scaled by n * bin_width so it overlays a count histogram.
+    None when the data has no spread (seaborn skips the curve too).
+    """
+    values = _clean(values)
+    bandwidth = scott_bandwidth(values)
+    if bandwidth <= 0:
+        return None
+    grid = np.linspace(values.min(), values.max(), grid_size)
+    if len(values) * grid_size <= KDE_DIRECT_LIMIT:
+        density = kde_direct(values, bandwidth, grid)
+    else:
+        density = kde_binned(values, bandwidth, grid)
+    return grid, density * len(values) * bin_width
+
+
+def kde_curve(values, bin_width, grid_size=KDE_GRID_SIZE):
+    """kde_arrays as JSON-ready lists ({"x", "y"}), or None."""
+    curve = kde_arrays(values, bin_width, grid_size)
+    if curve is None:
+        return None
+    return {"x": _to_list(curve[0]), "y": _to_list(curve[1])}
+
+
+def histogram(values, bins, kde=True):
+    """
+    `(edges, counts, kde)` as arrays, where kde is `(grid, curve)` or None.
+    Same numbers as sns.histplot(values, bins=bins, kde=True) draws.
+    """
+    values = _clean(values)
+    counts, edges = np.histogram(values, bins=bins)
+    curve = None
+    if kde and len(values):
+        bin_width = float(edges[1] - edges[0]) if len(edges) > 1 else 0.0
+        curve = kde_arrays(values, bin_width)
+    return edges, counts, curve
+
+
+def histogram_data(values, bins, kde=True):
+    """Bin edges, counts and (optionally) the KDE overlay for `values`."""
+    edges, counts, curve = histogram(values, bins, kde)
+    payload = {"edges": _to_list(edges), "counts": counts.tolist()}
+    if kde:
+        payload["kde"] = {"x": _to_list(curve[0]), "y": _to_list(curve[1])} if curve is not None else None
+    return payload
+
+
+def bar_data(labels, values):
+    return {"labels": [str(label) for label in labels], "values": _to_list(values)}
+
+
+def grouped_bar_data(frame, x, y):
+    """
+    Mean of `y` per `x` in order of first appearance -- the bar heights
+    `sns.barplot(x=x, y=y, data=frame)` draws.
+    """
+    means = frame.groupby(x, sort=False, observed=True)[y].mean()
+    return bar_data(means.index, means.values)
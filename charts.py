@@ -0,0 +1,167 @@
+"""
+Chart renderers built on matplotlib's object-oriented Figure API.
+
+Each function takes plain data (arrays, lists, small frames), draws onto
+its own Figure and returns a `data:image/png;base64,...` URL.  Nothing
+touches pyplot's global state, so the functions are safe to call from
+several threads and picklable for the render pool (see render_pool.py).
+
+Drawing, tight_layout, savefig (Agg rasterizing + PNG compression) and the
+base64 step are timed as the plot/layout/savefig/encode spans.
+
+The two histogram charts skip seaborn: bins and KDE come from
+chart_data.histogram() and are drawn into a per-thread `HistogramTemplate`
+whose Figure, bars and line are created once and only updated per request.
+They look the same as the `sns.histplot(..., kde=True)` charts they replace
+(`python bench.py charts` compares the two).
+"""
+import base64
+import io
+import threading
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+import numpy as np
+import seaborn as sns
+
+from chart_data import histogram
+from spans import span
+
+
+COMPARISON_PALETTES = ["viridis", "coolwarm", "magma", "cubehelix"]
+
+
+def new_figure(figsize, nrows=1, ncols=1):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(nrows, ncols)
+    return fig, axes
+
+
+def figure_to_data_url(fig, tight=False):
+    if tight:
+        with span("layout"):
+            fig.tight_layout()
+    img = io.BytesIO()
+    with span("savefig"):
+        fig.savefig(img, format='png')
+    with span("encode"):
+        return "data:image/png;base64," + base64.b64encode(img.getvalue()).decode()
+
+
+class HistogramTemplate:
+    """
+    A Figure with `bins` bars and a KDE line, redrawn in place for each
+    chart.  Styled like seaborn's histplot(kde=True): C0 bars at alpha 0.5
+    with thin black edges, an opaque C0 line, y axis pinned at 0.
+    """
+
+    def __init__(self, figsize, bins):
+        self.fig, self.ax = new_figure(figsize)
+        color = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"][0]
+        self.bars = self.ax.bar(
+            np.arange(bins), np.zeros(bins), np.ones(bins), align="edge",
+            facecolor=to_rgba(color, 0.5),
+            edgecolor=matplotlib.rcParams["patch.edgecolor"],
+        )
+        (self.line,) = self.ax.plot([], [], color=color)
+        self.line.sticky_edges.y[:] = (0, np.inf)
+
+    def draw(self, edges, counts, curve, title, xlabel, ylabel):
+        for bar, left, width, height in zip(self.bars, edges[:-1], np.diff(edges), counts):
+            bar.set_x(left)
+            bar.set_width(width)
+            bar.set_height(height)
+        if curve is not None:
+            self.line.set_data(curve[0], curve[1])
+        self.line.set_visible(curve is not None)
+
+        ax = self.ax
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        # Limits from the data we already have: what autoscale_view would
+        # pick (default margins, y pinned at 0) without relim walking every patch
+        left, right = float(edges[0]), float(edges[-1])
+        top = max(float(counts.max()) if len(counts) else 0.0,
+                  float(curve[1].max()) if curve is not None else 0.0)
+        if right > left and top > 0:
+            x_margin, y_margin = ax.margins()
+            ax.set_xlim(left - x_margin * (right - left), right + x_margin * (right - left))
+            ax.set_ylim(0, top * (1 + y_margin))
+        else:
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+
+        # seaborn's edge width: a tenth of a bar's width in points, at most 1
+        bin_points = 72 / self.fig.dpi * abs(
+            ax.transData.transform((edges[1], 0))[0] - ax.transData.transform((edges[0], 0))[0]
+        )
+        linewidth = min(0.1 * bin_points, matplotlib.rcParams["patch.linewidth"])
+        for bar in self.bars:
+            bar.set_linewidth(linewidth)
+        return self.fig
+
+
+_templates = threading.local()
+
+
+def histogram_template(figsize, bins):
+    """This thread's template for (figsize, bins), created on first use."""
+    cache = getattr(_templates, "cache", None)
+    if cache is None:
+        cache = _templates.cache = {}
+    key = (figsize, bins)
+    if key not in cache:
+        cache[key] = HistogramTemplate(figsize, bins)
+    return cache[key]
+
+
+def histogram_chart(values, bins, title, xlabel, ylabel, figsize):
+    """Histogram + KDE overlay of `values` as a PNG data URL (no seaborn)."""
+    with span("aggregate"):
+        edges, counts, curve = histogram(values, bins)
+    with span("plot"):
+        fig = histogram_template(figsize, bins).draw(edges, counts, curve, title, xlabel, ylabel)
+    return figure_to_data_url(fig)
+
+
+def literacy_histogram(values, state_name):
+    """/analyze: literacy rate distribution for one state (or partial match)."""
+    return histogram_chart(values, 30, f"Literacy Rate Distribution in {state_name}",
+                           "Total Literacy Rate (%)", "Frequency", (10, 5))
+
+
+def comparison_chart(states, metrics):
+    """
+    /compare_states: 2x2 bar grid.  `metrics` is a list of
+    (label, values) pairs, one per subplot.
+    """
+    with span("plot"):
+        fig, axes = new_figure((12, 10), 2, 2)
+        for ax, (label, values), palette in zip(axes.flat, metrics, COMPARISON_PALETTES):
+            sns.barplot(x=states, y=values, ax=ax, palette=palette)
+            ax.set_title(f"{label} Comparison")
+            ax.set_ylabel(label)
+    return figure_to_data_url(fig, tight=True)
+
+
+def employment_bar_chart(frame, state_name):
+    """/analyze_state: 'Estimated Employed' by Region for a state's top rows."""
+    with span("plot"):
+        fig, ax = new_figure((10, 5))
+        sns.barplot(x="Region", y="Estimated Employed", data=frame, color="blue", alpha=0.7, ax=ax)
+        ax.set_xlabel("Region")
+        ax.set_ylabel("Estimated Employed")
+        ax.set_title(f"Employment in {state_name}")
+        ax.tick_params(axis="x", labelrotation=45)
+    return figure_to_data_url(fig, tight=True)
+
+
+def employment_histogram(values, region_name, column):
+    """/analyze_employment: distribution of the employment column in a region."""
+    return histogram_chart(values, 10, f"Employment Distribution in {region_name}",
+                           column, "Frequency", (10, 6))
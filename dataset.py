@@ -0,0 +1,563 @@
+"""
+Dataset loading: cleaned Dataset.csv <-> typed columnar directory.
+
+`python dataset.py build` parses Dataset.csv once, applies the cleaning the
+app needs (stripped headers, upper-cased `state_name`, trimmed string
+values), stores every column in its compact form (see compact_frame) and
+writes one `.npy` file per column plus `manifest.json`:
+
+    dataset_columns/
+        manifest.json            column names, kinds, dtypes, source fingerprint
+        <n>.npy                  numeric values, or int codes for string columns
+        <n>.values.json          distinct values for string columns
+
+Workers then load those arrays instead of parsing CSV, falling back to the
+CSV only when the directory is missing or was built from a different
+version of Dataset.csv.
+
+With DATASET_MMAP=1 the numeric columns are memory-mapped read-only rather
+than copied, so every gunicorn worker attaches to the same page-cache pages
+(gunicorn.conf.py builds the directory once in the master before forking).
+`python dataset.py memory-report --workers N` shows what that saves, and
+`python dataset.py dtype-report` what the compact dtypes save over pandas'
+defaults.
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from chart_cache import dataset_fingerprint
+
+
+DATASET_PATH = os.getenv("DATASET_PATH", "Dataset.csv")
+COLUMNAR_DIR = os.getenv("DATASET_COLUMNS_DIR", "dataset_columns")
+SHARED_MMAP = os.getenv("DATASET_MMAP") == "1"
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 2
+
+# Repeated labels, kept as pandas categoricals once loaded
+CATEGORICAL_COLUMNS = ["state_name", "state", "Region", "Area", "Frequency", "Date"]
+# "lat,lon" text in the CSV, two float columns (in its place) once loaded
+LOCATION_COLUMN = "location"
+COORDINATE_COLUMNS = ["latitude", "longitude"]
+# String columns whose values carry stray padding in the source CSV
+TRIMMED_COLUMNS = ["name_of_city", "Date", "Frequency"]
+# What identifies a row: uploads append a changed row again rather than
+# rewriting the file, and the last row for a key wins (drop_superseded)
+KEY_COLUMNS = ["name_of_city", "state_name", "Region", "Date", "Area"]
+
+
+# -------------------------------
+# Cleaning
+# -------------------------------
+def clean_frame(df):
+    """Normalize a raw Dataset.csv frame the way every route expects it."""
+    df.columns = df.columns.str.strip()
+    df["state_name"] = df["state_name"].str.strip().str.upper()
+    for col in TRIMMED_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].str.strip()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def downcast(series):
+    """
+    `series` as int32/float32 when that holds every value exactly, else
+    unchanged.  Rates like 82.49 have no exact float32 and stay float64,
+    so no value the routes return changes.
+    """
+    values = series.to_numpy()
+    if values.dtype.kind in "iu" and values.dtype.itemsize > 4:
+        limits = np.iinfo(np.int32)
+        if not len(values) or (values.min() >= limits.min and values.max() <= limits.max):
+            return series.astype(np.int32)
+    elif values.dtype == np.float64:
+        with np.errstate(over="ignore"):
+            narrow = values.astype(np.float32)
+        if ((narrow == values) | np.isnan(values)).all():
+            return series.astype(np.float32)
+    return series
+
+
+def split_location(df):
+    """Replace LOCATION_COLUMN by float COORDINATE_COLUMNS in the same place (NaN where malformed)."""
+    if LOCATION_COLUMN not in df.columns:
+        return df
+    from geo_index import parse_locations
+    lat, lon = parse_locations(df[LOCATION_COLUMN])
+    at = df.columns.get_loc(LOCATION_COLUMN)
+    df = df.drop(columns=LOCATION_COLUMN)
+    df.insert(at, COORDINATE_COLUMNS[0], lat)
+    df.insert(at + 1, COORDINATE_COLUMNS[1], lon)
+    return df
+
+
+def compact_frame(df):
+    """A cleaned frame with its location split and numbers downcast (see downcast)."""
+    df = split_location(df)
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col].dtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = downcast(df[col])
+    return df
+
+
+def source_columns(columns):
+    """The Dataset.csv header for a loaded frame's `columns`."""
+    columns = list(columns)
+    if COORDINATE_COLUMNS[0] in columns:
+        at = columns.index(COORDINATE_COLUMNS[0])
+        columns = [col for col in columns if col not in COORDINATE_COLUMNS]
+        columns.insert(at, LOCATION_COLUMN)
+    return columns
+
+
+def source_frame(df):
+    """Loaded rows laid out as Dataset.csv rows again (coordinates joined back into location)."""
+    if not set(COORDINATE_COLUMNS) <= set(df.columns):
+        return df
+    lat, lon = (df[col].to_numpy(dtype=float) for col in COORDINATE_COLUMNS)
+    location = [np.nan if a != a or b != b else f"{a!r},{b!r}" for a, b in zip(lat.tolist(), lon.tolist())]
+    at = df.columns.get_loc(COORDINATE_COLUMNS[0])
+    df = df.drop(columns=COORDINATE_COLUMNS)
+    df.insert(at, LOCATION_COLUMN, location)
+    return df
+
+
+def column_view(df, columns):
+    """A frame of some of `df`'s columns that shares their arrays instead of copying them."""
+    # copy=False keeps each column as its own block over the original array
+    return pd.DataFrame({col: df[col] for col in columns}, copy=False)
+
+
+def drop_superseded(df):
+    """Keep only the last row for each KEY_COLUMNS key (Dataset.csv is appended to by uploads)."""
+    keys = [col for col in KEY_COLUMNS if col in df.columns]
+    if not keys:
+        return df
+    superseded = df.duplicated(keys, keep="last")
+    return df[~superseded].reset_index(drop=True) if superseded.any() else df
+
+
+def read_csv(path=DATASET_PATH):
+    return drop_superseded(compact_frame(clean_frame(pd.read_csv(path))))
+
+
+# -------------------------------
+# Columnar format
+# -------------------------------
+def source_stat(path):
+    """What the manifest records to tell, without hashing, that `path` hasn't changed since."""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class ColumnarWriter:
+    """
+    Writes the columnar format one chunk at a time, so frames larger than
+    memory can be converted.  Chunks are spooled to raw files (numeric
+    values, or int32 codes into a running dictionary for string columns)
+    and turned into `.npy` files on `close()`; the finished directory
+    replaces `out_dir` with a rename.  The temp and old directories get
+    unique names, so writers in the same process never share them.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.tmp_dir = self._sibling("tmp")
+        self.columns = None
+        self.rows = 0
+        self._kinds = {}
+        self._segments = {}     # numeric column -> [(dtype, count)] as spooled
+        self._codes = {}        # string column -> {value: code}
+        self._spools = {}
+
+    def _sibling(self, tag):
+        parent, name = os.path.split(os.path.abspath(self.out_dir))
+        os.makedirs(parent, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f"{name}.{tag}", dir=parent)
+
+    def _spool_path(self, i):
+        return os.path.join(self.tmp_dir, f"{i}.spool")
+
+    @staticmethod
+    def _kind_of(dtype):
+        if isinstance(dtype, pd.CategoricalDtype):
+            return "category"
+        if dtype == object:
+            return "string"
+        return "numeric"
+
+    @staticmethod
+    def _string_codes(series, lookup):
+        local_codes, uniques = pd.factorize(series)
+        mapping = np.array([lookup.setdefault(str(v), len(lookup)) for v in uniques] + [-1], dtype=np.int32)
+        return mapping[local_codes]  # local code -1 (missing) picks the trailing -1
+
+    def append(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            for i, col in enumerate(self.columns):
+                self._kinds[col] = self._kind_of(chunk[col].dtype)
+                if self._kinds[col] == "numeric":
+                    self._segments[col] = []
+                else:
+                    self._codes[col] = {}
+                self._spools[col] = open(self._spool_path(i), "wb")
+        elif list(chunk.columns) != self.columns:
+            raise ValueError(f"Chunk columns {list(chunk.columns)} do not match {self.columns}")
+
+        for col in self.columns:
+            series = chunk[col]
+            if self._kinds[col] == "numeric" and self._kind_of(series.dtype) != "numeric":
+                # e.g. all-NaN (float) in the first chunk, text further down
+                self._promote(col, self._kind_of(series.dtype))
+            if self._kinds[col] == "numeric":
+                arr = np.ascontiguousarray(series.to_numpy())
+                self._segments[col].append((arr.dtype, len(arr)))
+            else:
+                arr = self._string_codes(series, self._codes[col])
+            arr.tofile(self._spools[col])
+        self.rows += len(chunk)
+
+    def _promote(self, col, kind):
+        """
+        Turn a numeric column into a coded one once a later chunk brings
+        text.  The numbers spooled so far are re-coded as `str(value)`,
+        the same thing a text column does with a stray number; NaN stays
+        missing.
+        """
+        i = self.columns.index(col)
+        spool = self._spool_path(i)
+        self._spools[col].close()
+        lookup = self._codes[col] = {}
+        offset = 0
+        with open(spool + ".promote", "wb") as out:
+            for seg_dtype, count in self._segments.pop(col):
+                values = np.fromfile(spool, dtype=seg_dtype, count=count, offset=offset)
+                self._string_codes(pd.Series(values), lookup).tofile(out)
+                offset += count * seg_dtype.itemsize
+        os.replace(spool + ".promote", spool)
+        self._spools[col] = open(spool, "ab")
+        self._kinds[col] = kind
+
+    def _finish_column(self, i, col):
+        path = os.path.join(self.tmp_dir, f"{i}.npy")
+        spool = self._spool_path(i)
+        entry = {"name": col, "file": f"{i}.npy", "kind": self._kinds[col]}
+
+        if entry["kind"] == "numeric":
+            dtype = np.result_type(*[d for d, _ in self._segments[col]])
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(self.rows,))
+            pos = offset = 0
+            for seg_dtype, count in self._segments[col]:
+                out[pos:pos + count] = np.fromfile(spool, dtype=seg_dtype, count=count, offset=offset)
+                pos += count
+                offset += count * seg_dtype.itemsize
+            entry["dtype"] = str(dtype)
+        else:
+            values = list(self._codes[col])
+            remap = None
+            if entry["kind"] == "category":
+                # Sorted categories, same as astype("category") on the whole column
+                order = sorted(range(len(values)), key=values.__getitem__)
+                remap = np.empty(len(values) + 1, dtype=np.int32)
+                remap[np.array(order, dtype=np.int64)] = np.arange(len(values), dtype=np.int32)
+                remap[-1] = -1
+                values = [values[j] for j in order]
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=np.int32, shape=(self.rows,))
+            step = 1 << 20
+            for pos in range(0, self.rows, step):
+                codes = np.fromfile(spool, dtype=np.int32, count=min(step, self.rows - pos), offset=pos * 4)
+                out[pos:pos + len(codes)] = codes if remap is None else remap[codes]
+            entry["values"] = f"{i}.values.json"
+            entry["dtype"] = "category" if remap is not None else "object"
+            with open(os.path.join(self.tmp_dir, entry["values"]), "w", encoding="utf-8") as fh:
+                json.dump(values, fh)
+        out.flush()
+        del out
+        os.remove(spool)
+        return entry
+
+    def close(self, source_path, fingerprint, stat=None):
+        """
+        Finish the columns and swap the directory in.  `stat` is the
+        source's size/mtime when the frame was taken; it defaults to now,
+        which is only right if the source can't have changed since.
+        """
+        for fh in self._spools.values():
+            fh.close()
+        columns = [self._finish_column(i, col) for i, col in enumerate(self.columns or [])]
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "rows": self.rows,
+            "columns": columns,
+            "source": os.path.abspath(source_path),
+            "source_fingerprint": fingerprint,
+            "source_stat": stat or (source_stat(source_path) if os.path.exists(source_path) else None),
+        }
+        with open(os.path.join(self.tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=1)
+
+        old_dir = self._sibling("old")
+        if os.path.isdir(self.out_dir):
+            os.rename(self.out_dir, os.path.join(old_dir, "columns"))
+        os.rename(self.tmp_dir, self.out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return manifest
+
+
+def write_columnar(df, out_dir, source_path, fingerprint, stat=None):
+    """Write `df` to `out_dir` atomically (build in a temp dir, then rename)."""
+    writer = ColumnarWriter(out_dir)
+    writer.append(df)
+    return writer.close(source_path, fingerprint, stat)
+
+
+def read_manifest(columns_dir=COLUMNAR_DIR):
+    try:
+        with open(os.path.join(columns_dir, MANIFEST_NAME), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == FORMAT_VERSION else None
+
+
+def read_columnar(columns_dir, manifest, mmap_mode=None):
+    data = {}
+    for entry in manifest["columns"]:
+        arr = np.load(os.path.join(columns_dir, entry["file"]), mmap_mode=mmap_mode)
+        if entry["kind"] == "numeric":
+            data[entry["name"]] = arr
+            continue
+        with open(os.path.join(columns_dir, entry["values"]), encoding="utf-8") as fh:
+            values = json.load(fh)
+        if entry["kind"] == "category":
+            data[entry["name"]] = pd.Categorical.from_codes(np.asarray(arr), categories=values)
+        else:
+            lookup = np.array(values + [np.nan], dtype=object)
+            data[entry["name"]] = lookup[np.asarray(arr)]  # code -1 picks the trailing NaN
+    # copy=False keeps each (possibly memory-mapped) array as its own block
+    return pd.DataFrame(data, columns=[entry["name"] for entry in manifest["columns"]], copy=False)
+
+
+def is_fresh(manifest, source_path):
+    """
+    True when `manifest` was built from the current `source_path`.
+    A missing source counts as fresh (the columnar copy is all we have);
+    size/mtime are checked first so the usual case never hashes the file.
+    """
+    if not os.path.exists(source_path):
+        return True
+    if manifest.get("source_stat") == source_stat(source_path):
+        return True
+    return dataset_fingerprint(source_path) == manifest.get("source_fingerprint")
+
+
+# -------------------------------
+# Entry points
+# -------------------------------
+def load_dataset(source_path=DATASET_PATH, columns_dir=COLUMNAR_DIR, shared=SHARED_MMAP):
+    """
+    Return `(df, fingerprint)`, preferring the columnar build and
+    falling back to parsing `source_path` when it is missing or stale.
+    With `shared`, numeric columns are read-only memory maps of the build.
+    """
+    manifest = read_manifest(columns_dir)
+    if manifest is not None and is_fresh(manifest, source_path):
+        mmap_mode = "r" if shared else None
+        return read_columnar(columns_dir, manifest, mmap_mode), manifest["source_fingerprint"]
+
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Dataset file not found: '{source_path}'")
+    if manifest is not None:
+        print(f"[dataset] {columns_dir} is stale, reading {source_path} (run: python dataset.py build)",
+              file=sys.stderr)
+    return read_csv(source_path), dataset_fingerprint(source_path)
+
+
+def build(source_path=DATASET_PATH, out_dir=COLUMNAR_DIR):
+    df = read_csv(source_path)
+    return write_columnar(df, out_dir, source_path, dataset_fingerprint(source_path))
+
+
+def ensure_built(source_path=DATASET_PATH, out_dir=COLUMNAR_DIR):
+    """Build the columnar copy unless an up-to-date one already exists."""
+    manifest = read_manifest(out_dir)
+    if manifest is not None and is_fresh(manifest, source_path):
+        return manifest
+    return build(source_path, out_dir)
+
+
+# -------------------------------
+# Memory report
+# -------------------------------
+def _is_mapped(arr):
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+def _process_memory():
+    """Rss/Pss/Shared/Private (bytes) of this process, where /proc allows."""
+    fields = {"Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"}
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    usage[key] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return usage
+
+
+def memory_report(df, workers=1):
+    """
+    Split `df`'s memory into file-backed (shared by every worker attached to
+    the same build) and private bytes, and project the total for `workers`
+    processes with and without sharing.
+    """
+    shared = private = 0
+    for col in df.columns:
+        series = df[col]
+        nbytes = int(series.memory_usage(index=False, deep=True))
+        if not isinstance(series.dtype, pd.CategoricalDtype) and _is_mapped(series.to_numpy()):
+            shared += nbytes
+        else:
+            private += nbytes
+    private += int(df.index.memory_usage())
+    total = shared + private
+    return {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "workers": workers,
+        "shared_bytes": shared,
+        "private_bytes": private,
+        "total_bytes_copied": total * workers,
+        "total_bytes_shared": shared + private * workers,
+        "saved_bytes": shared * (workers - 1) if workers > 1 else 0,
+        "process": _process_memory(),
+    }
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):9.2f} MB"
+
+
+def print_memory_report(copied, attached):
+    workers = attached["workers"]
+    print(f"Dataset: {attached['rows']} rows x {attached['columns']} columns, {workers} worker(s)")
+    print(f"  private copy per worker : {_mb(copied['private_bytes'])}")
+    print(f"  mmap-attached per worker: {_mb(attached['private_bytes'])} private"
+          f" + {_mb(attached['shared_bytes'])} shared")
+    print(f"  total, private copies   : {_mb(copied['total_bytes_copied'])}")
+    print(f"  total, shared mapping   : {_mb(attached['total_bytes_shared'])}")
+    print(f"  saved across workers    : {_mb(attached['saved_bytes'])}")
+    for key, value in attached["process"].items():
+        print(f"  process {key:<16}: {_mb(value)}")
+
+
+def _values(series):
+    return series.cat.codes.to_numpy() if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+
+
+def _kb(n):
+    return f"{n / 1024:9.1f} KB"
+
+
+def dtype_report(source_path=DATASET_PATH, literacy_columns=None):
+    """
+    Per-column bytes of `source_path` read with pandas' default dtypes
+    ("before") and as the app loads it ("after"), plus what the literacy
+    subset costs as a dropna() copy and as a column view.
+    """
+    before = pd.read_csv(source_path)
+    before.columns = before.columns.str.strip()
+    after = read_csv(source_path)
+    columns = []
+    for col in before.columns:
+        stored = COORDINATE_COLUMNS if col == LOCATION_COLUMN and COORDINATE_COLUMNS[0] in after else [col]
+        columns.append({
+            "column": col,
+            "before_dtype": str(before[col].dtype),
+            "before_bytes": int(before[col].memory_usage(index=False, deep=True)),
+            "after_dtype": "/".join(str(after[name].dtype) for name in stored),
+            "after_bytes": sum(int(after[name].memory_usage(index=False, deep=True)) for name in stored),
+        })
+    report = {
+        "rows": len(after),
+        "columns": columns,
+        "before_bytes": int(before.memory_usage(deep=True).sum()),
+        "after_bytes": int(after.memory_usage(deep=True).sum()),
+    }
+    if literacy_columns:
+        copy = after[literacy_columns].dropna()
+        view = column_view(after, literacy_columns)
+        report["literacy_copy_bytes"] = int(copy.memory_usage(deep=True).sum())
+        report["literacy_view_shares_arrays"] = all(
+            np.shares_memory(_values(after[col]), _values(view[col])) for col in literacy_columns
+        )
+    return report
+
+
+def print_dtype_report(report):
+    print(f"Dataset: {report['rows']} rows")
+    print(f"  {'column':<42}{'before':>23}{'after':>31}")
+    for entry in report["columns"]:
+        print(f"  {entry['column']:<42}{entry['before_dtype']:>10} {_kb(entry['before_bytes'])}"
+              f"{entry['after_dtype']:>18} {_kb(entry['after_bytes'])}")
+    saved = report["before_bytes"] - report["after_bytes"]
+    print(f"  total: {_kb(report['before_bytes'])} -> {_kb(report['after_bytes'])}"
+          f" ({100 * saved / report['before_bytes']:.0f}% less)")
+    if "literacy_copy_bytes" in report:
+        print(f"  literacy subset: {_kb(report['literacy_copy_bytes'])} as a dropna() copy, "
+              f"{'0 (shares the columns)' if report['literacy_view_shares_arrays'] else 'copied'} as a view")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build/inspect the columnar copy of Dataset.csv")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="convert the CSV to the columnar format")
+    build_cmd.add_argument("--source", default=DATASET_PATH)
+    build_cmd.add_argument("--out", default=COLUMNAR_DIR)
+    report_cmd = sub.add_parser("memory-report", help="per-worker memory, copied vs memory-mapped")
+    report_cmd.add_argument("--source", default=DATASET_PATH)
+    report_cmd.add_argument("--dir", default=COLUMNAR_DIR)
+    report_cmd.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 4)))
+    dtype_cmd = sub.add_parser("dtype-report", help="per-column memory, pandas defaults vs compact dtypes")
+    dtype_cmd.add_argument("--source", default=DATASET_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        manifest = build(args.source, args.out)
+        print(f"Wrote {manifest['rows']} rows x {len(manifest['columns'])} columns to {args.out} "
+              f"in {time.perf_counter() - start:.2f}s")
+    elif args.command == "memory-report":
+        manifest = ensure_built(args.source, args.dir)
+        copied = memory_report(read_columnar(args.dir, manifest), args.workers)
+        attached_df = read_columnar(args.dir, manifest, mmap_mode="r")
+        attached_df.select_dtypes("number").sum()  # fault the mapped pages in
+        print_memory_report(copied, memory_report(attached_df, args.workers))
+    elif args.command == "dtype-report":
+        from dataset_manager import LITERACY_COLUMNS
+        print_dtype_report(dtype_report(args.source, LITERACY_COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Hot-reloadable dataset.
+
+Everything the routes derive from Dataset.csv -- the frame, the literacy
+subset, per-state aggregates and row indexes -- lives in one immutable
+`DatasetSnapshot`.  `DatasetManager` builds a replacement snapshot in a
+background thread and swaps it in with a single reference assignment, so a
+request that grabbed `datasets.current` keeps a consistent view and never
+waits on a load.
+
+Only the states whose rows actually changed are re-aggregated; every other
+state's row in the aggregate table is carried over from the old snapshot.
+The row lookups (state and literacy indexes, region index, city geo index,
+unemployment series) are still rebuilt over the whole frame on every swap.
+
+With DATASET_MMAP=1 an upload's merged frame is private to the worker
+that took it until the columnar copy has been rewritten; that worker then
+remaps it, and the other workers' watchers wait for the rewrite (up to
+DATASET_COLUMNAR_WAIT seconds) before reloading, so they map the new files
+instead of each parsing the CSV into memory of their own.
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import dataset_upload
+from chart_cache import dataset_fingerprint
+from dataset import (COLUMNAR_DIR, DATASET_PATH, SHARED_MMAP, column_view, load_dataset, read_columnar,
+                     read_manifest, source_columns, source_stat, write_columnar)
+from geo_index import CityGeoIndex
+from state_aggregates import StateAggregates
+from state_index import StateIndex
+from unemployment_series import UnemploymentSeries
+
+
+# How long a watcher waits for the shared columnar copy to catch up with a
+# changed source before it gives up and parses the CSV
+COLUMNAR_WAIT = float(os.getenv("DATASET_COLUMNAR_WAIT", 60))
+
+# For literacy analysis (filter columns)
+LITERACY_COLUMNS = [
+    'name_of_city', 'state_name', 'population_total',
+    'effective_literacy_rate_total', 'effective_literacy_rate_male',
+    'effective_literacy_rate_female'
+]
+
+
+def state_hashes(df, index, names=None):
+    """Order-independent content hash of each state's rows (wrapping uint64 sum)."""
+    names = index.names if names is None else [name for name in names if name in index]
+    if not names:
+        return {}
+    positions = [index.exact(name) for name in names]
+    row_hashes = pd.util.hash_pandas_object(df.iloc[np.concatenate(positions)], index=False).to_numpy()
+    bounds = np.cumsum([0] + [len(p) for p in positions])
+    return {name: int(row_hashes[bounds[i]:bounds[i + 1]].sum(dtype=np.uint64)) for i, name in enumerate(names)}
+
+
+class DatasetSnapshot:
+    """
+    A loaded dataset plus every per-request lookup structure built from it.
+    An upload passes the states it touched (`changed_states`) and the
+    rows' identity hashes, so neither is recomputed over the whole frame.
+    """
+
+    def __init__(self, df, fingerprint, previous=None, changed_states=None, row_hashes=None):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self._row_hashes = row_hashes
+
+        # The literacy columns, sharing df's arrays.  Literacy analysis uses
+        # the rows with all of them present: the positions literacy_index holds.
+        self.df_literacy = column_view(df, LITERACY_COLUMNS)
+        complete = np.logical_and.reduce([df[col].notna().to_numpy() for col in LITERACY_COLUMNS])
+        self.state_index = StateIndex(df["state_name"])
+        self.literacy_index = StateIndex(df["state_name"].where(complete))
+        if previous is not None and changed_states is not None:
+            self.state_hashes = {
+                name: value for name, value in previous.state_hashes.items()
+                if name in self.state_index and name not in changed_states
+            }
+            self.state_hashes.update(state_hashes(df, self.state_index, changed_states))
+        else:
+            self.state_hashes = state_hashes(df, self.state_index)
+
+        # Per-state sums/means, valid state set and rankings
+        if previous is None:
+            self.changed_states = set(self.state_index.names)
+            self.aggregates = StateAggregates(df)
+        elif changed_states is not None:
+            self.changed_states = set(changed_states)
+            self.aggregates = previous.aggregates.updated(df, self.state_index, self.changed_states)
+        else:
+            self.changed_states = {
+                name for name in set(self.state_hashes) | set(previous.state_hashes)
+                if self.state_hashes.get(name) != previous.state_hashes.get(name)
+            }
+            self.aggregates = previous.aggregates.updated(df, self.state_index, self.changed_states)
+
+        # /analyze_employment picks its region/employment columns by name
+        self.region_columns = [col for col in df.columns if 'region' in col.lower() or 'state' in col.lower() or 'area' in col.lower()]
+        self.employed_cols = [col for col in df.columns if 'employed' in col.lower() or 'employment' in col.lower()]
+        self.region_index = (
+            StateIndex(df[self.region_columns[0]].astype(str).str.lower()) if self.region_columns else None
+        )
+
+        # Cities by location for the /cities/* routes
+        self.geo_index = CityGeoIndex(df)
+
+        # Monthly Region x Area series with prefix sums for /unemployment/*
+        self.unemployment = UnemploymentSeries(df)
+
+    def row_hashes(self):
+        """(key hashes, row hashes) per row, see dataset_upload.row_hashes (computed on first upload)."""
+        if self._row_hashes is None:
+            self._row_hashes = dataset_upload.row_hashes(self.df)
+        return self._row_hashes
+
+
+class DatasetManager:
+    """
+    Owns the current snapshot.  `reload()` loads the file again in the
+    background; `watch()` polls the file and reloads when it changes.
+    Each gunicorn worker has its own manager, so use the watcher (or hit
+    the reload endpoint once per worker) to refresh all of them.
+    """
+
+    def __init__(self, source_path=DATASET_PATH, columns_dir=COLUMNAR_DIR, shared=SHARED_MMAP):
+        self.source_path = source_path
+        self.columns_dir = columns_dir
+        self.shared = shared
+        self._current = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self.reloading = False
+        self.last_error = None
+        self.reload_count = 0
+        self.upload_count = 0
+        self._watched_stat = None
+        self._columnar_lock = threading.Lock()
+        self._columnar_pending = None
+        self._columnar_thread = None
+
+    @property
+    def current(self):
+        if self._current is None:
+            with self._reload_lock:
+                if self._current is None:
+                    self._current = self._load(previous=None)
+                    self._notify(self._current)
+        return self._current
+
+    def on_swap(self, callback):
+        """Call `callback(snapshot)` after the first load and every successful swap."""
+        self._listeners.append(callback)
+
+    def _notify(self, snapshot):
+        for callback in self._listeners:
+            callback(snapshot)
+
+    def _load(self, previous):
+        df, fingerprint = load_dataset(self.source_path, self.columns_dir, self.shared)
+        if previous is not None and fingerprint == previous.fingerprint:
+            return previous
+        return DatasetSnapshot(df, fingerprint, previous)
+
+    def reload_now(self):
+        """Load, rebuild changed aggregates and swap; returns the new snapshot."""
+        with self._reload_lock:
+            self.reloading = True
+            try:
+                previous = self._current
+                snapshot = self._load(previous)
+                if snapshot is not previous:
+                    self._current = snapshot
+                    self.reload_count += 1
+                    self._notify(snapshot)
+                self.last_error = None
+                return snapshot
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                self.reloading = False
+
+    def reload(self):
+        """Start a background reload; returns False if one is already running."""
+        if self.reloading:
+            return False
+        thread = threading.Thread(target=self._reload_quietly, name="dataset-reload", daemon=True)
+        thread.start()
+        return True
+
+    def _reload_quietly(self):
+        try:
+            self.reload_now()
+        except Exception as e:
+            print(f"[dataset] reload failed: {e}", file=sys.stderr)
+
+    def apply_upload(self, upload_path, chunk_rows=dataset_upload.UPLOAD_CHUNK_ROWS):
+        """
+        Merge the new and changed rows of the CSV at `upload_path` into the
+        live dataset (see dataset_upload.py): append them to the source
+        file and swap in a snapshot that re-aggregates only the states they
+        touch.  Returns a summary; raises dataset_upload.UploadError if the
+        upload does not fit the dataset.
+        """
+        started = time.perf_counter()
+        self.current  # loaded before taking the lock current() itself takes
+        while True:
+            # Diff outside the lock (it reads the whole upload); if a reload or
+            # another upload swapped the snapshot meanwhile, diff against that one
+            previous = self._current
+            live_keys, live_hashes = previous.row_hashes()
+            delta = dataset_upload.diff(upload_path, previous.df, live_keys, live_hashes, chunk_rows)
+            summary = dict(delta.counts, upload=os.path.basename(upload_path))
+            if not len(delta):
+                return dict(summary, states=[], fingerprint=previous.fingerprint, total_rows=len(previous.df),
+                            seconds=round(time.perf_counter() - started, 3))
+
+            with self._reload_lock:
+                if self._current is not previous:
+                    continue
+                self._check_appendable(previous.df)
+                df, kept = dataset_upload.merged_frame(previous.df, delta)
+                changed_states = delta.new_states | set(
+                    previous.df["state_name"].iloc[delta.replaced].dropna().astype(str)
+                )
+                dataset_upload.append_csv(self.source_path, delta.rows)
+                fingerprint = dataset_fingerprint(self.source_path)
+                stat = source_stat(self.source_path)
+                self._watched_stat = self._source_stat()
+
+                row_hashes = (np.concatenate([live_keys[kept], delta.key_hashes]),
+                              np.concatenate([live_hashes[kept], delta.hashes]))
+                snapshot = DatasetSnapshot(df, fingerprint, previous, changed_states, row_hashes)
+                self._current = snapshot
+                self.upload_count += 1
+                self._notify(snapshot)
+                # Keep the columnar copy (if one is used) in step, from memory
+                if read_manifest(self.columns_dir) is not None:
+                    self._queue_columnar(df, fingerprint, stat)
+            break
+
+        return dict(summary, states=sorted(changed_states), fingerprint=fingerprint, total_rows=len(df),
+                    seconds=round(time.perf_counter() - started, 3))
+
+    def _queue_columnar(self, df, fingerprint, stat):
+        """
+        Have the columnar copy rewritten from `df`.  One thread does the
+        writing; uploads that land while it is busy replace what it writes
+        next, so only the latest frame is written and never an older one
+        after it.  `stat` is the source's stat taken with `df`.
+        """
+        with self._columnar_lock:
+            self._columnar_pending = (df, fingerprint, stat)
+            if self._columnar_thread is None:
+                self._columnar_thread = threading.Thread(target=self._write_columnar, name="dataset-columnar",
+                                                         daemon=True)
+                self._columnar_thread.start()
+
+    def _write_columnar(self):
+        while True:
+            with self._columnar_lock:
+                job, self._columnar_pending = self._columnar_pending, None
+                if job is None:
+                    self._columnar_thread = None
+                    return
+            df, fingerprint, stat = job
+            try:
+                write_columnar(df, self.columns_dir, self.source_path, fingerprint, stat)
+                if self.shared:
+                    self._remap(fingerprint)
+            except Exception as e:
+                print(f"[dataset] columnar rewrite failed: {e}", file=sys.stderr)
+
+    def _remap(self, fingerprint):
+        """Swap the merged in-memory frame for the rewritten, memory-mapped columns."""
+        with self._reload_lock:
+            previous = self._current
+            manifest = read_manifest(self.columns_dir)
+            stale = manifest is None or manifest["source_fingerprint"] != fingerprint
+            if previous is None or previous.fingerprint != fingerprint or stale:
+                return  # a newer upload or reload has taken over
+            df = read_columnar(self.columns_dir, manifest, mmap_mode="r")
+            snapshot = DatasetSnapshot(df, fingerprint, previous, set(), previous._row_hashes)
+            self._current = snapshot
+            self._notify(snapshot)
+
+    def _check_appendable(self, df):
+        """Rows are appended in the frame's (source) column order, so the CSV's header must match it."""
+        try:
+            header = pd.read_csv(self.source_path, nrows=0).columns.str.strip()
+        except (OSError, ValueError) as e:
+            raise dataset_upload.UploadError(f"Cannot append to {self.source_path}: {e}")
+        if list(header) != source_columns(df.columns):
+            raise dataset_upload.UploadError(f"{self.source_path} no longer matches the loaded dataset; reload first")
+
+    def _source_stat(self):
+        try:
+            return source_stat(self.source_path)
+        except OSError:
+            return None
+
+    def _columnar_behind(self, stat):
+        """True while the shared columnar copy exists but was not built from the source as of `stat`."""
+        if not self.shared:
+            return False
+        manifest = read_manifest(self.columns_dir)
+        return manifest is not None and manifest.get("source_stat") != stat
+
+    def watch(self, interval):
+        """
+        Poll the source file every `interval` seconds and reload on change
+        (not on our own uploads).  With shared columns, wait for another
+        worker's columnar rewrite first (see _columnar_behind).
+        """
+        def loop():
+            self._watched_stat = self._source_stat()
+            waited = 0.0
+            while True:
+                time.sleep(interval)
+                now = self._source_stat()
+                if now is None or now == self._watched_stat:
+                    continue
+                if waited < COLUMNAR_WAIT and self._columnar_behind(now):
+                    waited += interval
+                    continue
+                waited = 0.0
+                self._watched_stat = now
+                self._reload_quietly()
+
+        threading.Thread(target=loop, name="dataset-watch", daemon=True).start()
+
+    def status(self):
+        snapshot = self._current
+        return {
+            "fingerprint": snapshot.fingerprint if snapshot else None,
+            "rows": len(snapshot.df) if snapshot else None,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "changed_states": sorted(snapshot.changed_states) if snapshot else [],
+            "reloading": self.reloading,
+            "reload_count": self.reload_count,
+            "upload_count": self.upload_count,
+            "last_error": self.last_error,
+        }
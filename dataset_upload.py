@@ -0,0 +1,252 @@
+"""
+Incremental dataset uploads (POST /admin/upload_dataset).
+
+An uploaded CSV with Dataset.csv's columns is streamed to UPLOAD_DIR (a
+scratch directory of its own, not the tracked uploads/) and read back
+UPLOAD_CHUNK_ROWS rows at a time.  Every chunk is cleaned like
+Dataset.csv, validated against the live frame's columns and types, and
+compared with the live rows by key (dataset.KEY_COLUMNS):
+
+    unchanged   key known, same values       skipped
+    changed     key known, different values  replaces the live row
+    new         key not in the live data     appended
+
+Rows are compared through 64-bit hashes of their key and of their values,
+kept per row alongside the snapshot, so of the upload only the changed and
+new rows are ever held in memory -- however large it is.  Nothing is
+applied until the whole file has validated.
+
+DatasetManager.apply_upload() then appends those rows to Dataset.csv (the
+loader keeps the last row per key, so a changed row simply appears again)
+and swaps in a snapshot built from the live frame plus the delta, with
+only the affected states re-aggregated.  No CSV is re-parsed, but building
+that frame (merged_frame) copies the live frame once, so an upload briefly
+needs about twice the dataset's memory.  The uploaded file is deleted once
+it has been applied or rejected; its rows live on in Dataset.csv.
+"""
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from dataset import (KEY_COLUMNS, LOCATION_COLUMN, clean_frame, downcast, source_columns, source_frame,
+                     split_location)
+
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "dataset_uploads")
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", 50_000))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 1 << 30))
+MAX_PROBLEMS = 20
+
+
+class UploadError(ValueError):
+    """The upload was rejected; `problems` lists what was wrong (first MAX_PROBLEMS)."""
+
+    def __init__(self, message, problems=()):
+        super().__init__(message)
+        self.problems = list(problems)
+
+
+def save_upload(stream, upload_dir=UPLOAD_DIR, max_bytes=MAX_UPLOAD_BYTES, block=1 << 20):
+    """Copy `stream` to a new file in `upload_dir`, block by block; returns its path."""
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"upload-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.csv")
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            for data in iter(lambda: stream.read(block), b""):
+                size += len(data)
+                if size > max_bytes:
+                    raise UploadError(f"Upload is larger than {max_bytes} bytes")
+                out.write(data)
+    except BaseException:
+        os.remove(path)
+        raise
+    if size == 0:
+        os.remove(path)
+        raise UploadError("Upload is empty")
+    return path
+
+
+def discard_upload(path):
+    """Delete a saved upload once it has been applied or rejected."""
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+# -------------------------------
+# Row identity
+# -------------------------------
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype)
+
+
+def row_hashes(df):
+    """
+    (key hashes, row hashes) of every row, as uint64 arrays.  Numbers hash
+    as float64 and everything else as plain objects, so a row reads the
+    same whether it came from the live frame (categoricals, int columns)
+    or from an upload chunk.
+    """
+    canonical = pd.DataFrame({
+        col: df[col].astype("float64") if _is_numeric(df[col].dtype) else df[col].astype(object)
+        for col in df.columns
+    })
+    keys = [col for col in KEY_COLUMNS if col in canonical.columns]
+    return (
+        pd.util.hash_pandas_object(canonical[keys], index=False).to_numpy(),
+        pd.util.hash_pandas_object(canonical, index=False).to_numpy(),
+    )
+
+
+# -------------------------------
+# Reading + validation
+# -------------------------------
+def _check_header(path, live):
+    header = pd.read_csv(path, nrows=0).columns
+    names = [str(col).strip() for col in header]
+    expected = source_columns(live.columns)
+    missing = [col for col in expected if col not in names]
+    unknown = [col for col in names if col not in expected]
+    if missing or unknown or len(set(names)) != len(names):
+        problems = [f"missing column: {col}" for col in missing] + [f"unknown column: {col}" for col in unknown]
+        if len(set(names)) != len(names):
+            problems.append("duplicate column names")
+        raise UploadError("Upload columns do not match the dataset", problems[:MAX_PROBLEMS])
+    # Non-numeric columns stay text, so "2011" in a text column is not read as a number
+    return {raw: str for raw, name in zip(header, names)
+            if name == LOCATION_COLUMN or not _is_numeric(live[name].dtype)}
+
+
+def _conform(chunk, live, first_row, problems):
+    """Clean `chunk` like Dataset.csv and store its numeric columns like the live ones."""
+    chunk = split_location(clean_frame(chunk))[list(live.columns)]
+    for col in live.columns:
+        dtype = live[col].dtype
+        if not _is_numeric(dtype):
+            continue
+        values = chunk[col]
+        if not _is_numeric(values.dtype):
+            numbers = pd.to_numeric(values, errors="coerce")
+            bad = numbers.isna() & values.notna() & values.astype(str).str.strip().ne("")
+            for row in np.flatnonzero(bad.to_numpy())[:MAX_PROBLEMS - len(problems)]:
+                problems.append(f"row {first_row + row + 2}, {col}: not a number: {values.iloc[row]!r}")
+            values = numbers
+        if dtype.kind in "iu" and values.notna().all() and (values == values.round()).all():
+            chunk[col] = downcast(values.astype("int64"))
+        else:
+            chunk[col] = downcast(values.astype("float64"))
+    return chunk
+
+
+class Delta:
+    """The changed and new rows of an upload, plus the live rows they replace."""
+
+    def __init__(self, rows, key_hashes, hashes, replaced, counts):
+        self.rows = rows
+        self.key_hashes = key_hashes
+        self.hashes = hashes
+        self.replaced = replaced
+        self.counts = counts
+        names = [rows["state_name"].dropna().astype(str)] if "state_name" in rows else []
+        self.new_states = set(pd.concat(names).unique()) if names else set()
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def diff(path, live, live_keys, live_hashes, chunk_rows=UPLOAD_CHUNK_ROWS):
+    """
+    Read the upload at `path` in chunks and return the Delta against the
+    live frame (`live`, with its row_hashes()).  Raises UploadError listing
+    the problems if any chunk does not fit the schema.
+    """
+    text_columns = _check_header(path, live)
+    lookup = _key_lookup(live_keys)
+    parts, problems = [], []
+    counts = {"rows": 0, "new": 0, "changed": 0, "unchanged": 0}
+
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=text_columns):
+        chunk = _conform(chunk, live, counts["rows"], problems)
+        counts["rows"] += len(chunk)
+        if problems:
+            continue  # keep reading to report problems, but hold no rows
+        keys, hashes = row_hashes(chunk)
+        positions = _live_positions(lookup, keys)
+        unchanged = (positions >= 0) & (live_hashes[np.maximum(positions, 0)] == hashes)
+        counts["unchanged"] += int(unchanged.sum())
+        if not unchanged.all():
+            keep = ~unchanged
+            parts.append((chunk[keep], keys[keep], hashes[keep]))
+
+    if problems:
+        raise UploadError("Upload does not match the dataset's column types", problems[:MAX_PROBLEMS])
+    if not parts:
+        empty = live.iloc[:0]
+        return Delta(empty, np.empty(0, np.uint64), np.empty(0, np.uint64), np.empty(0, np.intp), counts)
+
+    rows = pd.concat([part[0] for part in parts], ignore_index=True)
+    keys = np.concatenate([part[1] for part in parts])
+    hashes = np.concatenate([part[2] for part in parts])
+    # A key repeated within the upload: its last row wins, as on load
+    last = ~pd.Series(keys).duplicated(keep="last").to_numpy()
+    if not last.all():
+        rows, keys, hashes = rows[last].reset_index(drop=True), keys[last], hashes[last]
+
+    known = _live_positions(lookup, keys) >= 0
+    counts["changed"] = int(known.sum())
+    counts["new"] = len(rows) - counts["changed"]
+    # Every live row under a changed key goes, should the key repeat there
+    replaced = np.flatnonzero(np.isin(live_keys, keys[known]))
+    return Delta(rows, keys, hashes, replaced, counts)
+
+
+def _key_lookup(live_keys):
+    """
+    (index of the distinct live key hashes, live position of each).  A key
+    that repeats in the live rows is looked up by its last row, the one
+    the loader keeps.
+    """
+    last = ~pd.Series(live_keys).duplicated(keep="last").to_numpy()
+    return pd.Index(live_keys[last]), np.flatnonzero(last)
+
+
+def _live_positions(lookup, keys):
+    """Live row position of each key hash (-1 for keys not in the live data)."""
+    index, positions = lookup
+    if not len(positions):
+        return np.full(len(keys), -1, dtype=np.intp)
+    found = index.get_indexer(keys)
+    return np.where(found >= 0, positions[np.maximum(found, 0)], -1)
+
+
+# -------------------------------
+# Applying
+# -------------------------------
+def append_csv(path, rows):
+    """Append loaded-layout `rows` to the CSV at `path` (laid out as Dataset.csv, see source_frame)."""
+    with open(path, "rb+") as fh:
+        fh.seek(0, os.SEEK_END)
+        if fh.tell() > 0:
+            fh.seek(-1, os.SEEK_END)
+            needs_newline = fh.read(1) != b"\n"
+        else:
+            needs_newline = False
+    with open(path, "a", encoding="utf-8", newline="") as fh:
+        if needs_newline:
+            fh.write("\n")
+        source_frame(rows).to_csv(fh, header=False, index=False, lineterminator="\n")
+
+
+def merged_frame(live, delta):
+    """The live frame without the replaced rows, with the delta appended."""
+    keep = np.ones(len(live), dtype=bool)
+    keep[delta.replaced] = False
+    df = pd.concat([live[keep] if not keep.all() else live, delta.rows], ignore_index=True)
+    # Categories come out sorted, as when the file is loaded
+    for col in live.columns:
+        if isinstance(live[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df, keep
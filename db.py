@@ -0,0 +1,379 @@
+"""
+Database access for the auth and feedback routes.
+
+One `Database` object per process owns a bounded pool of open connections
+(SQLite under RENDER, MySQL otherwise), so a login no longer pays for a
+TCP connect + auth handshake.  Queries are written once with `?`
+placeholders and translated for MySQL, where each statement is prepared
+once per pooled connection and reused; rows always come back as dicts.
+
+    db = Database.from_env()
+    user = db.fetchone("SELECT * FROM users WHERE username=?", (username,))
+    db.execute("INSERT INTO feedback (username, message) VALUES (?, ?)", (user, msg))
+"""
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from spans import span
+
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "/tmp/population_analysis.db")
+# Prepared MySQL statements kept open per pooled connection (least recently used closed first)
+PREPARED_PER_CONNECTION = int(os.getenv("DB_PREPARED_PER_CONNECTION", 64))
+
+SCHEMA = {
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            email TEXT,
+            message TEXT NOT NULL,
+            rating INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback_rating_counts (
+            rating INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ],
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) NOT NULL,
+            email VARCHAR(100),
+            message TEXT NOT NULL,
+            rating INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback_rating_counts (
+            rating INT PRIMARY KEY,
+            total INT NOT NULL DEFAULT 0
+        )
+        """,
+    ],
+}
+
+# (name, table, columns) -- created after the tables on both backends
+INDEXES = [
+    ("idx_feedback_created", "feedback", "created_at, id"),
+    ("idx_feedback_rating_created", "feedback", "rating, created_at, id"),
+    ("idx_feedback_username_created", "feedback", "username, created_at, id"),
+]
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    LIFO pool of at most `size` connections made by `factory`.  Callers
+    block up to `timeout` seconds for a free connection; `check(conn)`
+    is run on idle connections before reuse and drops dead ones.
+    """
+
+    def __init__(self, factory, size=5, timeout=10.0, check=None):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.check = check
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.discarded = 0
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waited += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeout(f"No database connection free after {self.timeout:g}s")
+
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self.factory()
+                with self._lock:
+                    self.created += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+            self.acquired += 1
+            self.wait_seconds += time.perf_counter() - start
+        return conn
+
+    def _take_idle(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if self.check is None or self.check(conn):
+                return conn
+            self._close(conn)
+
+    def release(self, conn, broken=False):
+        with self._lock:
+            self.in_use -= 1
+        if broken:
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def _close(self, conn):
+        with self._lock:
+            self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "idle": self._idle.qsize(),
+                "created": self.created,
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.acquired, 3) if self.acquired else 0.0,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+            }
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+def _sqlite_connect(path):
+    import sqlite3
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _mysql_connect():
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD", ""),
+        database=os.getenv("DB_NAME", "population_analysis")
+    )
+
+
+def _mysql_alive(conn):
+    # No reconnect: a new session would silently lose the connection's
+    # prepared statements, so a dead connection is replaced instead
+    try:
+        conn.ping(reconnect=False)
+        return True
+    except Exception:
+        return False
+
+
+_PLACEHOLDER = re.compile(r"\?(?=(?:[^']*'[^']*')*[^']*$)")
+
+
+def to_mysql_placeholders(sql):
+    """`?` -> `%s`, leaving question marks inside quoted literals alone."""
+    return _PLACEHOLDER.sub("%s", sql)
+
+
+def _decode(value):
+    # Prepared MySQL cursors may hand back text columns as bytes
+    return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else value
+
+
+class Database:
+    def __init__(self, backend, pool):
+        self.backend = backend
+        self.pool = pool
+        self._prepared = weakref.WeakKeyDictionary()   # MySQL connection -> {sql: prepared cursor}
+        self._prepared_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        size = int(os.getenv("DB_POOL_SIZE", 5))
+        timeout = float(os.getenv("DB_POOL_TIMEOUT", 10))
+        if os.environ.get('RENDER'):
+            return cls.sqlite(SQLITE_PATH, size, timeout)
+        return cls("mysql", ConnectionPool(_mysql_connect, size, timeout, check=_mysql_alive))
+
+    @classmethod
+    def sqlite(cls, path, size=5, timeout=10.0):
+        """A pooled SQLite database at `path`, whatever the environment."""
+        return cls("sqlite", ConnectionPool(lambda: _sqlite_connect(path), size, timeout))
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection; commits on success, rolls back on error."""
+        with span("db_wait"):
+            conn = self.pool.acquire()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.pool.release(conn, broken=broken)
+
+    @contextmanager
+    def _cursor(self, conn, sql):
+        """
+        A cursor for running `sql` on `conn`.  On MySQL it is the
+        connection's prepared cursor for that statement, kept open so the
+        statement is prepared once per connection rather than per call
+        (SQLite does the same through `cached_statements`).
+        """
+        if self.backend != "mysql":
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+
+        with self._prepared_lock:
+            cursors = self._prepared.setdefault(conn, OrderedDict())
+        cursor = cursors.pop(sql, None) or conn.cursor(prepared=True)
+        try:
+            yield cursor
+        except BaseException:
+            cursor.close()  # may be mid-statement; prepare afresh next time
+            raise
+        cursors[sql] = cursor
+        while len(cursors) > PREPARED_PER_CONNECTION:
+            cursors.popitem(last=False)[1].close()
+
+    def _sql(self, sql):
+        return to_mysql_placeholders(sql) if self.backend == "mysql" else sql
+
+    def _rows(self, cursor, rows):
+        if self.backend == "sqlite":
+            return [dict(row) for row in rows]
+        names = [col[0] for col in cursor.description]
+        return [{name: _decode(value) for name, value in zip(names, row)} for row in rows]
+
+    def fetchall(self, sql, params=()):
+        sql = self._sql(sql)
+        with span("db"), self.connection() as conn, self._cursor(conn, sql) as cursor:
+            cursor.execute(sql, params)
+            return self._rows(cursor, cursor.fetchall())
+
+    def fetchone(self, sql, params=()):
+        rows = self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields `execute(sql, params=())` bound to one connection, so several
+        statements commit (or roll back) together.
+        """
+        with span("db"), self.connection() as conn:
+            yield lambda sql, params=(): self._execute(conn, sql, params)
+
+    def execute(self, sql, params=()):
+        """Run a write statement; returns the affected row count."""
+        with span("db"), self.connection() as conn:
+            return self._execute(conn, sql, params)
+
+    def _execute(self, conn, sql, params):
+        sql = self._sql(sql)
+        with self._cursor(conn, sql) as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def init_schema(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for statement in SCHEMA[self.backend]:
+                    cursor.execute(statement)
+                for name, table, columns in INDEXES:
+                    self._create_index(cursor, name, table, columns)
+            finally:
+                cursor.close()
+
+    def _create_index(self, cursor, name, table, columns):
+        if self.backend == "sqlite":
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            return
+        # MySQL has no CREATE INDEX IF NOT EXISTS; 1061 = duplicate key name
+        try:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+        except Exception as e:
+            if getattr(e, "errno", None) != 1061:
+                raise
+
+    def stats(self):
+        return dict(self.pool.stats(), backend=self.backend)
+
+
+def ensure_schema(database):
+    """
+    Create the tables and indexes and backfill the derived counters.  Every
+    step is idempotent, so this runs once per deploy (gunicorn's master, or
+    `flask --app app init-db`) instead of in each worker.
+    """
+    import feedback_store
+    database.init_schema()
+    feedback_store.backfill_rating_counts(database)
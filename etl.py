@@ -0,0 +1,192 @@
+"""
+Chunked ETL for the city + state population data (replaces untitled.py and
+filemerge.py).
+
+    python etl.py clean-population population_data.csv cleaned_population_data.csv
+    python etl.py merge cities_r2.csv cleaned_population_data.csv \
+        --out merged_data.csv [--columnar dataset_columns] [--dataset merged_data.csv] [--year 2011]
+
+`clean-population` streams the wide "<year>_<Persons|Male|Female>" file
+and writes one row per (State, Year).  `merge` streams the cities file and
+joins every chunk against the small per-state table through a keyed
+lookup: the state table is reduced to ONE row per state first (the
+`--year` given, else each state's latest year).  The old `pd.merge` on
+`state_name` joined every city to every year of its state, which is where
+the repeated, cross-multiplied rows in Dataset.csv came from.
+
+Only the per-state table is held in memory; cities are read `--chunksize`
+rows at a time, so memory stays bounded however large the inputs are.
+Row counts are reported for every stage.
+
+The columnar copy is stamped against the CSV the app will load, `--dataset`
+(default: DATASET_PATH), because the app only uses it while that file is
+unchanged since the stamp.  Point it (and the app's DATASET_PATH) at the
+merged CSV, so reloads and uploads that go back to the CSV see the same
+rows as the columnar copy.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from chart_cache import dataset_fingerprint
+from dataset import DATASET_PATH, ColumnarWriter, clean_frame, compact_frame
+
+
+DEFAULT_CHUNKSIZE = 100_000
+POPULATION_CATEGORIES = ["Female", "Male", "Persons"]
+STATE_KEY = "_state_key"
+
+
+def normalize_state(name):
+    """Join key for state names: trimmed, single-spaced, case-folded."""
+    if not isinstance(name, str):
+        return None
+    return " ".join(name.split()).casefold()
+
+
+def normalize_column(series, cache):
+    """normalize_state over a column, computed once per distinct value."""
+    for value in series.unique():
+        if value not in cache:
+            cache[value] = normalize_state(value)
+    return series.map(cache)
+
+
+def report(stage, **counts):
+    details = ", ".join(f"{key}={value:,}" for key, value in counts.items())
+    print(f"[etl] {stage}: {details}", file=sys.stderr)
+
+
+# -------------------------------
+# Stage 1: wide population file -> (State, Year, Female, Male, Persons)
+# -------------------------------
+def clean_population(path, out_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Melt the wide population file chunk by chunk.  Values are summed per
+    (State, Year, Category) and averaged at the end, which gives the same
+    result as the old whole-file `pivot_table` (mean) without holding it.
+    """
+    totals = None
+    rows_in = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        rows_in += len(chunk)
+        long = chunk.melt(id_vars=["State"], var_name="Year_Population", value_name="Population")
+        long["Year"] = long["Year_Population"].str.extract(r'(\d{4})', expand=False)
+        long["Category"] = long["Year_Population"].str.extract(r'_(Persons|Male|Female)', expand=False)
+        long = long.dropna(subset=["Year", "Category", "Population"])
+        grouped = long.groupby(["State", "Year", "Category"])["Population"].agg(["sum", "count"])
+        totals = grouped if totals is None else totals.add(grouped, fill_value=0)
+
+    if totals is None:
+        totals = pd.DataFrame(
+            {"sum": [], "count": []},
+            index=pd.MultiIndex.from_arrays([[], [], []], names=["State", "Year", "Category"]),
+        )
+    long = (totals["sum"] / totals["count"]).rename("Population").reset_index()
+    table = long.pivot(index=["State", "Year"], columns="Category", values="Population").reset_index()
+    table.columns.name = None
+    table = table.reindex(columns=["State", "Year"] + POPULATION_CATEGORIES)
+    table["Year"] = table["Year"].astype(int)
+    for col in POPULATION_CATEGORIES:
+        # pivot_table hands back integers when every mean is whole; keep that
+        values = table[col]
+        if values.notna().all() and (values % 1 == 0).all():
+            table[col] = values.astype("int64")
+    report("clean-population", rows_read=rows_in, state_years=len(table))
+
+    if out_path:
+        table.to_csv(out_path, index=False)
+    return table
+
+
+# -------------------------------
+# Stage 2: cities x per-state table (keyed lookup join)
+# -------------------------------
+def load_state_table(path, year=None):
+    """Per-state population table reduced to one row per normalized state."""
+    table = pd.read_csv(path)
+    state_col = "state_name" if "state_name" in table.columns else "State"
+    table[STATE_KEY] = normalize_column(table[state_col], {})
+    rows_in = len(table)
+    table = table.dropna(subset=[STATE_KEY])
+
+    if year is not None and "Year" in table.columns:
+        table = table[table["Year"] == year]
+    if "Year" in table.columns:
+        table = table.sort_values("Year")
+    per_state = table.drop_duplicates(STATE_KEY, keep="last").set_index(STATE_KEY)
+    per_state = per_state.rename(columns={state_col: "state"})
+    report("state-table", rows_read=rows_in, states=len(per_state))
+    return per_state
+
+
+def merge(cities_path, state_table_path, out_path=None, columnar_dir=None,
+          year=None, chunksize=DEFAULT_CHUNKSIZE, dataset_path=DATASET_PATH):
+    if not out_path and not columnar_dir:
+        raise ValueError("Give --out and/or --columnar")
+    if columnar_dir and out_path and os.path.abspath(out_path) != os.path.abspath(dataset_path):
+        print(f"[etl] note: columnar copy is stamped against {dataset_path}, not {out_path}; "
+              f"the app will only use it with DATASET_PATH={dataset_path}", file=sys.stderr)
+
+    per_state = load_state_table(state_table_path, year)
+    writer = ColumnarWriter(columnar_dir) if columnar_dir else None
+    key_cache = {}
+    totals = {"rows_read": 0, "matched": 0, "unmatched": 0, "rows_written": 0}
+    header = True
+
+    for chunk in pd.read_csv(cities_path, chunksize=chunksize):
+        totals["rows_read"] += len(chunk)
+        keys = normalize_column(chunk["state_name"], key_cache)
+        joined = chunk.join(per_state, on=keys)
+        matched = int(keys.isin(per_state.index).sum())
+        totals["matched"] += matched
+        totals["unmatched"] += len(chunk) - matched
+
+        if out_path:
+            joined.to_csv(out_path, mode="w" if header else "a", header=header, index=False)
+            header = False
+        if writer is not None:
+            writer.append(compact_frame(clean_frame(joined.copy())))
+        totals["rows_written"] += len(joined)
+
+    report("merge", **totals)
+    if writer is not None:
+        # Stamped against the CSV the app loads, so is_fresh() accepts it there
+        fingerprinted = dataset_path if os.path.exists(dataset_path) else out_path or cities_path
+        manifest = writer.close(dataset_path, dataset_fingerprint(fingerprinted))
+        report("columnar", rows=manifest["rows"], columns=len(manifest["columns"]))
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming ETL for the population dataset")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    clean_cmd = sub.add_parser("clean-population", help="wide population file -> one row per state/year")
+    clean_cmd.add_argument("source")
+    clean_cmd.add_argument("out")
+
+    merge_cmd = sub.add_parser("merge", help="join cities with the per-state population table")
+    merge_cmd.add_argument("cities")
+    merge_cmd.add_argument("state_table")
+    merge_cmd.add_argument("--out", help="merged CSV to write")
+    merge_cmd.add_argument("--columnar", help="also write the columnar format the app loads")
+    merge_cmd.add_argument("--dataset", default=DATASET_PATH,
+                           help="CSV the app loads (DATASET_PATH) to stamp the columnar copy against")
+    merge_cmd.add_argument("--year", type=int, help="population year to join (default: latest per state)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "clean-population":
+        clean_population(args.source, args.out, args.chunksize)
+    else:
+        merge(args.cities, args.state_table, args.out, args.columnar, args.year, args.chunksize, args.dataset)
+    print(f"[etl] done in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Feedback queries for the admin page.
+
+Listing uses keyset pagination on (created_at, id) -- backed by the
+idx_feedback_* indexes from db.py -- so each page is an index range scan
+of `limit` rows however large the table grows.  The rating summary is read
+from `feedback_rating_counts`, a per-star counter kept up to date in the
+same transaction as every insert.  Feedback without a rating is counted
+under rating 0 (UNRATED), so the total covers every row.
+"""
+import base64
+import binascii
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+UNRATED = 0  # counter row for feedback saved without a (valid) rating
+STARS = range(1, 6)
+STARS_SQL = ", ".join(str(star) for star in STARS)
+
+
+def encode_cursor(row):
+    raw = f"{row['created_at']}|{row['id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(token):
+    """(created_at, id) from a page token; None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        created_at, _, row_id = base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8").rpartition("|")
+        return created_at, int(row_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def list_feedback(db, limit=DEFAULT_PAGE_SIZE, after=None, rating=None, username=None):
+    """
+    One page of feedback, newest first.  Returns `(rows, next_token)`;
+    `next_token` is None on the last page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    where, params = [], []
+    if rating is not None:
+        where.append("rating = ?")
+        params.append(rating)
+    if username:
+        where.append("username = ?")
+        params.append(username)
+    position = decode_cursor(after)
+    if position is not None:
+        where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+        params.extend([position[0], position[0], position[1]])
+
+    sql = "SELECT * FROM feedback"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = db.fetchall(sql, tuple(params))
+    next_token = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_token
+
+
+def add_feedback(db, username, email, message, rating):
+    """Insert one feedback row and bump its star counter atomically."""
+    if db.backend == "mysql":
+        bump = ("INSERT INTO feedback_rating_counts (rating, total) VALUES (?, 1) "
+                "ON DUPLICATE KEY UPDATE total = total + 1")
+    else:
+        bump = ("INSERT INTO feedback_rating_counts (rating, total) VALUES (?, 1) "
+                "ON CONFLICT(rating) DO UPDATE SET total = total + 1")
+    with db.transaction() as execute:
+        execute("INSERT INTO feedback (username, email, message, rating) VALUES (?, ?, ?, ?)",
+                (username, email, message, rating))
+        execute(bump, (UNRATED if rating is None else rating,))
+
+
+def backfill_rating_counts(db):
+    """
+    Fill the counter table from existing rows (first run after upgrading).
+    Keyed on the UNRATED row, so tables backfilled before it existed get it
+    added; star rows that are already there are left alone.  Rows from
+    before ratings were validated may hold anything ('abc', '', 10): only
+    1-5 are counted as stars, the rest as UNRATED.
+    """
+    if db.fetchone("SELECT total FROM feedback_rating_counts WHERE rating = ?", (UNRATED,)) is not None:
+        return
+    # IGNORE: another worker may be backfilling at the same moment
+    insert = "INSERT IGNORE INTO" if db.backend == "mysql" else "INSERT OR IGNORE INTO"
+    db.execute(
+        f"{insert} feedback_rating_counts (rating, total) "
+        f"SELECT rating, COUNT(*) FROM feedback WHERE rating IN ({STARS_SQL}) GROUP BY rating"
+    )
+    db.execute(
+        f"{insert} feedback_rating_counts (rating, total) "
+        f"SELECT ?, COUNT(*) FROM feedback WHERE rating IS NULL OR rating NOT IN ({STARS_SQL})",
+        (UNRATED,),
+    )
+
+
+def rating_summary(db):
+    """Count per star (1-5), total feedback (rated or not) and average rating."""
+    counts = {star: 0 for star in STARS}
+    unrated = 0
+    for row in db.fetchall("SELECT rating, total FROM feedback_rating_counts"):
+        # Anything but 1-5 (left by an older backfill) counts as unrated
+        if row["rating"] in counts:
+            counts[row["rating"]] = int(row["total"])
+        else:
+            unrated += int(row["total"])
+    rated = sum(counts.values())
+    average = sum(star * n for star, n in counts.items()) / rated if rated else None
+    return {"counts": counts, "total": rated + unrated, "unrated": unrated,
+            "average": round(average, 2) if average is not None else None}
@@ -0,0 +1,191 @@
+"""
+Spatial index over the cities' coordinates: the `latitude`/`longitude`
+columns the loader splits the "lat,lon" `location` text into (or that text
+itself, for a frame that wasn't loaded through dataset.py).
+
+The cities are bucketed into a uniform lat/lon grid: points are sorted by
+cell, and `cell_start` (CSR-style offsets, one per cell) maps every cell to
+a contiguous slice of the sorted arrays.  Cells are row-major, so a box
+query reads one slice per grid row it touches and then filters the
+candidates exactly (haversine distance or coordinate bounds).
+
+The cell size adapts to the data -- about CELL_TARGET cities per occupied
+cell -- so queries stay a few slices plus a small vectorized filter from
+the top-500 cities up to every census town.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi / 180 * EARTH_RADIUS_KM
+CELL_TARGET = 4
+MIN_CELL_DEG = 0.01
+MAX_CELLS = 1 << 20
+
+
+def parse_locations(locations):
+    """Two float arrays (lat, lon) from "lat,lon" strings; NaN where missing or malformed."""
+    parts = pd.Series(locations, dtype="object").astype("string").str.split(",", n=1, expand=True)
+    if parts.shape[1] < 2:
+        nan = np.full(len(parts), np.nan)
+        return nan, nan.copy()
+    lat = pd.to_numeric(parts[0].str.strip(), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    lon = pd.to_numeric(parts[1].str.strip(), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    bad = ~((np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+    lat[bad] = np.nan
+    lon[bad] = np.nan
+    return lat, lon
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from (lat, lon) to each of (lats, lons), in km."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CityGeoIndex:
+    """
+    One entry per city (name + state) with a valid location.  Queries return
+    the matching cities' positions in this index's arrays, ordered by
+    distance (within/nearest) or population (bbox); `summary()` turns them
+    into the JSON the routes send.
+    """
+
+    def __init__(self, df):
+        columns = ["name_of_city", "state_name", "latitude", "longitude", "location",
+                   "population_total", "effective_literacy_rate_total"]
+        cities = df[[col for col in columns if col in df.columns]].drop_duplicates(["name_of_city", "state_name"])
+        if "latitude" in cities and "longitude" in cities:
+            lat = cities["latitude"].to_numpy(dtype=float, na_value=np.nan)
+            lon = cities["longitude"].to_numpy(dtype=float, na_value=np.nan)
+        elif "location" in cities:
+            lat, lon = parse_locations(cities["location"])
+        else:
+            lat, lon = np.empty(0), np.empty(0)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        cities = cities[valid]
+        lat, lon = lat[valid], lon[valid]
+        self.size = len(cities)
+        if not self.size:
+            self.nx = self.ny = 0
+            return
+
+        # Grid sized for ~CELL_TARGET cities per cell over the data's bounding box
+        self.lat0, self.lon0 = float(lat.min()), float(lon.min())
+        span_lat = max(float(lat.max()) - self.lat0, MIN_CELL_DEG)
+        span_lon = max(float(lon.max()) - self.lon0, MIN_CELL_DEG)
+        cell = math.sqrt(span_lat * span_lon * CELL_TARGET / self.size)
+        cell = max(cell, MIN_CELL_DEG, math.sqrt(span_lat * span_lon / MAX_CELLS))
+        self.cell_deg = cell
+        self.nx = int(span_lon // cell) + 1
+        self.ny = int(span_lat // cell) + 1
+
+        ix = np.minimum(((lon - self.lon0) // cell).astype(np.intp), self.nx - 1)
+        iy = np.minimum(((lat - self.lat0) // cell).astype(np.intp), self.ny - 1)
+        cell_ids = iy * self.nx + ix
+        order = np.argsort(cell_ids, kind="stable")
+        self.cell_start = np.searchsorted(cell_ids[order], np.arange(self.nx * self.ny + 1))
+
+        self.lat = lat[order]
+        self.lon = lon[order]
+        self.names = cities["name_of_city"].astype(str).to_numpy()[order]
+        self.states = cities["state_name"].astype(str).to_numpy()[order]
+        self.population = cities["population_total"].to_numpy(dtype=float, na_value=np.nan)[order]
+        self.literacy = cities["effective_literacy_rate_total"].to_numpy(dtype=float, na_value=np.nan)[order]
+
+    # -------------------------------
+    # Grid lookups
+    # -------------------------------
+    def _candidates(self, min_lat, max_lat, min_lon, max_lon):
+        """Positions of every city in the grid cells overlapping the box."""
+        if not self.size:
+            return np.empty(0, dtype=np.intp)
+        x0 = math.floor((min_lon - self.lon0) / self.cell_deg)
+        x1 = math.floor((max_lon - self.lon0) / self.cell_deg)
+        y0 = math.floor((min_lat - self.lat0) / self.cell_deg)
+        y1 = math.floor((max_lat - self.lat0) / self.cell_deg)
+        if x1 < 0 or y1 < 0 or x0 >= self.nx or y0 >= self.ny:
+            return np.empty(0, dtype=np.intp)
+        x0, x1 = max(x0, 0), min(x1, self.nx - 1)
+        y0, y1 = max(y0, 0), min(y1, self.ny - 1)
+        starts = self.cell_start[np.arange(y0, y1 + 1) * self.nx + x0]
+        ends = self.cell_start[np.arange(y0, y1 + 1) * self.nx + x1 + 1]
+        if len(starts) == 1:
+            return np.arange(starts[0], ends[0])
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends) if e > s] or [np.empty(0, dtype=np.intp)])
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def within(self, lat, lon, radius_km):
+        """(positions, distances) of cities within `radius_km`, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+        candidates = self._candidates(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        keep = distances <= radius_km
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, lat, lon, k):
+        """(positions, distances) of the `k` nearest cities, nearest first."""
+        k = min(k, self.size)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        # Grow the search radius until it holds k cities: anything outside
+        # the radius is farther than everything inside it
+        radius = self.cell_deg * KM_PER_DEGREE
+        while True:
+            positions, distances = self.within(lat, lon, radius)
+            if len(positions) >= k or radius > math.pi * EARTH_RADIUS_KM:
+                return positions[:k], distances[:k]
+            radius *= 2
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Positions of cities inside the box, most populous first."""
+        candidates = self._candidates(min_lat, max_lat, min_lon, max_lon)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        candidates = candidates[(lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)]
+        order = np.argsort(-np.nan_to_num(self.population[candidates], nan=-1.0), kind="stable")
+        return candidates[order]
+
+    def summary(self, positions, distances=None, limit=50):
+        """
+        Population/literacy stats over every matched city, plus the first
+        `limit` cities.  Literacy is given both as a plain mean over cities
+        and weighted by population.
+        """
+        population = self.population[positions]
+        literacy = self.literacy[positions]
+        weighted = np.isfinite(population) & np.isfinite(literacy)
+        weight = population[weighted].sum()
+
+        cities = []
+        for i, pos in enumerate(positions[:limit]):
+            city = {
+                "name": self.names[pos],
+                "state": self.states[pos],
+                "lat": float(self.lat[pos]),
+                "lon": float(self.lon[pos]),
+                "population": None if math.isnan(self.population[pos]) else float(self.population[pos]),
+                "literacy_rate": None if math.isnan(self.literacy[pos]) else float(self.literacy[pos]),
+            }
+            if distances is not None:
+                city["distance_km"] = round(float(distances[i]), 3)
+            cities.append(city)
+
+        return {
+            "count": int(len(positions)),
+            "population_total": float(np.nansum(population)),
+            "literacy_rate_mean": float(np.nanmean(literacy)) if np.isfinite(literacy).any() else None,
+            "literacy_rate_weighted": float((population[weighted] * literacy[weighted]).sum() / weight) if weight > 0 else None,
+            "cities": cities,
+            "truncated": bool(len(positions) > limit),
+        }
@@ -0,0 +1,54 @@
+"""
+Gunicorn settings (picked up automatically by `gunicorn app:app`).
+
+The master creates the database schema once per deploy and tells the
+workers to skip it (INIT_DB=0), so N workers don't race through the same
+CREATE TABLE / index statements on every start.
+
+With DATASET_MMAP=1 the master also refreshes the columnar dataset build
+once before forking, and every worker then memory-maps the same files
+read-only instead of holding its own copy (see dataset.py).
+
+With REPORT_WORKERS=N the master starts the N report worker processes
+(report_jobs.py) once and tells the gunicorn workers not to start their
+own (REPORT_WORKERS=0).  They share the job queue and the PDFs with the
+web workers through this host's filesystem.
+"""
+import os
+import subprocess
+import sys
+
+report_workers = None
+
+
+def on_starting(server):
+    if os.getenv("INIT_DB", "1") == "1":
+        from db import Database, ensure_schema
+        database = Database.from_env()
+        ensure_schema(database)
+        database.pool.close_all()
+        os.environ["INIT_DB"] = "0"
+        server.log.info("Database schema ready (%s)", database.backend)
+
+    if os.getenv("DATASET_MMAP", "0") == "1":
+        import dataset
+        manifest = dataset.ensure_built()
+        server.log.info("Shared dataset: %s rows mapped from %s", manifest["rows"], dataset.COLUMNAR_DIR)
+
+    processes = int(os.getenv("REPORT_WORKERS", 0))
+    if processes > 0:
+        # A separate `report_jobs.py worker` process rather than a pool in the
+        # master, whose forked workers would inherit the pool's children
+        global report_workers
+        report_workers = subprocess.Popen([sys.executable, "-m", "report_jobs", "worker", "--processes", str(processes)])
+        os.environ["REPORT_WORKERS"] = "0"
+        server.log.info("Report workers: %s processes (pid %s)", processes, report_workers.pid)
+
+
+def on_exit(server):
+    if report_workers is not None:
+        report_workers.terminate()  # they finish the job in hand first
+        try:
+            report_workers.wait(15)
+        except subprocess.TimeoutExpired:
+            report_workers.kill()
@@ -0,0 +1,125 @@
+"""
+HTTP caching for the analysis routes: strong ETags, Cache-Control and
+gzip/brotli compression of JSON responses.
+
+The GET variants of the analysis routes call `not_modified()` once the
+request parameters are normalized:
+
+    cached = http_cache.not_modified("analyze", {"state_name": name}, dataset.fingerprint)
+    if cached is not None:
+        return cached
+
+The ETag is a hash of (code version, dataset fingerprint, route, params),
+so it changes exactly when the response could: a new Dataset.csv, a
+deploy, or different parameters.  A matching If-None-Match is answered
+with 304 before any filtering or rendering happens.  The after-request hook
+then stamps ETag + Cache-Control on the 200 response.
+
+JSON bodies over COMPRESS_MIN_BYTES are compressed with brotli (when the
+`brotli` package is installed and the client accepts it) or gzip.  Each
+encoding gets its own strong ETag ("<tag>-br" / "<tag>-gzip"), as a
+different byte representation must.
+
+HTTP_CACHE_MAX_AGE (seconds, default 300) sets how long browsers and the
+proxy may reuse a response before revalidating it.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from flask import Response, g, request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 300))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def code_version():
+    """
+    Identifies the deployed code, so a deploy that changes how charts look
+    also changes every ETag.  APP_VERSION or Render's commit id if set,
+    else a hash of this directory's Python sources.
+    """
+    version = os.getenv("APP_VERSION") or os.getenv("RENDER_GIT_COMMIT")
+    if version:
+        return version
+    here = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(here)):
+        if name.endswith(".py"):
+            with open(os.path.join(here, name), "rb") as fh:
+                digest.update(name.encode() + b"\0" + fh.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_VERSION = code_version()
+
+
+def make_etag(fingerprint, route, params):
+    raw = json.dumps([CODE_VERSION, fingerprint, route, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _cache_headers(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={MAX_AGE}"
+    response.vary.add("Accept-Encoding")
+
+
+def not_modified(route, params, fingerprint):
+    """
+    For GET/HEAD: remember the ETag for this response and return a 304 if
+    the client already holds it (in any encoding).  None otherwise.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    etag = make_etag(fingerprint, route, params)
+    g.http_etag = etag
+    if_none_match = request.if_none_match
+    for candidate in [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]:
+        if if_none_match.contains(candidate):
+            response = Response(status=304)
+            _cache_headers(response, candidate)
+            return response
+    return None
+
+
+def _encode(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _finalize(response):
+    etag = g.pop("http_etag", None)
+    if response.status_code == 304:
+        return response
+
+    encoding = None
+    if (response.status_code == 200 and response.mimetype == "application/json"
+            and not response.direct_passthrough and not response.is_streamed
+            and "Content-Encoding" not in response.headers):
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if encoding is not None:
+            data = response.get_data()
+            if len(data) >= COMPRESS_MIN_BYTES:
+                response.set_data(_encode(data, encoding))
+                response.headers["Content-Encoding"] = encoding
+            else:
+                encoding = None
+        response.vary.add("Accept-Encoding")
+
+    if etag is not None and response.status_code == 200:
+        _cache_headers(response, f"{etag}-{encoding}" if encoding else etag)
+    return response
+
+
+def init_app(app):
+    app.after_request(_finalize)
@@ -0,0 +1,343 @@
+"""
+Bounded cost of authentication for /login and /register.
+
+A password hash (scrypt/pbkdf2 via werkzeug) costs ~150 ms of CPU and, for
+scrypt, ~32 MB of memory.  Run on the request thread with no limit, a burst
+of logins -- real or brute force -- takes every worker away from the
+analysis routes.  LoginGuard puts three things in front of it:
+
+    throttling      token buckets per client IP and per username; an
+                    attempt needs a token from both (LOGIN_IP_*, LOGIN_USER_*)
+    unknown users   usernames that are not in the users table are
+                    remembered for LOGIN_UNKNOWN_TTL seconds, so repeated
+                    attempts against them skip the database
+    hash executor   hashes run on LOGIN_HASH_WORKERS threads (hashlib
+                    releases the GIL); at most LOGIN_HASH_QUEUE more may
+                    wait, anything beyond that is refused with HashBusy
+
+The buckets live in the process by default.  With LOGIN_THROTTLE_DB set to
+a SQLite path they are kept there instead, so all gunicorn workers (and
+restarts) share one budget per IP/username.
+
+The unknown-user cache is per process: a worker that cached a name keeps
+refusing it for up to LOGIN_UNKNOWN_TTL seconds after another worker
+registers it.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from db import Database
+
+
+LOGIN_HASH_WORKERS = int(os.getenv("LOGIN_HASH_WORKERS", 2))
+LOGIN_HASH_QUEUE = int(os.getenv("LOGIN_HASH_QUEUE", 16))
+LOGIN_HASH_TIMEOUT = float(os.getenv("LOGIN_HASH_TIMEOUT", 10))
+# burst size, then tokens refilled per minute
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 10))
+LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", 5))
+LOGIN_USER_PER_MINUTE = float(os.getenv("LOGIN_USER_PER_MINUTE", 2))
+LOGIN_UNKNOWN_TTL = float(os.getenv("LOGIN_UNKNOWN_TTL", 30))
+LOGIN_THROTTLE_DB = os.getenv("LOGIN_THROTTLE_DB") or None
+# Proxies in front of the app that append to X-Forwarded-For (Render: 1)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS login_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        allowed INTEGER NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_login_buckets_updated ON login_buckets (updated_at)",
+]
+
+
+class HashBusy(Exception):
+    status = 503
+    retry_after = 5
+
+    def __init__(self):
+        super().__init__("Too many logins in progress, please retry shortly")
+
+
+def client_ip(remote_addr, forwarded_for, hops=TRUSTED_PROXY_HOPS):
+    """
+    The client address: `remote_addr`, or with `hops` trusted proxies the
+    X-Forwarded-For entry the outermost one added (anything left of it is
+    client-supplied and can't be trusted).
+    """
+    if hops > 0 and forwarded_for:
+        entries = [part.strip() for part in forwarded_for.split(",") if part.strip()]
+        if len(entries) >= hops:
+            return entries[-hops]
+    return remote_addr or "unknown"
+
+
+# -------------------------------
+# Token buckets
+# -------------------------------
+class TokenBuckets:
+    """
+    In-process token buckets: each key starts with `burst` tokens and
+    regains `rate` per second up to `burst`.  At most `max_keys` are kept
+    (least recently used go first -- a dropped bucket restarts full).
+    """
+
+    def __init__(self, burst, rate, max_keys=10_000):
+        self.burst = burst
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Take a token; returns 0 if there was one, else seconds until there is."""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteTokenBuckets:
+    """
+    The same buckets in a SQLite table shared by every process using
+    `path`.  A take is one UPSERT ... RETURNING, so concurrent workers
+    can't both spend the last token.
+    """
+
+    TAKE = (
+        "INSERT INTO login_buckets (key, tokens, allowed, updated_at) VALUES (:key, :burst - 1, 1, :now) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = MIN(:burst, tokens + MAX(0, :now - updated_at) * :rate) "
+        "- (MIN(:burst, tokens + MAX(0, :now - updated_at) * :rate) >= 1), "
+        "allowed = MIN(:burst, tokens + MAX(0, :now - updated_at) * :rate) >= 1, "
+        "updated_at = :now "
+        "RETURNING tokens, allowed"
+    )
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, burst, rate, prefix=""):
+        self.burst = burst
+        self.rate = rate
+        self.prefix = prefix
+        self.db = Database.sqlite(path, size=2)
+        with self.db.transaction() as execute:
+            for statement in SCHEMA:
+                execute(statement)
+        self._takes = 0
+
+    def take(self, key, now=None):
+        now = time.time() if now is None else now
+        row = self.db.fetchone(self.TAKE, {"key": self.prefix + key, "burst": self.burst,
+                                           "rate": self.rate, "now": now})
+        self._takes += 1
+        if self._takes % self.PRUNE_EVERY == 0:
+            self.prune(now)
+        return 0.0 if row["allowed"] else (1 - row["tokens"]) / self.rate
+
+    def prune(self, now=None):
+        """Drop this prefix's buckets that have refilled completely (they'd start full anyway)."""
+        now = time.time() if now is None else now
+        return self.db.execute("DELETE FROM login_buckets WHERE key LIKE ? AND updated_at < ?",
+                               (self.prefix + "%", now - self.burst / self.rate))
+
+    def __len__(self):
+        row = self.db.fetchone("SELECT COUNT(*) AS n FROM login_buckets WHERE key LIKE ?", (self.prefix + "%",))
+        return row["n"]
+
+
+# -------------------------------
+# Unknown usernames
+# -------------------------------
+class UnknownUsers:
+    """Usernames recently looked up and not found, forgotten after `ttl` seconds."""
+
+    def __init__(self, ttl, max_entries=10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def __contains__(self, username):
+        with self._lock:
+            expires = self._expires.get(username)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._expires[username]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, username):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._expires.pop(username, None)
+            self._expires[username] = time.monotonic() + self.ttl
+            while len(self._expires) > self.max_entries:
+                self._expires.popitem(last=False)
+
+    def discard(self, username):
+        with self._lock:
+            self._expires.pop(username, None)
+
+    def __len__(self):
+        return len(self._expires)
+
+
+# -------------------------------
+# Hash executor
+# -------------------------------
+class HashExecutor:
+    """
+    Runs password hashing on `workers` threads.  Up to `queue_size` more
+    calls may wait for a thread; further calls raise HashBusy at once
+    rather than pile up.  `submit` returns the future (for callers that
+    await it), `run` blocks for the result.
+    """
+
+    def __init__(self, workers=LOGIN_HASH_WORKERS, queue_size=LOGIN_HASH_QUEUE, timeout=LOGIN_HASH_TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashBusy()
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._executor.submit(self._call, fn, args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+
+    def _call(self, fn, args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._done(time.perf_counter() - start)
+
+    def _done(self, seconds):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.seconds += seconds
+        self._slots.release()
+
+    def run(self, fn, *args):
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashBusy()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(1000 * self.seconds / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+# -------------------------------
+# Guard
+# -------------------------------
+class LoginGuard:
+    def __init__(self, ip_buckets, user_buckets, unknown_users, hashes):
+        self.ip_buckets = ip_buckets
+        self.user_buckets = user_buckets
+        self.unknown_users = unknown_users
+        self.hashes = hashes
+        self._lock = threading.Lock()
+        self.throttled_count = 0
+
+    @classmethod
+    def from_env(cls):
+        def buckets(prefix, burst, per_minute):
+            if LOGIN_THROTTLE_DB:
+                return SqliteTokenBuckets(LOGIN_THROTTLE_DB, burst, per_minute / 60, prefix)
+            return TokenBuckets(burst, per_minute / 60)
+
+        return cls(
+            buckets("ip:", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE),
+            buckets("user:", LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE),
+            UnknownUsers(LOGIN_UNKNOWN_TTL),
+            HashExecutor(),
+        )
+
+    def throttle(self, ip, username=None):
+        """
+        Spend one attempt for `ip` (and `username`); returns 0 when allowed,
+        else the seconds to wait.  A refused IP doesn't spend the user's token.
+        """
+        wait = self.ip_buckets.take(ip)
+        if not wait and username is not None:
+            wait = self.user_buckets.take(username.strip().lower())
+        if wait:
+            with self._lock:
+                self.throttled_count += 1
+        return wait
+
+    def password_hash(self, username, fetch):
+        """The stored hash for `username` via `fetch(username)`, or None; misses are cached."""
+        if username in self.unknown_users:
+            return None
+        password_hash = fetch(username)
+        if password_hash is None:
+            self.unknown_users.add(username)
+        return password_hash
+
+    def verify(self, password_hash, password):
+        return self.hashes.run(check_password_hash, password_hash, password)
+
+    def hash_password(self, password):
+        return self.hashes.run(generate_password_hash, password)
+
+    def registered(self, username):
+        self.unknown_users.discard(username)
+
+    def stats(self):
+        return dict(
+            {f"hash_{name}": value for name, value in self.hashes.stats().items()},
+            throttled=self.throttled_count,
+            ip_buckets=len(self.ip_buckets),
+            user_buckets=len(self.user_buckets),
+            unknown_users=len(self.unknown_users),
+            unknown_user_hits=self.unknown_users.hits,
+        )
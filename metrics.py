@@ -0,0 +1,204 @@
+"""
+Request instrumentation: per-route latency histograms with a phase
+breakdown, exported in Prometheus text format at /metrics.
+
+    metrics.init_app(app)            # request hooks + /metrics
+
+    with metrics.span("filter"):
+        df_state = df.iloc[rows]
+
+Spans (spans.py) add their duration to the current request's phases:
+filter and aggregate in the handlers, plot/layout/savefig/encode in
+charts.py, db/db_wait in db.py and hash for the password check.  Chart renderers
+run in the render pool's worker processes, so render_pool.py collects the
+spans there and hands them back with the chart.  Phases can nest
+and are not exclusive: `render_wait` is the render time the worker did not
+account for (pool queueing + pickling).
+
+Each gunicorn worker keeps its own numbers; a scrape sees one worker.
+
+PROFILE_SAMPLE_RATE=0.01 additionally runs cProfile on that fraction of
+requests and dumps the stats to PROFILE_DIR (default "profiles/"), one
+`.prof` file per request, for `python -m pstats` or snakeviz.
+"""
+import bisect
+import cProfile
+import os
+import random
+import threading
+import time
+
+from flask import Response, g, request
+
+import spans
+from spans import span  # noqa: F401  (handlers use metrics.span)
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        bounds = [f'le="{bound:g}"' for bound in self.buckets] + ['le="+Inf"']
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(bounds, counts + [count - sum(counts)]):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in items)
+        return lines
+
+
+REQUEST_SECONDS = Histogram("app_request_duration_seconds", "Request latency by route.", ["route", "method"])
+PHASE_SECONDS = Histogram("app_phase_duration_seconds", "Time spent per handler phase.", ["route", "phase"])
+REQUESTS = Counter("app_requests_total", "Requests by route and status.", ["route", "method", "status"])
+PROFILED = Counter("app_profiled_requests_total", "Requests dumped by the sampling profiler.", ["route"])
+
+# name -> callable returning {metric_suffix: number}, read at scrape time
+_gauges = {}
+
+
+def register_gauges(prefix, read):
+    """Export `read()`'s numeric values as gauges `<prefix>_<key>` on every scrape."""
+    _gauges[prefix] = read
+
+
+# -------------------------------
+# Flask hooks
+# -------------------------------
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    spans.start()
+    g._metrics_profiler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        g._metrics_profiler = cProfile.Profile()
+        g._metrics_profiler.enable()
+
+
+def _after_request(response):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route, method = _route(), request.method
+
+    profiler = g.pop("_metrics_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _dump_profile(profiler, route, elapsed)
+
+    phases = spans.stop()
+
+    REQUEST_SECONDS.observe((route, method), elapsed)
+    REQUESTS.inc((route, method, str(response.status_code)))
+    for phase, seconds in phases.items():
+        PHASE_SECONDS.observe((route, phase), seconds)
+    if phases:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in phases.items()
+        )
+    return response
+
+
+def _dump_profile(profiler, route, elapsed):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = route.strip("/").replace("/", "_").replace("<", "").replace(">", "") or "root"
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}-{elapsed * 1000:.0f}ms.prof")
+        profiler.dump_stats(path)
+        PROFILED.inc((route,))
+    except OSError:
+        pass
+
+
+def expose():
+    lines = []
+    for metric in (REQUEST_SECONDS, PHASE_SECONDS, REQUESTS, PROFILED):
+        lines.extend(metric.expose())
+    for prefix, read in sorted(_gauges.items()):
+        try:
+            values = read()
+        except Exception:
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(expose(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Install the request hooks and the /metrics route (METRICS_TOKEN guards it if set)."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,177 @@
+"""
+Bounded process pool for chart rendering.
+
+Rendering is CPU-bound and holds the GIL, so charts are drawn in separate
+processes and the web threads only wait on a future.  The pool admits at
+most `workers + max_queued` renders at a time; past that it refuses
+immediately (the routes answer 503 with Retry-After) instead of letting
+requests pile up behind matplotlib.
+
+With `workers=0` renders run inline on the calling thread, which is what
+tests and single-process debugging want.
+
+Renderers can be passed by dotted name ("charts.literacy_histogram") so
+the web process never has to import matplotlib/seaborn itself; only the
+pool workers (which preload `charts` as they start) do.
+"""
+import atexit
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import spans
+
+
+class RenderUnavailable(Exception):
+    """Base for renders the pool could not complete; carries the HTTP status."""
+    status = 503
+    retry_after = 1
+
+
+class RenderPoolBusy(RenderUnavailable):
+    def __init__(self):
+        super().__init__("Chart renderer is busy, please retry shortly")
+
+
+class RenderTimeout(RenderUnavailable):
+    status = 504
+
+    def __init__(self, timeout):
+        super().__init__(f"Chart rendering timed out after {timeout:g}s")
+
+
+def resolve(fn):
+    """`fn` itself, or the function a "module.attr" name points to."""
+    if isinstance(fn, str):
+        module, _, attr = fn.rpartition(".")
+        return getattr(importlib.import_module(module), attr)
+    return fn
+
+
+def _call(fn, args):
+    """Run the renderer; returns its result plus the spans it recorded."""
+    with spans.collect() as phases:
+        result = resolve(fn)(*args)
+    return result, phases
+
+
+def _preload(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _ready():
+    return os.getpid()
+
+
+class RenderPool:
+    def __init__(self, workers, max_queued=None, timeout=30.0, preload=("charts",)):
+        self.workers = workers
+        self.preload = tuple(preload)
+        self.max_queued = workers * 2 if max_queued is None else max_queued
+        self.timeout = timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, workers + self.max_queued))
+        self._count_lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _get_executor(self):
+        # Created on first use so importing app.py never forks/spawns
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_preload,
+                    initargs=(self.preload,),
+                )
+            return self._executor
+
+    def render(self, fn, *args):
+        """
+        Run `fn(*args)` in the pool and return its result.  The renderer's
+        spans are added to the caller's, plus `render_wait` for whatever
+        part of the wait the worker did not account for.
+        """
+        if self.workers <= 0:
+            result, phases = _call(fn, args)
+            spans.record(phases)
+            return result
+
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._count_lock:
+                self.rejected += 1
+            raise RenderPoolBusy()
+        with self._count_lock:
+            self._in_flight += 1
+
+        try:
+            future = self._get_executor().submit(_call, fn, args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+
+        try:
+            result, phases = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._count_lock:
+                self.timed_out += 1
+            raise RenderTimeout(self.timeout)
+        spans.record(phases)
+        spans.record({"render_wait": max(0.0, time.perf_counter() - start - sum(phases.values()))})
+        return result
+
+    def warm_up(self):
+        """
+        Start the worker processes (and their `preload` imports) now rather
+        than on the first chart request.  Inline pools import them here.
+        """
+        if self.workers <= 0:
+            _preload(self.preload)
+            return
+        executor = self._get_executor()
+        futures = [executor.submit(_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result(timeout=self.timeout)
+
+    def _release(self):
+        with self._count_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def pool_from_env():
+    """RenderPool configured from RENDER_POOL_* environment variables."""
+    default_workers = min(4, os.cpu_count() or 1)
+    queued = os.getenv("RENDER_POOL_QUEUE")
+    pool = RenderPool(
+        workers=int(os.getenv("RENDER_POOL_WORKERS", default_workers)),
+        max_queued=int(queued) if queued else None,
+        timeout=float(os.getenv("RENDER_POOL_TIMEOUT", 30)),
+    )
+    atexit.register(pool.shutdown)
+    return pool
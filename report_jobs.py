@@ -0,0 +1,415 @@
+"""
+Background report jobs: a job queue in a local SQLite file plus a pool of
+worker processes that render the reports (reports.py) to disk.
+
+A report touches every region or state and can take far longer than a
+request should, so the web process only validates and enqueues it:
+
+    POST /reports {"kind": "literacy_distributions", "states": "all"}   -> 202 {"job_id": ...}
+    GET  /reports/<job_id>             status (queued/running/done/failed)
+    GET  /reports/<job_id>/download    the PDF once done
+
+Workers are separate processes, so a render never holds a web worker or
+its GIL.  They share the queue (REPORT_DB_PATH) and the PDFs (REPORT_DIR)
+with the web process through the local filesystem, so they must run on the
+same host -- not as a separate PaaS process type, which gets a container
+of its own.  Set REPORT_WORKERS=N and gunicorn's master starts N of them
+before forking (gunicorn.conf.py), or run them next to the web server:
+
+    python report_jobs.py worker --processes 2
+
+Workers record themselves in `report_workers` while they run; a report
+submitted while none has been seen for STALE_AFTER seconds is refused with
+NoWorkers (503) instead of sitting in the queue forever.
+
+Workers claim jobs with a single UPDATE ... RETURNING, so any number of
+them can share the queue.  A running job's worker refreshes its heartbeat
+every few seconds; jobs whose heartbeat goes stale (the worker died) are
+put back in the queue, up to REPORT_MAX_ATTEMPTS runs.  Submitting the
+same report for the same dataset version again returns the existing job.
+Finished jobs and their files are purged after REPORT_RETENTION seconds.
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+from db import Database
+
+
+REPORT_DB_PATH = os.getenv("REPORT_DB_PATH", "/tmp/population_reports.db")
+REPORT_DIR = os.getenv("REPORT_DIR", "reports")
+REPORT_MAX_QUEUED = int(os.getenv("REPORT_MAX_QUEUED", 100))
+REPORT_MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", 2))
+REPORT_RETENTION = float(os.getenv("REPORT_RETENTION", 7 * 24 * 3600))
+POLL_INTERVAL = float(os.getenv("REPORT_POLL_INTERVAL", 0.5))
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = 6 * HEARTBEAT_INTERVAL
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS report_jobs (
+        id TEXT PRIMARY KEY,
+        job_key TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        fingerprint TEXT,
+        username TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        artifact TEXT,
+        summary TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        heartbeat_at REAL,
+        finished_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_report_jobs_status_created ON report_jobs (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_report_jobs_key ON report_jobs (job_key, status)",
+    """
+    CREATE TABLE IF NOT EXISTS report_workers (
+        name TEXT PRIMARY KEY,
+        seen_at REAL NOT NULL
+    )
+    """,
+]
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+class QueueFull(Exception):
+    status = 503
+    retry_after = 30
+
+    def __init__(self):
+        super().__init__("Too many reports queued, please retry later")
+
+
+class NoWorkers(Exception):
+    status = 503
+    retry_after = 10
+
+    def __init__(self):
+        super().__init__("No report workers are running on this host, please retry later")
+
+
+def job_key(kind, params, fingerprint):
+    raw = json.dumps([kind, params, fingerprint], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """The report_jobs table plus the directory the artifacts are written to."""
+
+    def __init__(self, path=REPORT_DB_PATH, report_dir=REPORT_DIR):
+        self.path = path
+        self.report_dir = report_dir
+        self.db = Database.sqlite(path, size=2)
+        with self.db.transaction() as execute:
+            for statement in SCHEMA:
+                execute(statement)
+
+    def artifact_path(self, job):
+        return os.path.join(self.report_dir, job["artifact"]) if job.get("artifact") else None
+
+    # -------------------------------
+    # Web side
+    # -------------------------------
+    def submit(self, kind, params, fingerprint, username=None):
+        """
+        Enqueue a report; returns `(job, created)`.  An identical report of
+        the same dataset version that is queued, running or done (with its
+        file still on disk) is returned instead of queueing a second one.
+        """
+        key = job_key(kind, params, fingerprint)
+        for job in self.db.fetchall(
+            "SELECT * FROM report_jobs WHERE job_key = ? AND status IN ('queued', 'running', 'done') "
+            "ORDER BY created_at DESC", (key,)
+        ):
+            if job["status"] != "done" or os.path.exists(self.artifact_path(job)):
+                return self._public(job), False
+
+        if self.counts()["queued"] >= REPORT_MAX_QUEUED:
+            raise QueueFull()
+        if not self.live_workers():
+            raise NoWorkers()
+        job_id = uuid.uuid4().hex
+        self.db.execute(
+            "INSERT INTO report_jobs (id, job_key, kind, params, fingerprint, username, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, key, kind, json.dumps(params), fingerprint, username, time.time()),
+        )
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        """The job as a JSON-ready dict (with its queue position while queued), or None."""
+        job = self.db.fetchone("SELECT * FROM report_jobs WHERE id = ?", (job_id,))
+        if job is None:
+            return None
+        job = self._public(job)
+        if job["status"] == "queued":
+            ahead = self.db.fetchone(
+                "SELECT COUNT(*) AS n FROM report_jobs WHERE status = 'queued' AND created_at < ?",
+                (job["created_at"],),
+            )
+            job["queue_position"] = ahead["n"] + 1
+        return job
+
+    def _public(self, job):
+        job = dict(job)
+        job.pop("job_key", None)
+        job["params"] = json.loads(job["params"])
+        job["summary"] = json.loads(job["summary"]) if job["summary"] else None
+        return job
+
+    def counts(self):
+        rows = self.db.fetchall("SELECT status, COUNT(*) AS n FROM report_jobs GROUP BY status")
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def live_workers(self, within=STALE_AFTER):
+        """Workers seen in the last `within` seconds."""
+        row = self.db.fetchone("SELECT COUNT(*) AS n FROM report_workers WHERE seen_at >= ?",
+                               (time.time() - within,))
+        return row["n"]
+
+    # -------------------------------
+    # Worker side
+    # -------------------------------
+    def worker_seen(self, worker):
+        self.db.execute(
+            "INSERT INTO report_workers (name, seen_at) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET seen_at = excluded.seen_at",
+            (worker, time.time()),
+        )
+
+    def worker_gone(self, worker):
+        self.db.execute("DELETE FROM report_workers WHERE name = ?", (worker,))
+
+    def claim(self, worker):
+        """Atomically take the oldest queued job for `worker`; None if the queue is empty."""
+        now = time.time()
+        job = self.db.fetchone(
+            "UPDATE report_jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+            "started_at = ?, heartbeat_at = ? "
+            "WHERE id = (SELECT id FROM report_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+            "AND status = 'queued' RETURNING *",
+            (worker, now, now),
+        )
+        if job is not None:
+            job["params"] = json.loads(job["params"])
+        return job
+
+    def heartbeat(self, job_id):
+        self.db.execute("UPDATE report_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                        (time.time(), job_id))
+
+    def finish(self, job_id, artifact, summary):
+        self.db.execute(
+            "UPDATE report_jobs SET status = 'done', artifact = ?, summary = ?, finished_at = ? WHERE id = ?",
+            (artifact, json.dumps(summary), time.time(), job_id),
+        )
+
+    def fail(self, job_id, error):
+        self.db.execute(
+            "UPDATE report_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (error, time.time(), job_id),
+        )
+
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        """Requeue running jobs whose worker stopped heartbeating (fail them after too many tries)."""
+        cutoff = time.time() - stale_after
+        with self.db.transaction() as execute:
+            execute(
+                "UPDATE report_jobs SET status = 'failed', finished_at = ?, error = 'Worker stopped responding' "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), cutoff, REPORT_MAX_ATTEMPTS),
+            )
+            execute(
+                "UPDATE report_jobs SET status = 'queued', worker = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (cutoff,),
+            )
+
+    def purge(self, older_than=REPORT_RETENTION):
+        """Delete finished jobs (and their files) older than `older_than` seconds."""
+        cutoff = time.time() - older_than
+        old = self.db.fetchall(
+            "SELECT id, artifact FROM report_jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (cutoff,),
+        )
+        for job in old:
+            path = self.artifact_path(job)
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.db.execute("DELETE FROM report_jobs WHERE id = ?", (job["id"],))
+        return len(old)
+
+
+# -------------------------------
+# Workers
+# -------------------------------
+class _Heartbeat:
+    """Refreshes a running job's heartbeat from a side thread while it renders."""
+
+    def __init__(self, queue, job_id, worker=None):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(queue, job_id, worker), daemon=True)
+
+    def _loop(self, queue, job_id, worker):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                queue.heartbeat(job_id)
+                if worker is not None:
+                    queue.worker_seen(worker)
+            except Exception:
+                pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(queue, job, datasets):
+    """Render one claimed job to REPORT_DIR and record the outcome."""
+    import reports
+    os.makedirs(queue.report_dir, exist_ok=True)
+    artifact = f"{job['id']}.pdf"
+    path = os.path.join(queue.report_dir, artifact)
+    partial = f"{path}.{os.getpid()}.part"
+    try:
+        with _Heartbeat(queue, job["id"], job.get("worker")):
+            snapshot = datasets.current
+            if job["fingerprint"] and snapshot.fingerprint != job["fingerprint"]:
+                snapshot = datasets.reload_now()
+            with open(partial, "wb") as out:
+                summary = reports.render(job["kind"], job["params"], snapshot, out)
+            os.replace(partial, path)
+        queue.finish(job["id"], artifact, dict(summary, fingerprint=snapshot.fingerprint))
+    except Exception as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        traceback.print_exc()
+        queue.fail(job["id"], f"{type(e).__name__}: {e}")
+
+
+def work(path=REPORT_DB_PATH, report_dir=REPORT_DIR, stop=None, poll_interval=POLL_INTERVAL):
+    """Worker process main loop: claim, render, repeat until `stop` is set."""
+    from dataset_manager import DatasetManager
+    if stop is None:
+        stop = threading.Event()
+    queue = JobQueue(path, report_dir)
+    datasets = DatasetManager()
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    last_purge = last_seen = 0.0
+    try:
+        while not stop.is_set():
+            if time.time() - last_seen > HEARTBEAT_INTERVAL:
+                queue.worker_seen(name)
+                last_seen = time.time()
+            queue.requeue_stale()
+            job = queue.claim(name)
+            if job is not None:
+                run_job(queue, job, datasets)
+                continue
+            if time.time() - last_purge > 3600:
+                queue.purge()
+                last_purge = time.time()
+            stop.wait(poll_interval)
+    finally:
+        queue.worker_gone(name)
+
+
+class WorkerPool:
+    """`processes` worker processes (spawned, so they share nothing with the caller)."""
+
+    def __init__(self, processes, path=REPORT_DB_PATH, report_dir=REPORT_DIR):
+        self.processes = processes
+        self.path = path
+        self.report_dir = report_dir
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._workers = []
+
+    def start(self):
+        for i in range(self.processes):
+            process = self._context.Process(
+                target=work, args=(self.path, self.report_dir, self._stop),
+                name=f"report-worker-{i}", daemon=True,
+            )
+            process.start()
+            self._workers.append(process)
+        return self
+
+    def stop(self, timeout=10.0):
+        """Let the workers finish their current job, then exit."""
+        self._stop.set()
+        for process in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+
+    def join(self):
+        for process in self._workers:
+            process.join()
+
+    def stats(self):
+        return {"processes": self.processes, "alive": sum(p.is_alive() for p in self._workers)}
+
+
+def pool_from_env(queue):
+    """Start REPORT_WORKERS worker processes for `queue` (none by default)."""
+    processes = int(os.getenv("REPORT_WORKERS", 0))
+    if processes <= 0:
+        return None
+    pool = WorkerPool(processes, queue.path, queue.report_dir).start()
+    atexit.register(pool.stop)
+    return pool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background report jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run report worker processes until SIGTERM/SIGINT")
+    worker.add_argument("--processes", type=int, default=int(os.getenv("REPORT_WORKERS", 0)) or 2)
+    sub.add_parser("status", help="job counts by status")
+    sub.add_parser("purge", help="delete finished jobs older than REPORT_RETENTION")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(json.dumps(JobQueue().counts()))
+    elif args.command == "purge":
+        print(f"Purged {JobQueue().purge()} jobs")
+    else:
+        JobQueue()  # create the table before the workers race to
+        pool = WorkerPool(args.processes).start()
+        print(f"[reports] {args.processes} workers on {REPORT_DB_PATH}, writing to {REPORT_DIR}/", file=sys.stderr)
+        stop = lambda *_: pool.stop()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        pool.join()
+
+
+if __name__ == "__main__":
+    main()
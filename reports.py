@@ -0,0 +1,161 @@
+"""
+Multi-chart reports, rendered as PDFs by the background job workers
+(report_jobs.py) instead of inside a request.
+
+Each report is a pair of functions registered in REPORTS:
+
+    validate(params, snapshot) -> normalized params   (web process, on submit)
+    render(params, snapshot, out) -> summary dict      (job worker)
+
+`validate` raises ValueError for a request the report can't serve, which
+the submit route turns into a 400.  `render` writes the PDF to the file
+object `out`.  matplotlib is imported inside the renderers only, so the web
+process never loads it for the sake of validation.
+"""
+import numpy as np
+import pandas as pd
+
+
+EMPLOYMENT_METRICS = [
+    ("Unemployment Rate (%)", "Estimated Unemployment Rate (%)"),
+    ("Employed", "Estimated Employed"),
+    ("Labour Participation Rate (%)", "Estimated Labour Participation Rate (%)"),
+]
+
+
+def _pdf(out):
+    from matplotlib.backends.backend_pdf import PdfPages
+    return PdfPages(out, metadata={"Creator": "population-analysis-dashboard"})
+
+
+def _match_names(requested, available, label):
+    """Case-insensitive lookup of each requested name; ValueError naming the unknown ones."""
+    by_lower = {name.lower(): name for name in available}
+    unknown = [name for name in requested if name.strip().lower() not in by_lower]
+    if unknown:
+        raise ValueError(f"Unknown {label}: {', '.join(unknown)}")
+    return [by_lower[name.strip().lower()] for name in requested]
+
+
+def _requested(params, key):
+    """A list from params[key] given as a list or a comma-separated string; [] means all."""
+    value = params.get(key) or []
+    if isinstance(value, str):
+        value = [] if value.strip().lower() == "all" else value.split(",")
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError(f"'{key}' must be a list of names or a comma-separated string")
+    return [name for name in value if name.strip()]
+
+
+# -------------------------------
+# Employment analysis (4 plots per region)
+# -------------------------------
+def employment_regions(df):
+    if "Region" not in df.columns:
+        return []
+    return sorted(str(name) for name in df["Region"].dropna().unique())
+
+
+def validate_employment(params, snapshot):
+    available = employment_regions(snapshot.df)
+    if not available:
+        raise ValueError("The dataset has no Region column")
+    regions = _match_names(_requested(params, "regions"), available, "regions")
+    return {"regions": regions or available}
+
+
+def employment_figure(frame, region):
+    """
+    The 4-plot employment analysis: the three monthly series over time,
+    one line per Area (Rural/Urban), plus the unemployment rate's spread.
+    """
+    import charts
+    fig, axes = charts.new_figure((12, 10), 2, 2)
+    for ax, (label, column) in zip(axes.flat, EMPLOYMENT_METRICS):
+        for area, rows in frame.groupby("Area", observed=True):
+            ax.plot(rows["date"], rows[column], marker="o", markersize=3, label=str(area))
+        ax.set_title(f"{label} over time")
+        ax.set_ylabel(label)
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.legend()
+
+    from chart_data import histogram
+    edges, counts, curve = histogram(frame[EMPLOYMENT_METRICS[0][1]], 10)
+    ax = axes.flat[3]
+    ax.bar(edges[:-1], counts, np.diff(edges), align="edge", alpha=0.5, edgecolor="black")
+    if curve is not None:
+        ax.plot(curve[0], curve[1])
+    ax.set_title("Unemployment Rate distribution")
+    ax.set_xlabel(EMPLOYMENT_METRICS[0][0])
+    ax.set_ylabel("Frequency")
+
+    fig.suptitle(f"Employment Analysis: {region}")
+    fig.tight_layout()
+    return fig
+
+
+def render_employment(params, snapshot, out):
+    columns = ["Region", "Area"] + [column for _, column in EMPLOYMENT_METRICS]
+    df = snapshot.df
+    frame = df[columns].assign(date=pd.to_datetime(df["Date"], format="%d-%m-%Y", errors="coerce"))
+    frame = frame.dropna().sort_values("date")
+    groups = dict(list(frame.groupby("Region", observed=True)))
+    pages = 0
+    with _pdf(out) as pdf:
+        for region in params["regions"]:
+            rows = groups.get(region)
+            if rows is None or rows.empty:
+                continue
+            pdf.savefig(employment_figure(rows, region))
+            pages += 1
+    return {"pages": pages}
+
+
+# -------------------------------
+# Literacy distributions (one page per state)
+# -------------------------------
+def validate_literacy(params, snapshot):
+    available = snapshot.literacy_index.names
+    states = _match_names(_requested(params, "states"), available, "states")
+    return {"states": states or sorted(available)}
+
+
+def render_literacy(params, snapshot, out):
+    """An overview of the states' mean literacy, then each state's histogram."""
+    import charts
+    df = snapshot.df_literacy
+    means = snapshot.aggregates.table["effective_literacy_rate_total"].reindex(params["states"]).sort_values()
+
+    with _pdf(out) as pdf:
+        fig, ax = charts.new_figure((10, max(4, 0.25 * len(means) + 1.5)))
+        ax.barh(means.index.astype(str), means.to_numpy())
+        ax.set_xlabel("Mean Literacy Rate (%)")
+        ax.set_title("Literacy Rate by State")
+        fig.tight_layout()
+        pdf.savefig(fig)
+
+        template = charts.histogram_template((10, 5), 30)
+        for state in params["states"]:
+            values = df["effective_literacy_rate_total"].to_numpy()[snapshot.literacy_index.exact(state)]
+            edges, counts, curve = charts.histogram(values, 30)
+            pdf.savefig(template.draw(edges, counts, curve, f"Literacy Rate Distribution in {state}",
+                                      "Total Literacy Rate (%)", "Frequency"))
+    return {"pages": len(params["states"]) + 1}
+
+
+REPORTS = {
+    "employment_analysis": (validate_employment, render_employment),
+    "literacy_distributions": (validate_literacy, render_literacy),
+}
+
+
+def validate(kind, params, snapshot):
+    if kind not in REPORTS:
+        raise ValueError(f"Unknown report '{kind}'. Available: {', '.join(sorted(REPORTS))}")
+    if not isinstance(params, dict):
+        raise ValueError("Report parameters must be a JSON object")
+    return REPORTS[kind][0](params, snapshot)
+
+
+def render(kind, params, snapshot, out):
+    return REPORTS[kind][1](params, snapshot, out)
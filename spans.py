@@ -0,0 +1,60 @@
+"""
+Timing spans for the phases of a request (filter, aggregate, plot, ...).
+
+    with span("plot"):
+        sns.histplot(...)
+
+Durations add up per phase in a thread-local dict that metrics.py opens
+for each request.  Outside a request (CLI, render workers not collecting)
+a span costs two clock reads and records nothing.  Kept free of Flask so
+the render workers can import it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+def start():
+    """Begin collecting spans in this thread; returns the phase dict."""
+    phases = _local.phases = {}
+    return phases
+
+
+def stop():
+    """Stop collecting; returns what was gathered."""
+    phases = getattr(_local, "phases", None)
+    _local.phases = None
+    return phases or {}
+
+
+@contextmanager
+def collect():
+    """Gather the spans recorded in this thread into the yielded dict."""
+    previous = getattr(_local, "phases", None)
+    phases = start()
+    try:
+        yield phases
+    finally:
+        _local.phases = previous
+
+
+def record(phases):
+    """Add `{phase: seconds}` (e.g. from a render worker) to the current collection."""
+    current = getattr(_local, "phases", None)
+    if current is None:
+        return
+    for phase, seconds in phases.items():
+        current[phase] = current.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def span(phase):
+    """Time the block as `phase` of the current request (no-op outside one)."""
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        record({phase: time.perf_counter() - begin})
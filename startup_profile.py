@@ -0,0 +1,95 @@
+"""
+Import-time breakdown of the app (what a cold worker pays before serving).
+
+    python startup_profile.py [--module app] [--top 15] [--mode eager --mode lazy]
+    flask --app app importtime [--mode eager --mode lazy] [--top 15]
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter for each
+STARTUP_MODE given and prints the total wall time plus the slowest modules
+imported directly by `app`, cumulative (children included).  Schema
+creation is skipped (INIT_DB=0) so only imports and startup work are timed.
+
+eager mode loads the dataset and warms the render pool while importing.
+The pool runs inline here (RENDER_POOL_WORKERS=0): spawned workers would
+inherit -X importtime and interleave their output with the app's, so
+their chart imports (what each worker pays) show up under `app` instead.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def run(module="app", mode=None):
+    """(wall seconds, parsed importtime entries) for one cold import."""
+    env = dict(os.environ)
+    env.setdefault("INIT_DB", "0")
+    env["RENDER_POOL_WORKERS"] = "0"
+    if mode:
+        env["STARTUP_MODE"] = mode
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    wall = float(proc.stdout.strip().splitlines()[-1])
+    return wall, parse(proc.stderr)
+
+
+def parse(stderr):
+    """
+    Rebuild the import tree from -X importtime output.  Lines come children
+    first, with the nesting depth given by the indentation of the name.
+    Returns the top-level entries as dicts (name, self_us, cumulative_us,
+    children).
+    """
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = {
+            "name": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "children": pending.pop(depth + 1, []),
+        }
+        pending.setdefault(depth, []).append(entry)
+    return pending.get(0, [])
+
+
+def summarize(module="app", modes=(None,), top=15, out=sys.stdout):
+    for mode in modes:
+        wall, roots = run(module, mode)
+        target = next((entry for entry in roots if entry["name"] == module), None)
+        interpreter = sum(entry["cumulative_us"] for entry in roots if entry is not target)
+
+        print(f"\n== import {module}  (STARTUP_MODE={mode or os.getenv('STARTUP_MODE', 'eager')})", file=out)
+        print(f"   wall time       {wall * 1000:9.1f} ms", file=out)
+        print(f"   interpreter     {interpreter / 1000:9.1f} ms  (site, encodings, ...)", file=out)
+        if target is None:
+            continue
+        print(f"   {target['self_us'] / 1000:9.1f} ms  {module} (module body)", file=out)
+        children = sorted(target["children"], key=lambda entry: entry["cumulative_us"], reverse=True)
+        for entry in children[:top]:
+            print(f"   {entry['cumulative_us'] / 1000:9.1f} ms  {entry['name']}", file=out)
+        rest = children[top:]
+        if rest:
+            print(f"   {sum(e['cumulative_us'] for e in rest) / 1000:9.1f} ms  ({len(rest)} more)", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the app")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--mode", action="append", choices=["eager", "lazy", "warm"],
+                        help="STARTUP_MODE to measure (repeatable; default: current env)")
+    args = parser.parse_args(argv)
+    summarize(args.module, args.mode or [None], args.top)
+
+
+if __name__ == "__main__":
+    main()
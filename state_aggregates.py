@@ -0,0 +1,123 @@
+"""
+Per-state aggregate tables, materialized once when the dataset is loaded.
+
+The comparison, top-states and validation code paths all need the same
+groupby over `state_name`; building it here once turns each request into a
+couple of index lookups instead of a scan over the whole frame.  Rankings
+and percentile positions of every state on the comparison metrics are
+computed alongside it, in one vectorized rank() over the table.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+UNEMPLOYMENT_COLUMN = "Estimated Unemployment Rate (%)"
+
+# column -> aggregation, in the order the comparison chart uses them
+COMPARISON_AGGREGATES = {
+    "population_total": "sum",
+    "effective_literacy_rate_total": "mean",
+    "sex_ratio": "mean",
+    "total_graduates": "sum",
+}
+
+
+def _json_list(values):
+    """Floats with NaN mapped to None."""
+    return [None if isinstance(v, float) and math.isnan(v) else v for v in values.tolist()]
+
+
+class StateAggregates:
+    """
+    Holds the per-state table (indexed and sorted by `state_name`), the set
+    of valid state names, the precomputed top-10 unemployment ranking and
+    each state's rank/percentile on the comparison metrics.
+    """
+
+    def __init__(self, df, table=None):
+        self.has_unemployment = UNEMPLOYMENT_COLUMN in df.columns
+        self.table = self._build_table(df) if table is None else table
+        self._refresh_derived()
+
+    def _build_table(self, df):
+        aggregates = dict(COMPARISON_AGGREGATES)
+        if self.has_unemployment:
+            aggregates[UNEMPLOYMENT_COLUMN] = "mean"
+        # Sums of float32-stored columns (dataset.downcast) are taken in float64
+        narrow = {col: "float64" for col in aggregates if df[col].dtype == np.float32}
+        frame = df[["state_name"] + list(aggregates)].astype(narrow) if narrow else df
+        table = frame.groupby("state_name", observed=True).agg(aggregates).sort_index()
+        # state_name may be categorical; keep a plain string index for lookups/plots
+        table.index = table.index.astype(str)
+        return table
+
+    def _refresh_derived(self):
+        self.valid_states = frozenset(self.table.index)
+        if self.has_unemployment:
+            self.top_unemployment = (
+                self.table[UNEMPLOYMENT_COLUMN]
+                .sort_values(ascending=False)
+                .head(10)
+                .to_dict()
+            )
+        else:
+            self.top_unemployment = {}
+
+        # Rank 1 = highest value; percentile = share of states at or below it
+        metrics = self.table[list(COMPARISON_AGGREGATES)]
+        self.ranks = metrics.rank(ascending=False, method="min")
+        self.percentiles = metrics.rank(method="max", pct=True) * 100
+
+    def updated(self, df, index, changed_states):
+        """
+        New StateAggregates for `df` that recomputes only `changed_states`
+        (rows located through `index`, a StateIndex over df.state_name) and
+        reuses this table for every other state.
+        """
+        if (UNEMPLOYMENT_COLUMN in df.columns) != self.has_unemployment:
+            return StateAggregates(df)
+
+        kept = self.table[~self.table.index.isin(changed_states)]
+        positions = [index.exact(name) for name in changed_states if name in index]
+        if positions:
+            rows = df.iloc[np.concatenate(positions)]
+            table = pd.concat([kept, self._build_table(rows)]).sort_index()
+        else:
+            table = kept
+        return StateAggregates(df, table)
+
+    def is_valid(self, state_name):
+        return state_name in self.valid_states
+
+    def compare_many(self, states=None):
+        """
+        Comparison metrics with every state's rank and percentile for
+        `states` (all states when None), in state-name order.  Ranks and
+        percentiles are relative to all states, not just the ones asked for.
+        Returns a JSON-ready dict; unknown names are listed under "unknown".
+        """
+        if states is None:
+            names, unknown = list(self.table.index), []
+        else:
+            wanted = set(states)
+            names = [name for name in self.table.index if name in wanted]
+            unknown = sorted(wanted - self.valid_states)
+        positions = self.table.index.get_indexer(names)
+
+        metrics = {}
+        for column in COMPARISON_AGGREGATES:
+            ranks = self.ranks[column].to_numpy()[positions]
+            metrics[column] = {
+                "values": _json_list(self.table[column].to_numpy()[positions]),
+                "rank": [None if math.isnan(r) else int(r) for r in ranks.tolist()],
+                "percentile": _json_list(self.percentiles[column].to_numpy()[positions].round(1)),
+            }
+        return {"states": names, "metrics": metrics, "unknown": unknown,
+                "total_states": len(self.table)}
+
+    def select(self, states):
+        """Rows for `states` in state-name order, as a flat frame."""
+        rows = self.table[self.table.index.isin(states)]
+        return rows.reset_index()
@@ -0,0 +1,64 @@
+"""
+Categorical row index over a key column (state name, region code, ...).
+
+The frame is split once into per-key arrays of row positions, so a lookup
+costs a dict access plus `frame.iloc[positions]` -- proportional to the
+rows of that key instead of a scan over the whole column.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class StateIndex:
+    """
+    Maps each distinct value of `keys` to the (ascending) row positions
+    holding it.  `exact` is an equality lookup; `contains` keeps the
+    case-insensitive partial-name matching of the old `str.contains` filter.
+    """
+
+    def __init__(self, keys, max_cached_fragments=1024):
+        codes, uniques = pd.factorize(pd.Series(keys), sort=True)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+        self.names = [str(name) for name in uniques]
+        self._positions = {
+            name: order[bounds[i]:bounds[i + 1]] for i, name in enumerate(self.names)
+        }
+        # casefolded name -> original names (lookup structure for partial matches)
+        self._folded = [(name.casefold(), name) for name in self.names]
+        self._fragment_cache = {}
+        self._max_cached_fragments = max_cached_fragments
+        self._lock = threading.Lock()
+        self._empty = np.empty(0, dtype=np.intp)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def exact(self, key):
+        """Row positions whose key equals `key` (empty array if unknown)."""
+        return self._positions.get(key, self._empty)
+
+    def matching_names(self, fragment):
+        """Distinct keys containing `fragment`, ignoring case."""
+        folded = fragment.casefold()
+        with self._lock:
+            names = self._fragment_cache.get(folded)
+        if names is None:
+            names = tuple(name for key, name in self._folded if folded in key)
+            with self._lock:
+                if len(self._fragment_cache) >= self._max_cached_fragments:
+                    self._fragment_cache.clear()
+                self._fragment_cache[folded] = names
+        return names
+
+    def contains(self, fragment):
+        """Row positions of every key containing `fragment`, in row order."""
+        names = self.matching_names(fragment)
+        if not names:
+            return self._empty
+        if len(names) == 1:
+            return self._positions[names[0]]
+        return np.sort(np.concatenate([self._positions[name] for name in names]))
@@ -0,0 +1,61 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app reads its settings from the environment at import time: point
+# everything it writes at a scratch directory, use SQLite (RENDER) and
+# render charts inline, before any test imports it.
+SCRATCH = tempfile.mkdtemp(prefix="population-tests-")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.environ.update({
+    "RENDER": "1",
+    "SQLITE_PATH": os.path.join(SCRATCH, "app.db"),
+    "STARTUP_MODE": "lazy",
+    "RENDER_POOL_WORKERS": "0",
+    "DATASET_PATH": os.path.join(ROOT, "Dataset.csv"),
+    "DATASET_COLUMNS_DIR": os.path.join(SCRATCH, "dataset_columns"),
+    "CHART_BUNDLE_DIR": os.path.join(SCRATCH, "charts"),
+    "REPORT_DB_PATH": os.path.join(SCRATCH, "reports.db"),
+    "REPORT_DIR": os.path.join(SCRATCH, "reports"),
+    "REPORT_WORKERS": "0",
+    "UPLOAD_DIR": os.path.join(SCRATCH, "uploads"),
+})
+
+
+@pytest.fixture
+def dataset_csv(tmp_path):
+    """A private copy of Dataset.csv (uploads and reloads write to it)."""
+    path = tmp_path / "Dataset.csv"
+    shutil.copy(os.path.join(ROOT, "Dataset.csv"), path)
+    return str(path)
+
+
+@pytest.fixture
+def manager(dataset_csv, tmp_path):
+    """A DatasetManager of its own over the private Dataset.csv copy."""
+    from dataset_manager import DatasetManager
+    return DatasetManager(dataset_csv, columns_dir=str(tmp_path / "columns"), shared=False)
+
+
+@pytest.fixture
+def client():
+    """Test client for the app, on the shared Dataset.csv and a scratch SQLite database."""
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """`login(username)` puts `username` in the client's session."""
+    def login(username):
+        with client.session_transaction() as session:
+            session["user"] = username
+    return login
@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+
+from chart_cache import ChartCache
+
+
+def test_nothing_is_cached_before_the_fingerprint_is_known():
+    cache = ChartCache(None)
+    calls = []
+    for _ in range(2):
+        cache.get_or_render("analyze", {"state": "KERALA"}, lambda: calls.append(1) or "chart")
+    assert len(calls) == 2 and cache.stats()["entries"] == 0
+
+
+def test_new_fingerprint_drops_memory_and_disk_entries(tmp_path):
+    cache = ChartCache("v1", disk_dir=str(tmp_path))
+    assert cache.get_or_render("analyze", {"state": "KERALA"}, lambda: "old chart") == "old chart"
+    assert cache.get_or_render("analyze", {"state": "KERALA"}, lambda: "unused") == "old chart"
+    assert os.listdir(tmp_path) == ["v1"]
+
+    cache.set_fingerprint("v2")
+
+    assert cache.stats()["entries"] == 0
+    assert os.listdir(tmp_path) == []
+    assert cache.get_or_render("analyze", {"state": "KERALA"}, lambda: "new chart") == "new chart"
+    # A restarted worker on v2 picks the chart up from disk
+    assert ChartCache("v2", disk_dir=str(tmp_path)).get(cache.make_key("analyze", {"state": "KERALA"})) == "new chart"
+
+
+def test_chart_rendered_from_another_version_is_not_stored():
+    cache = ChartCache("v2")
+    assert cache.get_or_render("analyze", {"state": "GOA"}, lambda: "stale", fingerprint="v1") == "stale"
+    assert cache.stats()["entries"] == 0
+
+
+def test_reload_invalidates_charts_through_on_swap(manager, dataset_csv):
+    cache = ChartCache(None)
+    manager.on_swap(lambda snapshot: cache.set_fingerprint(snapshot.fingerprint))
+    before = manager.current
+    cache.set_fingerprint(before.fingerprint)
+    cache.get_or_render("analyze", {"state": "KERALA"}, lambda: "before", fingerprint=before.fingerprint)
+
+    raw = pd.read_csv(dataset_csv)
+    raw.loc[raw["state_name"] == "KERALA", "population_total"] += 1000
+    raw.to_csv(dataset_csv, index=False)
+    after = manager.reload_now()
+
+    assert cache.fingerprint == after.fingerprint != before.fingerprint
+    assert cache.get_or_render("analyze", {"state": "KERALA"}, lambda: "after", fingerprint=after.fingerprint) == "after"
@@ -0,0 +1,52 @@
+import pytest
+
+import dataset
+from state_aggregates import COMPARISON_AGGREGATES
+
+
+@pytest.fixture(scope="module")
+def states():
+    """Per-state comparison metrics straight from Dataset.csv, for brute-force checks."""
+    df = dataset.read_csv(dataset.DATASET_PATH)
+    return df.groupby("state_name", observed=True).agg(COMPARISON_AGGREGATES)
+
+
+def test_batch_ranks_match_a_scan_over_all_states(client, states):
+    body = client.post("/compare_states/batch", json={"states": ["kerala", " punjab ", "BIHAR"]}).get_json()
+
+    assert body["states"] == ["BIHAR", "KERALA", "PUNJAB"]
+    assert body["unknown"] == []
+    assert body["total_states"] == len(states)
+    for metric in body["metrics"]:
+        column = states[metric["column"]]
+        for k, name in enumerate(body["states"]):
+            value = column[name]
+            assert metric["values"][k] == pytest.approx(value)
+            assert metric["rank"][k] == int((column > value).sum()) + 1
+            assert metric["percentile"][k] == pytest.approx(round(100 * (column <= value).mean(), 1))
+
+
+def test_unknown_states_are_reported_per_item(client):
+    body = client.post("/compare_states/batch", json={"states": ["KERALA", "ATLANTIS", "NARNIA"]}).get_json()
+    assert body["states"] == ["KERALA"]
+    assert body["unknown"] == ["ATLANTIS", "NARNIA"]
+    assert all(len(metric["values"]) == 1 for metric in body["metrics"])
+
+    response = client.post("/compare_states/batch", json={"states": ["ATLANTIS"]})
+    assert response.status_code == 400
+    assert response.get_json()["unknown"] == ["ATLANTIS"]
+
+
+def test_get_and_all(client, states):
+    body = client.get("/compare_states/batch?states=KERALA,PUNJAB").get_json()
+    assert body["states"] == ["KERALA", "PUNJAB"]
+
+    body = client.get("/compare_states/batch?states=all").get_json()
+    assert body["states"] == sorted(states.index)
+
+
+@pytest.mark.parametrize("payload", [{}, {"states": []}, {"states": "KERALA"}, {"states": ["KERALA", 3]}])
+def test_bad_payloads_are_rejected(client, payload):
+    response = client.post("/compare_states/batch", json=payload)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
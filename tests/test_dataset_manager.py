@@ -0,0 +1,84 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from dataset_manager import DatasetSnapshot
+
+
+def edit_state(path, state, column="population_total", delta=1000):
+    raw = pd.read_csv(path)
+    raw.loc[raw["state_name"] == state, column] += delta
+    raw.to_csv(path, index=False)
+
+
+def test_reload_without_changes_keeps_the_snapshot(manager):
+    before = manager.current
+    assert manager.reload_now() is before
+    assert manager.reload_count == 0
+
+
+def test_reload_swaps_in_a_new_snapshot_and_leaves_the_old_one_intact(manager, dataset_csv):
+    before = manager.current
+    old_total = before.df.loc[before.df["state_name"] == "KERALA", "population_total"].sum()
+
+    edit_state(dataset_csv, "KERALA")
+    after = manager.reload_now()
+
+    assert after is manager.current and after is not before
+    assert after.fingerprint != before.fingerprint
+    assert after.changed_states == {"KERALA"}
+    assert before.df.loc[before.df["state_name"] == "KERALA", "population_total"].sum() == old_total
+    assert after.df.loc[after.df["state_name"] == "KERALA", "population_total"].sum() > old_total
+
+
+def test_incremental_aggregates_match_a_fresh_build(manager, dataset_csv):
+    manager.current
+    edit_state(dataset_csv, "KERALA")
+    edit_state(dataset_csv, "PUNJAB", "literates_total", 50)
+    after = manager.reload_now()
+
+    fresh = DatasetSnapshot(after.df, after.fingerprint)
+    assert after.changed_states == {"KERALA", "PUNJAB"}
+    pd.testing.assert_frame_equal(after.aggregates.table, fresh.aggregates.table)
+    assert after.state_hashes == fresh.state_hashes
+
+
+def test_swap_notifies_listeners(manager, dataset_csv):
+    seen = []
+    manager.on_swap(seen.append)
+    first = manager.current
+    edit_state(dataset_csv, "KERALA")
+    second = manager.reload_now()
+    assert seen == [first, second]
+
+
+def test_readers_see_whole_snapshots_during_reloads(manager, dataset_csv):
+    """Every snapshot a reader grabs is internally consistent while reloads swap underneath it."""
+    manager.current
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        while not stop.is_set():
+            snapshot = manager.current
+            try:
+                assert len(snapshot.df_literacy) == len(snapshot.df)
+                assert set(snapshot.state_hashes) == set(snapshot.state_index.names)
+                kerala = snapshot.df.loc[snapshot.df["state_name"] == "KERALA", "population_total"].sum()
+                assert snapshot.aggregates.table.loc["KERALA", "population_total"] == pytest.approx(kerala)
+            except AssertionError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(3):
+        edit_state(dataset_csv, "KERALA")
+        manager.reload_now()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert manager.reload_count == 3
+    assert not errors
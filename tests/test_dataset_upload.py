@@ -0,0 +1,149 @@
+import os
+
+import pandas as pd
+import pytest
+
+import dataset_upload
+from dataset import read_csv
+from dataset_manager import DatasetManager
+
+
+def write_upload(tmp_path, frame, name="upload.csv"):
+    path = tmp_path / name
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def sample_upload(dataset_csv):
+    """5 rows as they are, 3 with a changed population and 2 new cities (one in a new state)."""
+    raw = pd.read_csv(dataset_csv)
+    unchanged = raw.iloc[0:5]
+    changed = raw.iloc[5:8].copy()
+    changed["population_total"] += 1000
+    new = raw.iloc[8:10].copy()
+    new["name_of_city"] = ["Newtown", "Othertown"]
+    new.loc[new.index[1], "state_name"] = "NEW STATE"
+    return pd.concat([unchanged, changed, new]), changed
+
+
+def test_diff_counts_changed_new_and_unchanged_rows(manager, dataset_csv, tmp_path):
+    upload, _ = sample_upload(dataset_csv)
+    snapshot = manager.current
+    live_keys, live_hashes = snapshot.row_hashes()
+
+    delta = dataset_upload.diff(write_upload(tmp_path, upload), snapshot.df, live_keys, live_hashes)
+
+    assert delta.counts == {"rows": 10, "new": 2, "changed": 3, "unchanged": 5}
+    assert len(delta) == 5
+    assert sorted(delta.replaced) == [5, 6, 7]
+    assert "NEW STATE" in delta.new_states
+
+
+def test_merged_frame_replaces_changed_rows_and_appends_new(manager, dataset_csv, tmp_path):
+    upload, changed = sample_upload(dataset_csv)
+    snapshot = manager.current
+    live_keys, live_hashes = snapshot.row_hashes()
+    delta = dataset_upload.diff(write_upload(tmp_path, upload), snapshot.df, live_keys, live_hashes)
+
+    df, keep = dataset_upload.merged_frame(snapshot.df, delta)
+
+    assert len(df) == len(snapshot.df) + 2
+    assert not keep[5:8].any() and keep.sum() == len(snapshot.df) - 3
+    for city, population in zip(changed["name_of_city"].str.strip(), changed["population_total"]):
+        assert df.loc[df["name_of_city"] == city, "population_total"].tolist() == [population]
+    assert {"Newtown", "Othertown"} <= set(df["name_of_city"])
+
+
+def test_apply_upload_matches_a_full_reload(manager, dataset_csv, tmp_path):
+    upload, _ = sample_upload(dataset_csv)
+    before = manager.current
+
+    summary = manager.apply_upload(write_upload(tmp_path, upload))
+
+    after = manager.current
+    assert after is not before
+    assert summary["changed"] == 3 and summary["new"] == 2 and summary["total_rows"] == len(before.df) + 2
+    assert "NEW STATE" in summary["states"]
+
+    reloaded = DatasetManager(dataset_csv, columns_dir=str(tmp_path / "columns"), shared=False).current
+    assert reloaded.fingerprint == after.fingerprint
+    pd.testing.assert_frame_equal(after.df, reloaded.df)
+    pd.testing.assert_frame_equal(after.aggregates.table, reloaded.aggregates.table)
+    assert after.state_hashes == reloaded.state_hashes
+
+
+def test_unchanged_upload_keeps_the_snapshot(manager, dataset_csv, tmp_path):
+    before = manager.current
+    summary = manager.apply_upload(write_upload(tmp_path, pd.read_csv(dataset_csv).head(20)))
+    assert summary["unchanged"] == 20 and summary["states"] == []
+    assert manager.current is before
+    assert len(read_csv(dataset_csv)) == len(before.df)
+
+
+def test_upload_with_wrong_columns_is_rejected(manager, dataset_csv, tmp_path):
+    size = os.path.getsize(dataset_csv)
+    with pytest.raises(dataset_upload.UploadError):
+        manager.apply_upload(write_upload(tmp_path, pd.DataFrame({"a": [1], "b": [2]})))
+
+    bad = pd.read_csv(dataset_csv).head(3)
+    bad["population_total"] = "lots"
+    with pytest.raises(dataset_upload.UploadError) as error:
+        manager.apply_upload(write_upload(tmp_path, bad, "bad.csv"))
+    assert error.value.problems
+    assert os.path.getsize(dataset_csv) == size
+
+
+def test_columnar_copy_follows_uploads(dataset_csv, tmp_path):
+    import dataset
+    columns = str(tmp_path / "columns")
+    dataset.build(dataset_csv, columns)
+    manager = DatasetManager(dataset_csv, columns_dir=columns, shared=True)
+    upload, _ = sample_upload(dataset_csv)
+
+    manager.apply_upload(write_upload(tmp_path, upload))
+    writer = manager._columnar_thread
+    if writer is not None:
+        writer.join(timeout=30)
+
+    manifest = dataset.read_manifest(columns)
+    assert dataset.is_fresh(manifest, dataset_csv)
+    assert manifest["source_fingerprint"] == manager.current.fingerprint
+    pd.testing.assert_frame_equal(dataset.read_columnar(columns, manifest), manager.current.df)
+
+
+def test_diff_handles_repeated_live_keys(manager, dataset_csv, tmp_path):
+    upload, _ = sample_upload(dataset_csv)
+    snapshot = manager.current
+    live_keys, live_hashes = snapshot.row_hashes()
+    # Two live rows sharing a key hash (a collision): the last one speaks for it
+    live_keys = live_keys.copy()
+    live_keys[4] = live_keys[6]
+
+    delta = dataset_upload.diff(write_upload(tmp_path, upload), snapshot.df, live_keys, live_hashes)
+
+    assert delta.counts["changed"] == 3
+    assert sorted(delta.replaced) == [4, 5, 6, 7]
+
+
+def test_upload_rediffs_when_the_snapshot_moves_underneath(manager, dataset_csv, tmp_path, monkeypatch):
+    upload, _ = sample_upload(dataset_csv)
+    other = pd.read_csv(dataset_csv).iloc[20:21].copy()
+    other["name_of_city"] = ["Thirdtown"]
+    other_path = write_upload(tmp_path, other, "other.csv")
+    diff, calls = dataset_upload.diff, []
+
+    def diff_with_upload_in_between(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 1:
+            # The lock is not held while diffing, so another upload gets through
+            manager.apply_upload(other_path)
+        return diff(*args, **kwargs)
+
+    monkeypatch.setattr(dataset_upload, "diff", diff_with_upload_in_between)
+    before = len(manager.current.df)
+    summary = manager.apply_upload(write_upload(tmp_path, upload))
+
+    assert calls == [calls[0], other_path, calls[0]]  # outer, inner, outer again
+    assert summary["new"] == 2 and summary["total_rows"] == before + 3
+    assert {"Newtown", "Othertown", "Thirdtown"} <= set(manager.current.df["name_of_city"])
+    assert len(read_csv(dataset_csv)) == before + 3
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+import dataset
+import etl
+
+
+def test_clean_population_matches_whole_file_pivot(tmp_path):
+    wide = pd.DataFrame({
+        "State": ["Goa", "Kerala", "Goa", "Assam", "Kerala"],
+        "2011_Persons": [100, 200, 300, 400, 501],
+        "2011_Male": [50, 90, 150, None, 250],
+        "2011_Female": [50, 110, 150, 200, 251],
+        "2001_Persons": [80, 180, 280, 380, 480],
+        "2001_Male": [40, 85, 140, 190, 240],
+        "2001_Female": [40, 95, 140, 190, 240],
+    })
+    path = tmp_path / "population.csv"
+    wide.to_csv(path, index=False)
+
+    long = wide.melt(id_vars=["State"], var_name="Year_Population", value_name="Population")
+    long["Year"] = long["Year_Population"].str.extract(r'(\d{4})', expand=False).astype(int)
+    long["Category"] = long["Year_Population"].str.extract(r'_(Persons|Male|Female)', expand=False)
+    expected = long.pivot_table(index=["State", "Year"], columns="Category", values="Population").reset_index()
+    expected.columns.name = None
+    expected = expected[["State", "Year"] + etl.POPULATION_CATEGORIES]
+
+    table = etl.clean_population(str(path), chunksize=2)
+    pd.testing.assert_frame_equal(table.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_columnar_writer_promotes_a_column_that_turns_to_text(tmp_path):
+    writer = dataset.ColumnarWriter(str(tmp_path / "columns"))
+    writer.append(pd.DataFrame({"note": [np.nan, np.nan], "count": [1, 2]}))
+    writer.append(pd.DataFrame({"note": ["late", None], "count": [3, 4]}))
+    writer.append(pd.DataFrame({"note": [7.0, "late"], "count": [5, 6]}))
+    writer.close(str(tmp_path / "missing.csv"), "fp")
+
+    columns_dir = str(tmp_path / "columns")
+    manifest = dataset.read_manifest(columns_dir)
+    kinds = {entry["name"]: entry["kind"] for entry in manifest["columns"]}
+    assert kinds == {"note": "string", "count": "numeric"}
+
+    frame = dataset.read_columnar(columns_dir, manifest)
+    assert frame["note"].tolist()[2] == "late"
+    assert pd.isna(frame["note"]).tolist() == [True, True, False, True, False, False]
+    assert frame["note"].tolist()[4:] == ["7.0", "late"]
+    assert frame["count"].tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_columnar_writer_promotes_spooled_numbers(tmp_path):
+    writer = dataset.ColumnarWriter(str(tmp_path / "columns"))
+    writer.append(pd.DataFrame({"code": np.array([11, 12], dtype=np.int32)}))
+    writer.append(pd.DataFrame({"code": ["A1", "12"]}))
+    writer.close(str(tmp_path / "missing.csv"), "fp")
+
+    columns_dir = str(tmp_path / "columns")
+    frame = dataset.read_columnar(columns_dir, dataset.read_manifest(columns_dir))
+    assert frame["code"].tolist() == ["11", "12", "A1", "12"]
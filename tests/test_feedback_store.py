@@ -0,0 +1,90 @@
+import pytest
+
+import feedback_store
+from db import Database, ensure_schema
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database.sqlite(str(tmp_path / "feedback.db"))
+    ensure_schema(database)
+    return database
+
+
+def insert_raw(db, rating, created_at="2024-01-01 10:00:00", username="alice"):
+    """A row as older code wrote it: straight into feedback, counters untouched."""
+    db.execute("INSERT INTO feedback (username, email, message, rating, created_at) VALUES (?, '', 'm', ?, ?)",
+               (username, rating, created_at))
+
+
+def test_pages_walk_every_row_newest_first(db):
+    # Two rows per timestamp, so pages also have to break ties on id
+    for i in range(7):
+        insert_raw(db, i % 5 + 1, created_at=f"2024-01-0{i // 2 + 1} 10:00:00")
+    everything = db.fetchall("SELECT id FROM feedback ORDER BY created_at DESC, id DESC")
+
+    seen, token = [], None
+    while True:
+        rows, token = feedback_store.list_feedback(db, limit=3, after=token)
+        assert len(rows) <= 3
+        seen.extend(row["id"] for row in rows)
+        if token is None:
+            break
+    assert seen == [row["id"] for row in everything]
+
+
+def test_filters_and_bad_tokens(db):
+    for i in range(6):
+        insert_raw(db, 5 if i % 2 else 3, created_at=f"2024-01-0{i + 1} 10:00:00",
+                   username="bob" if i < 2 else "alice")
+
+    rows, token = feedback_store.list_feedback(db, rating=5)
+    assert [row["rating"] for row in rows] == [5, 5, 5] and token is None
+    rows, _ = feedback_store.list_feedback(db, username="bob")
+    assert {row["username"] for row in rows} == {"bob"} and len(rows) == 2
+    rows, _ = feedback_store.list_feedback(db, after="not-a-token")
+    assert len(rows) == 6
+    assert len(feedback_store.list_feedback(db, limit=10_000)[0]) == 6
+
+
+def test_counters_follow_inserts(db):
+    for rating in (5, 5, 3, None):
+        feedback_store.add_feedback(db, "alice", "", "msg", rating)
+
+    summary = feedback_store.rating_summary(db)
+    assert summary["counts"] == {1: 0, 2: 0, 3: 1, 4: 0, 5: 2}
+    assert summary["total"] == 4 and summary["unrated"] == 1
+    assert summary["average"] == pytest.approx(13 / 3, abs=0.01)
+
+
+def test_backfill_counts_bad_old_ratings_as_unrated(db):
+    db.execute("DELETE FROM feedback_rating_counts")  # as before the first backfill
+    for rating in (4, 4, 2, None, "abc", "", 10):
+        insert_raw(db, rating)
+
+    feedback_store.backfill_rating_counts(db)
+    feedback_store.backfill_rating_counts(db)  # second run is a no-op
+
+    summary = feedback_store.rating_summary(db)
+    assert summary["counts"] == {1: 0, 2: 1, 3: 0, 4: 2, 5: 0}
+    assert summary["total"] == 7 and summary["unrated"] == 4
+    assert summary["average"] == pytest.approx(10 / 3, abs=0.01)
+
+
+def test_summary_ignores_out_of_range_counter_rows(db):
+    # Left by the backfill before it filtered on 1-5
+    db.execute("INSERT INTO feedback_rating_counts (rating, total) VALUES (10, 2)")
+    feedback_store.add_feedback(db, "alice", "", "msg", 4)
+
+    summary = feedback_store.rating_summary(db)
+    assert set(summary["counts"]) == {1, 2, 3, 4, 5}
+    assert summary["average"] == 4.0 and summary["total"] == 3
+
+
+def test_view_feedback_page(client, login):
+    from app import ADMIN_USERNAME
+    login(ADMIN_USERNAME)
+    assert client.post("/feedback", data={"message": "nice", "rating": "abc"}).status_code == 400
+    assert client.post("/feedback", data={"message": "nice", "rating": "4"}).status_code == 302
+    page = client.get("/view_feedback?rating=4")
+    assert page.status_code == 200 and b"nice" in page.data
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+import dataset
+from geo_index import CityGeoIndex, haversine_km
+
+
+@pytest.fixture(scope="module")
+def cities():
+    """Every city with a location as (name, state, lat, lon) arrays, for brute-force scans."""
+    df = dataset.read_csv(dataset.DATASET_PATH).drop_duplicates(["name_of_city", "state_name"])
+    df = df[np.isfinite(df["latitude"].astype(float)) & np.isfinite(df["longitude"].astype(float))]
+    return (df["name_of_city"].astype(str).to_numpy(), df["state_name"].astype(str).to_numpy(),
+            df["latitude"].to_numpy(dtype=float), df["longitude"].to_numpy(dtype=float))
+
+
+@pytest.fixture(scope="module")
+def grid():
+    return CityGeoIndex(dataset.read_csv(dataset.DATASET_PATH))
+
+
+def names(body):
+    return {(city["name"], city["state"]) for city in body["cities"]}
+
+
+def edge_point(grid):
+    """A point just inside a grid cell's south-west corner, in the middle of the data."""
+    lat = grid.lat0 + (grid.ny // 2) * grid.cell_deg + 0.01
+    lon = grid.lon0 + (grid.nx // 2) * grid.cell_deg + 0.01
+    return lat, lon
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [
+    (28.61, 77.21, 50),        # Delhi
+    (19.08, 72.88, 250),       # Mumbai, wide
+    (13.08, 80.27, 5),         # Chennai, tight
+    (10.0, 60.0, 100),         # sea, nothing there
+    (None, None, 120),         # just inside a cell corner, reaching into three neighbours
+])
+def test_within_matches_a_haversine_scan(client, cities, grid, lat, lon, radius_km):
+    if lat is None:
+        lat, lon = edge_point(grid)
+    name, state, lats, lons = cities
+    distances = haversine_km(lat, lon, lats, lons)
+    inside = distances <= radius_km
+
+    body = client.get("/cities/within", query_string={
+        "lat": lat, "lon": lon, "radius_km": radius_km, "limit": 500,
+    }).get_json()
+
+    assert body["count"] == int(inside.sum())
+    assert names(body) == set(zip(name[inside], state[inside]))
+    got = [city["distance_km"] for city in body["cities"]]
+    assert got == sorted(got)
+    assert np.allclose(got, np.round(np.sort(distances[inside]), 3))
+
+
+def test_edge_query_reaches_past_its_own_cell(cities, grid):
+    lat, lon = edge_point(grid)
+    _, _, lats, lons = cities
+    inside = haversine_km(lat, lon, lats, lons) <= 120
+    own_cell = ((lats - grid.lat0) // grid.cell_deg == grid.ny // 2) & ((lons - grid.lon0) // grid.cell_deg == grid.nx // 2)
+    assert (inside & ~own_cell).any()
+
+
+@pytest.mark.parametrize("lat, lon, k", [(28.61, 77.21, 10), (22.0, 88.0, 1), (8.0, 95.0, 25)])
+def test_nearest_matches_a_haversine_scan(client, cities, lat, lon, k):
+    _, _, lats, lons = cities
+    expected = np.sort(haversine_km(lat, lon, lats, lons))[:k]
+
+    body = client.get("/cities/nearest", query_string={"lat": lat, "lon": lon, "k": k}).get_json()
+
+    assert body["count"] == k
+    assert np.allclose([city["distance_km"] for city in body["cities"]], np.round(expected, 3))
+
+
+@pytest.mark.parametrize("box", [
+    {"min_lat": 18.0, "min_lon": 72.0, "max_lat": 20.0, "max_lon": 74.5},
+    {"min_lat": 0.0, "min_lon": 60.0, "max_lat": 40.0, "max_lon": 100.0},
+    {"min_lat": 25.0, "min_lon": 75.0, "max_lat": 25.0, "max_lon": 75.0},
+])
+def test_bbox_matches_a_scan(client, cities, box):
+    name, state, lats, lons = cities
+    inside = ((lats >= box["min_lat"]) & (lats <= box["max_lat"])
+              & (lons >= box["min_lon"]) & (lons <= box["max_lon"]))
+
+    body = client.get("/cities/bbox", query_string=dict(box, limit=500)).get_json()
+
+    assert body["count"] == int(inside.sum())
+    assert names(body) == set(zip(name[inside], state[inside]))
+    populations = [city["population"] for city in body["cities"]]
+    assert populations == sorted(populations, reverse=True)
+
+
+def test_bad_coordinates_are_rejected(client):
+    assert client.get("/cities/within?lat=91&lon=0&radius_km=5").status_code == 400
+    assert client.get("/cities/within?lat=10&lon=10&radius_km=0").status_code == 400
+    assert client.get("/cities/bbox?min_lat=5&min_lon=0&max_lat=4&max_lon=1").status_code == 400
@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import http_cache
+
+
+BBOX = "/cities/bbox?min_lat=0&max_lat=40&min_lon=60&max_lon=100"  # well over COMPRESS_MIN_BYTES
+
+
+def decoded(response):
+    encoding = response.headers.get("Content-Encoding")
+    if encoding == "gzip":
+        return json.loads(gzip.decompress(response.data))
+    if encoding == "br":
+        return json.loads(http_cache.brotli.decompress(response.data))
+    return response.get_json()
+
+
+def test_matching_if_none_match_gets_an_empty_304(client):
+    first = client.get(BBOX)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == f"public, max-age={http_cache.MAX_AGE}"
+
+    again = client.get(BBOX, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+    assert "Accept-Encoding" in again.headers["Vary"]
+
+    other = client.get(BBOX.replace("max_lat=40", "max_lat=30"), headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_each_encoding_has_its_own_etag_and_all_revalidate(client):
+    plain = client.get(BBOX, headers={"Accept-Encoding": "identity"})
+    packed = client.get(BBOX, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert decoded(packed) == plain.get_json()
+
+    for response in (plain, packed):
+        cached = client.get(BBOX, headers={"If-None-Match": response.headers["ETag"]})
+        assert cached.status_code == 304
+
+
+def test_preferred_encoding_follows_the_servers_order(client):
+    response = client.get(BBOX, headers={"Accept-Encoding": "br, gzip"})
+    # brotli when it is installed, gzip otherwise
+    assert response.headers["Content-Encoding"] == http_cache.ENCODINGS[0]
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    response = client.get(BBOX, headers={"Accept-Encoding": "gzip;q=1.0, br;q=0.5"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    response = client.get(BBOX, headers={"Accept-Encoding": "gzip;q=0, br"})
+    assert response.headers.get("Content-Encoding") == ("br" if http_cache.brotli else None)
+    assert decoded(response)["count"] >= 1
+
+
+def test_small_bodies_are_sent_plain_but_still_vary(client):
+    response = client.get("/top_states", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert len(response.data) < http_cache.COMPRESS_MIN_BYTES
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
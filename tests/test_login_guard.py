@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from login_guard import (HashBusy, HashExecutor, LoginGuard, SqliteTokenBuckets, TokenBuckets, UnknownUsers,
+                         client_ip)
+
+
+def make_guard(ip_burst=20, user_burst=5, per_minute=60):
+    return LoginGuard(TokenBuckets(ip_burst, per_minute / 60), TokenBuckets(user_burst, per_minute / 60),
+                      UnknownUsers(ttl=30), HashExecutor(workers=1, queue_size=1))
+
+
+def test_bucket_allows_the_burst_then_refills():
+    buckets = TokenBuckets(burst=3, rate=0.5)
+    assert [buckets.take("k", now=100) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("k", now=100) == pytest.approx(2.0)
+    assert buckets.take("k", now=101) == pytest.approx(1.0)  # half a token back, still short
+    assert buckets.take("k", now=103) == 0
+    assert buckets.take("other", now=103) == 0
+
+
+def test_username_is_locked_out_after_its_burst():
+    guard = make_guard(user_burst=5)
+    assert all(guard.throttle("10.0.0.1", "alice") == 0 for _ in range(5))
+    assert guard.throttle("10.0.0.2", "Alice ") > 0  # other IP, same (normalized) user
+    assert guard.throttle("10.0.0.2", "bob") == 0
+    assert guard.throttled_count == 1
+
+
+def test_refused_ip_does_not_spend_the_users_tokens():
+    guard = make_guard(ip_burst=2, user_burst=3)
+    assert guard.throttle("10.0.0.1", "alice") == 0
+    assert guard.throttle("10.0.0.1", "alice") == 0
+    assert guard.throttle("10.0.0.1", "alice") > 0
+    assert guard.throttle("10.0.0.2", "alice") == 0  # one of alice's three still left
+
+
+def test_sqlite_buckets_are_shared_and_exact_under_concurrency(tmp_path):
+    path = str(tmp_path / "throttle.db")
+    first = SqliteTokenBuckets(path, burst=10, rate=0.001, prefix="user:")
+    second = SqliteTokenBuckets(path, burst=10, rate=0.001, prefix="user:")
+    results = []
+
+    def attempt(buckets):
+        for _ in range(10):
+            results.append(buckets.take("alice"))
+
+    threads = [threading.Thread(target=attempt, args=(b,)) for b in (first, second, first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(1 for wait in results if wait == 0) == 10
+    assert len(first) == len(second) == 1
+
+
+def test_unknown_usernames_skip_the_lookup_until_registered():
+    guard = make_guard()
+    lookups = []
+
+    def fetch(username):
+        lookups.append(username)
+        return None
+
+    assert guard.password_hash("ghost", fetch) is None
+    assert guard.password_hash("ghost", fetch) is None
+    assert lookups == ["ghost"] and guard.unknown_users.hits == 1
+
+    guard.registered("ghost")
+    assert guard.password_hash("ghost", lambda username: "hash") == "hash"
+
+
+def test_hash_executor_refuses_work_beyond_its_queue():
+    executor = HashExecutor(workers=1, queue_size=1, timeout=5)
+    release = threading.Event()
+    running = executor.submit(release.wait)
+    queued = executor.submit(release.wait)
+    with pytest.raises(HashBusy):
+        executor.submit(release.wait)
+    release.set()
+    assert running.result(timeout=5) and queued.result(timeout=5)
+    assert executor.stats()["rejected"] == 1
+    assert executor.submit(lambda: "ok").result(timeout=5) == "ok"
+
+
+def test_verify_and_hash_password_round_trip():
+    guard = make_guard()
+    stored = guard.hash_password("s3cret")
+    assert guard.verify(stored, "s3cret")
+    assert not guard.verify(stored, "wrong")
+
+
+def test_client_ip_trusts_only_the_configured_proxy_hops():
+    assert client_ip("10.0.0.9", "1.1.1.1, 2.2.2.2", hops=0) == "10.0.0.9"
+    assert client_ip("10.0.0.9", "1.1.1.1, 2.2.2.2", hops=1) == "2.2.2.2"
+    assert client_ip("10.0.0.9", "2.2.2.2", hops=2) == "10.0.0.9"
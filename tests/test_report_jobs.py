@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import report_jobs
+import reports
+from report_jobs import JobQueue, NoWorkers, QueueFull
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "reports"))
+    queue.worker_seen("test-worker")
+    return queue
+
+
+def fake_datasets(fingerprint="fp1"):
+    return SimpleNamespace(current=SimpleNamespace(fingerprint=fingerprint))
+
+
+def test_identical_reports_share_a_job(queue):
+    job, created = queue.submit("literacy_distributions", {"states": "all"}, "fp1")
+    again, created_again = queue.submit("literacy_distributions", {"states": "all"}, "fp1")
+    other, created_other = queue.submit("literacy_distributions", {"states": "all"}, "fp2")
+    assert created and not created_again and created_other
+    assert again["id"] == job["id"] != other["id"]
+    assert queue.get(other["id"])["queue_position"] == 2
+
+
+def test_full_queue_is_refused(queue, monkeypatch):
+    monkeypatch.setattr(report_jobs, "REPORT_MAX_QUEUED", 2)
+    queue.submit("a", {}, "fp")
+    queue.submit("b", {}, "fp")
+    with pytest.raises(QueueFull):
+        queue.submit("c", {}, "fp")
+
+
+def test_reports_are_refused_without_live_workers(queue):
+    queue.worker_gone("test-worker")
+    with pytest.raises(NoWorkers):
+        queue.submit("a", {}, "fp")
+    queue.worker_seen("w1")
+    assert queue.live_workers() == 1
+    assert queue.submit("a", {}, "fp")[1]
+    assert queue.live_workers(within=-1) == 0
+
+
+def test_claim_takes_the_oldest_queued_job_once(queue):
+    first, _ = queue.submit("a", {"n": 1}, "fp")
+    second, _ = queue.submit("b", {"n": 2}, "fp")
+
+    job = queue.claim("w1")
+    assert job["id"] == first["id"] and job["params"] == {"n": 1}
+    assert job["status"] == "running" and job["attempts"] == 1 and job["worker"] == "w1"
+    assert queue.claim("w2")["id"] == second["id"]
+    assert queue.claim("w3") is None
+    assert queue.counts() == {"queued": 0, "running": 2, "done": 0, "failed": 0}
+
+
+def test_concurrent_workers_never_claim_the_same_job(queue):
+    ids = {queue.submit("k", {"n": n}, "fp")[0]["id"] for n in range(30)}
+    claimed = []
+
+    def worker(name):
+        own = JobQueue(queue.path, queue.report_dir)
+        while True:
+            job = own.claim(name)
+            if job is None:
+                return
+            claimed.append(job["id"])
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(ids)
+
+
+def test_stale_jobs_are_retried_then_failed(queue, monkeypatch):
+    monkeypatch.setattr(report_jobs, "REPORT_MAX_ATTEMPTS", 2)
+    job, _ = queue.submit("a", {}, "fp")
+
+    queue.claim("dead-worker")
+    queue.requeue_stale(stale_after=60)  # heartbeat is fresh: left alone
+    assert queue.get(job["id"])["status"] == "running"
+
+    queue.requeue_stale(stale_after=-1)
+    retried = queue.get(job["id"])
+    assert retried["status"] == "queued" and retried["worker"] is None
+
+    assert queue.claim("w2")["attempts"] == 2
+    queue.requeue_stale(stale_after=-1)
+    failed = queue.get(job["id"])
+    assert failed["status"] == "failed" and failed["error"] == "Worker stopped responding"
+    assert queue.claim("w3") is None
+
+
+def test_run_job_records_the_artifact(queue, monkeypatch):
+    def render(kind, params, snapshot, out):
+        out.write(b"%PDF-1.4")
+        return {"pages": 1}
+
+    monkeypatch.setattr(reports, "render", render)
+    job, _ = queue.submit("a", {}, "fp1")
+    report_jobs.run_job(queue, queue.claim("w1"), fake_datasets("fp1"))
+
+    done = queue.get(job["id"])
+    assert done["status"] == "done" and done["summary"] == {"pages": 1, "fingerprint": "fp1"}
+    with open(queue.artifact_path(done), "rb") as fh:
+        assert fh.read() == b"%PDF-1.4"
+    assert queue.submit("a", {}, "fp1") == (done, False)
+
+
+def test_run_job_failure_leaves_no_partial_file(queue, monkeypatch):
+    def render(kind, params, snapshot, out):
+        out.write(b"half")
+        raise ValueError("no such state")
+
+    monkeypatch.setattr(reports, "render", render)
+    job, _ = queue.submit("a", {}, "fp1")
+    report_jobs.run_job(queue, queue.claim("w1"), fake_datasets("fp1"))
+
+    failed = queue.get(job["id"])
+    assert failed["status"] == "failed" and failed["error"] == "ValueError: no such state"
+    assert os.listdir(queue.report_dir) == []
+
+
+def test_report_through_the_http_routes(client, login):
+    login("alice")
+    assert client.post("/reports", json={"kind": "literacy_distributions", "states": ["KERALA"]}).status_code == 503
+
+    stop = threading.Event()
+    worker = threading.Thread(target=report_jobs.work, kwargs={"stop": stop, "poll_interval": 0.05})
+    worker.start()
+    try:
+        deadline = time.time() + 10
+        while not JobQueue().live_workers() and time.time() < deadline:
+            time.sleep(0.05)
+        response = client.post("/reports", json={"kind": "literacy_distributions", "states": ["KERALA"]})
+        assert response.status_code == 202
+        job_id = response.get_json()["id"]
+
+        deadline = time.time() + 60
+        status = response.get_json()["status"]
+        while status in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.1)
+            status = client.get(f"/reports/{job_id}").get_json()["status"]
+        assert status == "done"
+
+        download = client.get(f"/reports/{job_id}/download")
+        assert download.status_code == 200
+        assert download.mimetype == "application/pdf" and download.data.startswith(b"%PDF")
+
+        login("mallory")
+        assert client.get(f"/reports/{job_id}/download").status_code == 404
+    finally:
+        stop.set()
+        worker.join()
@@ -0,0 +1,109 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset
+from unemployment_series import METRICS, Series, format_month
+
+
+@pytest.fixture(scope="module")
+def monthly():
+    """Dataset.csv's monthly rows with a `month` column, the brute-force side of the checks."""
+    df = dataset.read_csv(dataset.DATASET_PATH)
+    df = df[df["Frequency"].astype(str).str.strip().str.lower() == "monthly"]
+    dates = pd.to_datetime(df["Date"], format="%d-%m-%Y", errors="coerce")
+    df = df.assign(month=dates.dt.year * 12 + dates.dt.month - 1)
+    return df[dates.notna() & df["Region"].notna() & df["Area"].notna()]
+
+
+def monthly_means(rows, column):
+    return rows.groupby("month")[column].mean().dropna().sort_index()
+
+
+def close(value, expected, tolerance=1e-3):
+    if expected is None or (isinstance(expected, float) and math.isnan(expected)):
+        return value is None
+    return value is not None and abs(value - expected) < tolerance
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {"area": "Rural"},
+    {"area": "Urban", "start": "2019-08", "end": "2020-03", "metric": "employed"},
+    {"start": "2020-01", "metric": "labour_participation_rate"},
+    {"end": "2019-07"},
+])
+def test_range_matches_brute_force(client, monthly, query):
+    response = client.get("/unemployment/range", query_string=query)
+    assert response.status_code == 200
+    body = response.get_json()
+
+    column = METRICS[query.get("metric", "unemployment_rate")]
+    rows = monthly
+    if "area" in query:
+        rows = rows[rows["Area"].astype(str) == query["area"]]
+    if "start" in query:
+        year, month = map(int, query["start"].split("-"))
+        rows = rows[rows["month"] >= year * 12 + month - 1]
+    if "end" in query:
+        year, month = map(int, query["end"].split("-"))
+        rows = rows[rows["month"] <= year * 12 + month - 1]
+    means = monthly_means(rows, column)
+
+    assert body["rows"] == rows[column].notna().sum()
+    assert close(body["mean"], rows[column].mean())
+    assert close(body["min"], means.min())
+    assert close(body["max"], means.max())
+    assert close(body["first"], means.iloc[0])
+    assert close(body["last"], means.iloc[-1])
+    assert close(body["change"], means.iloc[-1] - means.iloc[0])
+
+
+def test_rolling_and_changes_match_brute_force(client, monthly):
+    column = METRICS["unemployment_rate"]
+    rows = monthly[monthly["Area"].astype(str) == "Rural"]
+    months = sorted(rows["month"].unique())
+
+    body = client.get("/unemployment/rolling", query_string={"area": "Rural", "window": 3}).get_json()
+    assert body["months"] == [format_month(m) for m in months]
+    for k, m in enumerate(months):
+        window = rows[(rows["month"] > m - 3) & (rows["month"] <= m)]
+        expected = window[column].mean() if m - 2 >= months[0] else None
+        assert close(body["rolling_mean"][k], expected)
+
+    body = client.get("/unemployment/changes", query_string={"area": "Rural"}).get_json()
+    means = rows.groupby("month")[column].mean()
+    assert body["delta"][0] is None
+    for k in range(1, len(months)):
+        if months[k] - months[k - 1] != 1:
+            assert body["delta"][k] is None
+            continue
+        delta = means[months[k]] - means[months[k - 1]]
+        assert close(body["delta"][k], delta)
+        assert close(body["percent_change"][k], 100 * delta / means[months[k - 1]], 0.01)
+
+
+def test_range_summary_matches_a_scan_on_every_range():
+    rng = random.Random(7)
+    months = np.array(sorted(rng.sample(range(24000, 24060), 37)))
+    counts = np.array([[rng.choice([0, 1, 2, 3])] for _ in months], dtype=np.int64)
+    sums = np.array([[rng.uniform(-5, 50) * c[0]] for c in counts])
+    series = Series(months, sums, counts)
+    values = series.values(0)
+
+    for i in range(len(months)):
+        for j in range(i + 1, len(months) + 1):
+            summary = series.range_summary(0, months[i], months[j - 1])
+            assert summary["months"] == j - i
+            present = values[i:j][~np.isnan(values[i:j])]
+            if not len(present):
+                assert summary["min"] is None and summary["first"] is None
+                continue
+            assert close(summary["min"], present.min())
+            assert close(summary["max"], present.max())
+            assert close(summary["first"], present[0])
+            assert close(summary["last"], present[-1])
+            assert close(summary["total"], sums[i:j, 0].sum())
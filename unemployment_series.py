@@ -0,0 +1,232 @@
+"""
+Monthly unemployment time series, built once when the dataset is loaded.
+
+The ` Date` / ` Frequency` rows (Region x Area x month) are parsed into
+one date-sorted array store per (region, area), plus the "all regions" and
+"all areas" combinations.  Every series keeps, per month, the sum and row
+count of each metric and their running (prefix) totals, so
+
+    mean of a metric over months [start, end]
+        = (prefix_sum[j] - prefix_sum[i]) / (prefix_count[j] - prefix_count[i])
+
+is two binary searches and a subtraction however long the range is.  The
+mean is over the underlying rows, i.e. what filtering the frame to the
+region/area/months and calling .mean() would give.  Rolling means and
+month-over-month changes read the same arrays.
+
+The range min/max come from sparse tables over the monthly means (two
+overlapping power-of-two blocks cover any range), and first/last come
+from next/previous-valid-month index arrays, so a range summary does not
+touch the months inside the range either.
+
+Months are integers (year * 12 + month - 1) and formatted "YYYY-MM".  Only
+rows with Frequency "Monthly" are used.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# URL name -> column
+METRICS = {
+    "unemployment_rate": "Estimated Unemployment Rate (%)",
+    "employed": "Estimated Employed",
+    "labour_participation_rate": "Estimated Labour Participation Rate (%)",
+}
+ALL = "All"
+
+
+def parse_month(text):
+    """"2019-05" (or a full "2019-05-31") -> month number; ValueError otherwise."""
+    try:
+        year, month = str(text).strip()[:7].split("-")
+        year, month = int(year), int(month)
+    except ValueError:
+        raise ValueError(f"Invalid month '{text}', expected YYYY-MM")
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month '{text}', expected YYYY-MM")
+    return year * 12 + month - 1
+
+
+def format_month(month):
+    return f"{month // 12:04d}-{month % 12 + 1:02d}"
+
+
+def _json_float(value, digits=4):
+    return None if math.isnan(value) else round(float(value), digits)
+
+
+def _sparse_table(values, combine):
+    """
+    levels[k][p] = combine of values[p:p + 2**k] along axis 0.  `combine`
+    is np.fmin/np.fmax, which skip NaN (all-NaN blocks stay NaN).
+    """
+    levels = [values]
+    width = 1
+    while 2 * width <= len(values):
+        previous = levels[-1]
+        levels.append(combine(previous[:-width], previous[width:]))
+        width *= 2
+    return levels
+
+
+class Series:
+    """
+    One region/area's months (sorted) with per-month `sums` and `counts`
+    of shape (months, metrics) and their prefix totals (one extra leading
+    row of zeros).  The monthly means also get min/max sparse tables and,
+    per position, the next and previous month that has a value.
+    """
+
+    def __init__(self, months, sums, counts):
+        self.months = months
+        self.sums = sums
+        self.counts = counts
+        self.prefix_sums = np.vstack([np.zeros((1, sums.shape[1])), np.cumsum(sums, axis=0)])
+        self.prefix_counts = np.vstack([np.zeros((1, counts.shape[1]), dtype=np.int64), np.cumsum(counts, axis=0)])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.means = sums / counts
+        self.min_table = _sparse_table(self.means, np.fmin)
+        self.max_table = _sparse_table(self.means, np.fmax)
+        n = len(months)
+        positions = np.arange(n)[:, None]
+        valid = ~np.isnan(self.means)
+        # next_valid[p] = first position >= p with a value (n if none)
+        self.next_valid = np.minimum.accumulate(np.where(valid, positions, n)[::-1], axis=0)[::-1]
+        # prev_valid[p] = last position <= p with a value (-1 if none)
+        self.prev_valid = np.maximum.accumulate(np.where(valid, positions, -1), axis=0)
+
+    def values(self, metric):
+        """Monthly means of metric column `metric` (NaN where a month has no rows)."""
+        return self.means[:, metric]
+
+    @staticmethod
+    def _extreme(table, combine, metric, i, j):
+        """combine (fmin/fmax) of the monthly means over positions [i, j), j > i."""
+        k = (j - i).bit_length() - 1
+        level = table[k]
+        return combine(level[i, metric], level[j - (1 << k), metric])
+
+    def bounds(self, start=None, end=None):
+        """[i, j) positions of the months in [start, end] (inclusive, None = open)."""
+        i = 0 if start is None else int(np.searchsorted(self.months, start, side="left"))
+        j = len(self.months) if end is None else int(np.searchsorted(self.months, end, side="right"))
+        return i, max(i, j)
+
+    def total(self, metric, i, j):
+        """(sum, rows) of the metric over positions [i, j), from the prefix totals."""
+        return (self.prefix_sums[j, metric] - self.prefix_sums[i, metric],
+                int(self.prefix_counts[j, metric] - self.prefix_counts[i, metric]))
+
+    def range_summary(self, metric, start=None, end=None):
+        i, j = self.bounds(start, end)
+        total, rows = self.total(metric, i, j)
+        summary = {
+            "from": format_month(self.months[i]) if j > i else None,
+            "to": format_month(self.months[j - 1]) if j > i else None,
+            "months": j - i,
+            "rows": rows,
+            "mean": _json_float(total / rows) if rows else None,
+            "total": _json_float(total),
+            "min": None, "max": None, "first": None, "last": None, "change": None,
+        }
+        first = self.next_valid[i, metric] if j > i else j
+        if first < j:
+            last = self.prev_valid[j - 1, metric]
+            first_value, last_value = self.means[first, metric], self.means[last, metric]
+            summary.update(
+                min=_json_float(self._extreme(self.min_table, np.fmin, metric, i, j)),
+                max=_json_float(self._extreme(self.max_table, np.fmax, metric, i, j)),
+                first=_json_float(first_value),
+                last=_json_float(last_value),
+                change=_json_float(last_value - first_value),
+            )
+        return summary
+
+    def rolling_mean(self, metric, window):
+        """
+        Mean over the trailing `window` calendar months ending at each month
+        (None until `window` months of history exist).
+        """
+        starts = np.searchsorted(self.months, self.months - window + 1, side="left")
+        ends = np.arange(1, len(self.months) + 1)
+        sums = self.prefix_sums[ends, metric] - self.prefix_sums[starts, metric]
+        rows = self.prefix_counts[ends, metric] - self.prefix_counts[starts, metric]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(rows > 0, sums / rows, np.nan)
+        complete = self.months - window + 1 >= self.months[0] if len(self.months) else []
+        return [_json_float(m) if ok else None for m, ok in zip(means, complete)]
+
+    def changes(self, metric):
+        """Month-over-month (delta, percent change); None where the previous month is missing."""
+        values = self.values(metric)
+        deltas, percents = [None], [None]
+        for k in range(1, len(values)):
+            if self.months[k] - self.months[k - 1] != 1 or math.isnan(values[k]) or math.isnan(values[k - 1]):
+                deltas.append(None)
+                percents.append(None)
+                continue
+            delta = values[k] - values[k - 1]
+            deltas.append(_json_float(delta))
+            percents.append(_json_float(100 * delta / values[k - 1], 2) if values[k - 1] else None)
+        return deltas, percents
+
+
+class UnemploymentSeries:
+    """
+    Series for every (region, area) in the data plus ("All", area),
+    (region, "All") and ("All", "All").  Region and area names are matched
+    case-insensitively.
+    """
+
+    def __init__(self, df):
+        self.metrics = [name for name, column in METRICS.items() if column in df.columns]
+        self._series = {}
+        self.regions, self.areas = [], []
+        if not self.metrics or not {"Region", "Area", "Date"} <= set(df.columns):
+            return
+
+        columns = [METRICS[name] for name in self.metrics]
+        frame = df[["Region", "Area", "Date"] + columns]
+        if "Frequency" in df.columns:
+            frame = frame[df["Frequency"].astype(str).str.strip().str.lower() == "monthly"]
+        dates = pd.to_datetime(frame["Date"], format="%d-%m-%Y", errors="coerce")
+        frame = frame.assign(
+            Region=frame["Region"].astype(str), Area=frame["Area"].astype(str),
+            month=dates.dt.year * 12 + dates.dt.month - 1,
+        )
+        frame = frame[dates.notna() & frame["Region"].ne("nan") & frame["Area"].ne("nan")]
+        frame = frame.astype({"month": np.int64})
+
+        self.regions = sorted(frame["Region"].unique())
+        self.areas = sorted(frame["Area"].unique())
+        for keys, region, area in (
+            (["Region", "Area"], None, None),
+            (["Region"], None, ALL),
+            (["Area"], ALL, None),
+            ([], ALL, ALL),
+        ):
+            grouped = frame.groupby(keys + ["month"], observed=True)[columns].agg(["sum", "count"])
+            grouped = grouped.sort_index()
+            for key, rows in (grouped.groupby(level=keys, observed=True) if keys else [((), grouped)]):
+                key = key if isinstance(key, tuple) else (key,)
+                names = dict(zip(keys, key))
+                self._series[(
+                    (region or names["Region"]).lower(), (area or names["Area"]).lower()
+                )] = Series(
+                    rows.index.get_level_values("month").to_numpy(),
+                    rows.xs("sum", axis=1, level=1).to_numpy(dtype=float),
+                    rows.xs("count", axis=1, level=1).to_numpy(dtype=np.int64),
+                )
+
+    def series(self, region=ALL, area=ALL):
+        """The Series for the region/area names (either may be "All"), or None."""
+        return self._series.get(((region or ALL).strip().lower(), (area or ALL).strip().lower()))
+
+    def metric_index(self, name):
+        """Position of metric `name` in the arrays; ValueError listing the known ones."""
+        if name not in self.metrics:
+            raise ValueError(f"Unknown metric '{name}'. Available: {', '.join(self.metrics)}")
+        return self.metrics.index(name)